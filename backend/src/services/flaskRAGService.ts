@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { logger } from '../utils/logger';
+import { ChannelNotSentError, SaarthiChannel } from './saarthiChannel';
 
 export interface RAGChatResponse {
   message: string;
@@ -24,14 +25,23 @@ export interface FlaskChatResponse {
 export class FlaskRAGService {
   private flaskBaseUrl: string;
   private isFlaskAvailable: boolean;
+  private channel: SaarthiChannel | null;
 
   constructor() {
     this.flaskBaseUrl = process.env.FLASK_RAG_URL || 'http://localhost:5001';
     this.isFlaskAvailable = true;
+    // Persistent socket channel when the service runs on this host; HTTP stays the fallback
+    this.channel = process.env.FLASK_RAG_SOCKET ? new SaarthiChannel(process.env.FLASK_RAG_SOCKET) : null;
     this.checkFlaskHealth();
   }
 
   private async checkFlaskHealth(): Promise<void> {
+    // Heartbeats pushed over the channel already prove the service is up
+    if (this.channel?.isHealthy) {
+      this.isFlaskAvailable = true;
+      return;
+    }
+
     try {
       await axios.get(`${this.flaskBaseUrl}/health`, { timeout: 5000 });
       this.isFlaskAvailable = true;
@@ -59,34 +69,21 @@ export class FlaskRAGService {
     try {
       logger.info(`Sending message to Flask RAG: "${userMessage}" for user: ${userId}`);
       
-      const response = await axios.post<FlaskChatResponse>(
-        `${this.flaskBaseUrl}/chat`,
-        {
-          message: userMessage,
-          user_id: userId,
-          language: language
-        },
-        {
-          timeout: 15000, // 15 second timeout for RAG processing
-          headers: {
-            'Content-Type': 'application/json'
-          }
-        }
-      );
+      const data = await this.postChat(userMessage, userId, language);
 
-      if (response.data.status === 'success') {
+      if (data.status === 'success') {
         return {
-          message: response.data.response,
-          language: response.data.language || language,
-          confidence: response.data.confidence || 85, // Use actual confidence from enhanced chatbot
-          intent: response.data.intent || this.extractIntent(userMessage),
+          message: data.response,
+          language: data.language || language,
+          confidence: data.confidence || 85, // Use actual confidence from enhanced chatbot
+          intent: data.intent || this.extractIntent(userMessage),
           entities: this.extractEntities(userMessage),
           timestamp: new Date(),
-          source: response.data.rag_enabled ? 'enhanced_jecrc_chatbot' : 'flask_fallback',
-          ragEnabled: response.data.rag_enabled
+          source: data.rag_enabled ? 'enhanced_jecrc_chatbot' : 'flask_fallback',
+          ragEnabled: data.rag_enabled
         };
       } else {
-        logger.warn('Flask RAG returned error status:', response.data);
+        logger.warn('Flask RAG returned error status:', data);
         return this.getFallbackResponse(userMessage, language);
       }
 
@@ -97,6 +94,38 @@ export class FlaskRAGService {
     }
   }
 
+  private async postChat(userMessage: string, userId: string, language: string): Promise<FlaskChatResponse> {
+    const body = {
+      message: userMessage,
+      user_id: userId,
+      language: language
+    };
+
+    if (this.channel?.isHealthy) {
+      try {
+        return await this.channel.request<FlaskChatResponse>('chat', body);
+      } catch (error: any) {
+        // Once the request may have reached the service, resending it would run the chat twice
+        if (!(error instanceof ChannelNotSentError)) {
+          throw error;
+        }
+        logger.warn(`Saarthi channel request not sent, using HTTP: ${error.message}`);
+      }
+    }
+
+    const response = await axios.post<FlaskChatResponse>(
+      `${this.flaskBaseUrl}/chat`,
+      body,
+      {
+        timeout: 15000, // 15 second timeout for RAG processing
+        headers: {
+          'Content-Type': 'application/json'
+        }
+      }
+    );
+    return response.data;
+  }
+
   private getFallbackResponse(userMessage: string, language: string): RAGChatResponse {
     const fallbackMessages = {
       en: "I'm Saarthi, your JECRC chatbot. I'm currently experiencing some technical difficulties with my advanced features, but I'm here to help with basic queries about JECRC Foundation.",
@@ -174,11 +203,12 @@ export class FlaskRAGService {
   }
 
   // Health check endpoint for the Flask service
-  async getFlaskHealth(): Promise<{ available: boolean; url: string }> {
+  async getFlaskHealth(): Promise<{ available: boolean; url: string; channel: boolean }> {
     await this.checkFlaskHealth();
     return {
       available: this.isFlaskAvailable,
-      url: this.flaskBaseUrl
+      url: this.flaskBaseUrl,
+      channel: this.channel?.isHealthy ?? false
     };
   }
 }
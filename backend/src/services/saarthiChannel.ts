@@ -0,0 +1,140 @@
+import net from 'net';
+import { logger } from '../utils/logger';
+
+// Frames are a 4-byte big-endian length followed by UTF-8 JSON (see chatbot-service-backup/channel.py)
+const HEADER_BYTES = 4;
+const RECONNECT_DELAY_MS = 1000;
+const MAX_RECONNECT_DELAY_MS = 30000;
+
+// The request never left this process, so it is safe to send it another way
+export class ChannelNotSentError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = 'ChannelNotSentError';
+  }
+}
+
+interface PendingRequest {
+  resolve: (frame: any) => void;
+  reject: (error: Error) => void;
+  timer: NodeJS.Timeout;
+}
+
+export class SaarthiChannel {
+  private socket: net.Socket | null = null;
+  private buffer: Buffer = Buffer.alloc(0);
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 0;
+  private reconnectDelay = RECONNECT_DELAY_MS;
+  private lastHeartbeat = 0;
+
+  constructor(
+    private socketPath: string,
+    private heartbeatTimeoutMs: number = 15000
+  ) {
+    this.connect();
+  }
+
+  // Connected and heard from the service recently enough to trust it
+  get isHealthy(): boolean {
+    return this.socket !== null && Date.now() - this.lastHeartbeat < this.heartbeatTimeoutMs;
+  }
+
+  private connect(): void {
+    const socket = net.createConnection(this.socketPath);
+
+    socket.on('connect', () => {
+      this.socket = socket;
+      this.reconnectDelay = RECONNECT_DELAY_MS;
+      this.lastHeartbeat = Date.now();
+      logger.info(`✅ Connected to Saarthi channel at ${this.socketPath}`);
+    });
+
+    socket.on('data', (chunk: Buffer) => this.onData(socket, chunk));
+
+    socket.on('error', (error: Error) => {
+      logger.warn(`⚠️ Saarthi channel error: ${error.message}`);
+    });
+
+    socket.on('close', () => {
+      this.socket = null;
+      this.buffer = Buffer.alloc(0);
+      this.failPending(new Error('Saarthi channel closed'));
+      setTimeout(() => this.connect(), this.reconnectDelay);
+      this.reconnectDelay = Math.min(this.reconnectDelay * 2, MAX_RECONNECT_DELAY_MS);
+    });
+  }
+
+  private onData(socket: net.Socket, chunk: Buffer): void {
+    this.buffer = Buffer.concat([this.buffer, chunk]);
+
+    while (this.buffer.length >= HEADER_BYTES) {
+      const size = this.buffer.readUInt32BE(0);
+      if (this.buffer.length < HEADER_BYTES + size) {
+        return;
+      }
+      const body = this.buffer.subarray(HEADER_BYTES, HEADER_BYTES + size).toString('utf8');
+      this.buffer = this.buffer.subarray(HEADER_BYTES + size);
+
+      let frame: any;
+      try {
+        frame = JSON.parse(body);
+      } catch (error: any) {
+        // The framing can no longer be trusted: drop the connection, 'close' fails what is pending and reconnects
+        logger.error(`❌ Malformed Saarthi channel frame, resetting the connection: ${error.message}`);
+        this.buffer = Buffer.alloc(0);
+        socket.destroy();
+        return;
+      }
+      this.onFrame(frame);
+    }
+  }
+
+  private onFrame(frame: any): void {
+    if (frame.type === 'heartbeat') {
+      this.lastHeartbeat = Date.now();
+      return;
+    }
+
+    const request = this.pending.get(frame.id);
+    if (request) {
+      clearTimeout(request.timer);
+      this.pending.delete(frame.id);
+      request.resolve(frame);
+    }
+  }
+
+  private failPending(error: Error): void {
+    this.pending.forEach((request) => {
+      clearTimeout(request.timer);
+      request.reject(error);
+    });
+    this.pending.clear();
+  }
+
+  request<T = any>(type: string, fields: Record<string, unknown> = {}, timeoutMs: number = 15000): Promise<T> {
+    if (!this.socket) {
+      return Promise.reject(new ChannelNotSentError('Saarthi channel is not connected'));
+    }
+
+    const id = ++this.nextId;
+    const body = Buffer.from(JSON.stringify({ ...fields, id, type }), 'utf8');
+    const header = Buffer.alloc(HEADER_BYTES);
+    header.writeUInt32BE(body.length, 0);
+
+    return new Promise<T>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Saarthi channel request ${id} timed out`));
+      }, timeoutMs);
+      this.pending.set(id, { resolve, reject, timer });
+      this.socket!.write(Buffer.concat([header, body]), (error?: Error | null) => {
+        if (error && this.pending.has(id)) {
+          clearTimeout(timer);
+          this.pending.delete(id);
+          reject(new ChannelNotSentError(`Saarthi channel write failed: ${error.message}`));
+        }
+      });
+    });
+  }
+}
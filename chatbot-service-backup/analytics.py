@@ -0,0 +1,265 @@
+"""Streaming heavy-hitter counts over incoming queries in fixed memory
+
+Every answered query is counted by its (language, normalized query key) in a
+space-saving summary (Metwally et al.): at most `capacity` keys are tracked,
+and a new key replaces the least counted one and inherits its count as the
+error bound. Any key seen more than requests / capacity times is guaranteed
+to be tracked, and its count is overestimated by at most its error.
+
+One summary covers all traffic and one more per language, intent and route
+taken, so "top queries answered by the LLM" is a direct lookup. Summaries
+are periodically written as JSON to one file per worker; summaries merge, so
+the files of all workers can be combined into one view. Files of workers
+that have exited, or that have not been rewritten within the retention
+window, are deleted before merging so their counts age out of the view.
+"""
+
+import glob
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+from memory import approx_size
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('language', 'intent', 'route')
+# Intents come from the KB and routes from the router, so this only guards against surprises
+MAX_GROUPS = 64
+OVERFLOW_GROUP = 'other'
+SNAPSHOT_PATTERN = 'queries-*.json'
+
+
+def snapshot_pid(path):
+    """Worker PID in a queries-<pid>.json name, or None"""
+    try:
+        return int(os.path.basename(path)[len('queries-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+class SpaceSaving:
+    """Top-K counter keeping at most `capacity` keys, each with (count, error)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}  # key -> [count, error]
+        self._heap = []  # (count, key), stale entries are skipped when popped
+        self.total = 0
+
+    def add(self, key, weight=1):
+        self.total += weight
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            entry = self.counts[key] = [weight, 0]
+        else:
+            floor = self._pop_min()
+            entry = self.counts[key] = [floor + weight, floor]
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, k) for k, (count, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        """Remove the least counted key and return its count"""
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self.counts.get(key)
+            if entry is not None and entry[0] == count:
+                del self.counts[key]
+                return count
+
+    def top(self, n):
+        """[(key, count, error), ...] by count, highest first"""
+        best = heapq.nlargest(n, self.counts.items(), key=lambda item: item[1][0])
+        return [(key, count, error) for key, (count, error) in best]
+
+    def merge(self, other):
+        """Fold another summary into this one; counts add, as do the error bounds"""
+        combined = {key: list(entry) for key, entry in self.counts.items()}
+        for key, (count, error) in other.counts.items():
+            entry = combined.setdefault(key, [0, 0])
+            entry[0] += count
+            entry[1] += error
+        self.counts = dict(sorted(combined.items(), key=lambda item: -item[1][0])[:self.capacity])
+        self._heap = [(count, key) for key, (count, _) in self.counts.items()]
+        heapq.heapify(self._heap)
+        self.total += other.total
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'entries': [[*key, count, error] for key, (count, error) in self.counts.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data, capacity):
+        summary = cls(capacity)
+        summary.total = data.get('total', 0)
+        for language, key, count, error in data.get('entries', []):
+            summary.counts[(language, key)] = [count, error]
+        summary._heap = [(count, key) for key, (count, _) in summary.counts.items()]
+        heapq.heapify(summary._heap)
+        return summary
+
+
+class QueryAnalytics:
+    """Heavy hitters overall and per language, intent and route"""
+
+    def __init__(self, capacity=500, group_capacity=100, snapshot_dir=None, snapshot_interval=300.0,
+                 snapshot_retention=24 * 3600.0):
+        self.capacity = capacity
+        self.group_capacity = group_capacity
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_retention = snapshot_retention
+        self.overall = SpaceSaving(capacity)
+        self.groups = {dimension: {} for dimension in DIMENSIONS}  # dimension -> value -> SpaceSaving
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, key, language, intent, route):
+        query = (language, key)
+        values = {'language': language, 'intent': intent, 'route': route}
+        with self._lock:
+            self.overall.add(query)
+            for dimension, value in values.items():
+                groups = self.groups[dimension]
+                summary = groups.get(value)
+                if summary is None:
+                    if len(groups) >= MAX_GROUPS:
+                        value = OVERFLOW_GROUP
+                    summary = groups.setdefault(value, SpaceSaving(self.group_capacity))
+                summary.add(query)
+
+    def top(self, n=20, dimension=None, value=None):
+        """Heaviest queries overall, or within one group such as route=llm"""
+        with self._lock:
+            summary = self.overall if dimension is None else self.groups.get(dimension, {}).get(value)
+            if summary is None:
+                return {'requests': 0, 'top': []}
+            return {
+                'requests': summary.total,
+                'top': [
+                    {'language': language, 'query': key, 'count': count, 'error': error}
+                    for (language, key), count, error in summary.top(n)
+                ]
+            }
+
+    def breakdown(self):
+        """Request counts per value of every dimension"""
+        with self._lock:
+            return {
+                dimension: {value: summary.total for value, summary in groups.items()}
+                for dimension, groups in self.groups.items()
+            }
+
+    def report(self, n=20, dimension=None, value=None):
+        return dict(self.top(n, dimension, value), since=self.started_at, breakdown=self.breakdown(),
+                    capacity=self.capacity, group_capacity=self.group_capacity)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'since': self.started_at,
+                'written_at': time.time(),
+                'overall': self.overall.to_dict(),
+                'groups': {
+                    dimension: {value: summary.to_dict() for value, summary in groups.items()}
+                    for dimension, groups in self.groups.items()
+                }
+            }
+
+    def merge_dict(self, data):
+        with self._lock:
+            self.overall.merge(SpaceSaving.from_dict(data['overall'], self.capacity))
+            for dimension, groups in data.get('groups', {}).items():
+                for value, summary in groups.items():
+                    mine = self.groups.setdefault(dimension, {}).setdefault(value, SpaceSaving(self.group_capacity))
+                    mine.merge(SpaceSaving.from_dict(summary, self.group_capacity))
+            self.started_at = min(self.started_at, data.get('since', self.started_at))
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.snapshot_dir, f"queries-{os.getpid()}.json")
+
+    def snapshot(self):
+        """Write this worker's summaries atomically; returns the path"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self.snapshot_path
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+        return path
+
+    def prune(self):
+        """Delete snapshots of exited workers and ones older than the retention window; returns their paths"""
+        cutoff = time.time() - self.snapshot_retention
+        removed = []
+        for path in glob.glob(os.path.join(self.snapshot_dir, SNAPSHOT_PATTERN)):
+            pid = snapshot_pid(path)
+            try:
+                # PIDs are only meaningful on this host, the age check also covers other hosts' files
+                if os.path.getmtime(path) >= cutoff and (pid is None or pid_alive(pid)):
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            removed.append(path)
+        if removed:
+            logger.info(f"Pruned {len(removed)} stale analytics snapshots")
+        return removed
+
+    def merged(self):
+        """Live workers' latest snapshots combined with this worker's live counts"""
+        self.prune()
+        combined = QueryAnalytics(self.capacity, self.group_capacity)
+        combined.merge_dict(self.to_dict())
+        own = os.path.basename(self.snapshot_path)
+        for path in glob.glob(os.path.join(self.snapshot_dir, SNAPSHOT_PATTERN)):
+            if os.path.basename(path) == own:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    combined.merge_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping analytics snapshot {path}: {e}")
+        return combined
+
+    def start(self):
+        if self._thread or not self.snapshot_dir or self.snapshot_interval <= 0:
+            return
+
+        def snapshot_loop():
+            while True:
+                time.sleep(self.snapshot_interval)
+                try:
+                    self.snapshot()
+                    self.prune()
+                except Exception as e:
+                    logger.error(f"Analytics snapshot failed: {e}")
+
+        self._thread = threading.Thread(target=snapshot_loop, name='query-analytics', daemon=True)
+        self._thread.start()
+
+    def memory_bytes(self):
+        with self._lock:
+            summaries = [self.overall] + [s for groups in self.groups.values() for s in groups.values()]
+            return sum(approx_size(s.counts) + approx_size(s._heap, depth=1) for s in summaries)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""IVF-flat approximate nearest-neighbour index over knowledge chunk embeddings
+
+Vectors are clustered offline with k-means into `nlist` inverted lists and
+stored sorted by list, so a query only scans the `nprobe` lists whose
+centroids are closest to it. The index file is memory-mapped read-only at
+load time; nprobe is chosen per search call to trade recall for latency.
+
+With `with_quantizer()` the probed lists are scanned through resident int8 or
+PQ codes (quantization.py) instead of the float block, and only the best
+k * rescore candidates are re-scored exactly from the memory-mapped floats.
+
+    python ann_index.py build [--nlist N]     # from the embedding store
+    python ann_index.py benchmark [--k 10]    # recall vs latency against exact search
+    python ann_index.py benchmark --quantization int8   # scanning quantized_int8.npz codes
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from quantization import QuantizedIndex, kmeans, nearest_centers
+
+INDEX_FILE = 'ivf_flat.npz'
+
+
+def quantized_path(directory, kind):
+    """Codes written by `quantization.py --save`"""
+    return os.path.join(directory, f'quantized_{kind}.npz')
+
+
+class IVFFlatIndex:
+    def __init__(self, ids, centroids, offsets, vectors, default_nprobe=8):
+        self.ids = ids
+        self.centroids = centroids
+        self.offsets = offsets  # list i spans rows offsets[i]:offsets[i + 1]
+        self.vectors = vectors
+        self.default_nprobe = default_nprobe
+        self.quantizer = None
+        self.codes = None  # quantized rows in list order, scanned instead of the float block
+        self.rescore = 1
+
+    @classmethod
+    def build(cls, ids, vectors, nlist=None, iterations=20, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = nlist or max(1, int(math.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        centroids = kmeans(vectors, nlist, iterations, np.random.default_rng(seed))
+        assignment = nearest_centers(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(np.array(ids)[order], centroids, offsets, vectors[order])
+
+    def with_quantizer(self, quantized, rescore=4):
+        """Scan quantized codes for the chunks of `quantized` (a QuantizedIndex), reordered to list order"""
+        positions = {chunk_id: row for row, chunk_id in enumerate(quantized.ids)}
+        missing = [str(chunk_id) for chunk_id in self.ids if str(chunk_id) not in positions]
+        if missing:
+            raise ValueError(f"{len(missing)} indexed chunks have no quantized code, re-run quantization.py --save")
+        self.codes = np.asarray(quantized.codes)[[positions[str(chunk_id)] for chunk_id in self.ids]]
+        self.quantizer = quantized.quantizer
+        self.rescore = max(1, rescore)
+        return self
+
+    def memory_bytes(self):
+        """Resident arrays; a memory-mapped vector block is paged by the OS and not counted"""
+        size = self.ids.nbytes + self.centroids.nbytes + self.offsets.nbytes
+        if not isinstance(self.vectors, np.memmap):
+            size += self.vectors.nbytes
+        if self.codes is not None:
+            size += self.codes.nbytes + sum(array.nbytes for array in self.quantizer.state().values())
+        return size
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def search(self, query, k=10, nprobe=None):
+        """Top k (id, score) by inner product over the nprobe closest lists"""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.default_nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe
+        ]) if nprobe else np.empty(0, dtype=np.int64)
+        if not len(rows):
+            return []
+        rows.sort()  # sequential reads from the memory-mapped matrix
+        if self.codes is not None:
+            approximate = self.quantizer.scores(self.codes[rows], query)
+            pool = min(len(rows), k * self.rescore)
+            rows = rows[np.sort(np.argpartition(-approximate, pool - 1)[:pool])]
+        scores = np.asarray(self.vectors[rows]) @ query
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(str(self.ids[rows[i]]), float(scores[i])) for i in best]
+
+    def save(self, path):
+        np.savez(path, ids=self.ids, centroids=self.centroids, offsets=self.offsets)
+        np.save(vectors_path(path), np.ascontiguousarray(self.vectors))
+
+    @classmethod
+    def load(cls, path, default_nprobe=8):
+        """Load read-only; the vector block stays memory-mapped from its .npy file"""
+        with np.load(path, allow_pickle=False) as data:
+            ids, centroids, offsets = data['ids'], data['centroids'], data['offsets']
+        vectors = np.load(vectors_path(path), mmap_mode='r')
+        return cls(ids, centroids, offsets, vectors, default_nprobe)
+
+
+def vectors_path(path):
+    return os.path.splitext(path)[0] + '_vectors.npy'
+
+
+def benchmark(index, vectors, ids, queries, k=10, nprobes=(1, 2, 4, 8, 16, 32)):
+    """Return [(nprobe, recall@k, mean ms per query)], plus exact search as nprobe=None"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    start = time.perf_counter()
+    truth = [set(np.array(ids)[np.argsort(-(vectors @ q))[:k]]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    results = [(None, 1.0, exact_ms)]
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        start = time.perf_counter()
+        found = [{chunk_id for chunk_id, _ in index.search(q, k, nprobe)} for q in queries]
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = sum(len(f & t) for f, t in zip(found, truth)) / sum(len(t) for t in truth)
+        results.append((nprobe, recall, elapsed))
+    return results
+
+
+def main(argv=None):
+    from config import get_config
+    from embeddings import EmbeddingStore
+
+    settings = get_config()
+    parser = argparse.ArgumentParser(description='Build or benchmark the IVF-flat chunk index')
+    parser.add_argument('command', choices=['build', 'benchmark'])
+    parser.add_argument('--store', default=settings.EMBEDDING_DIR)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--quantization', choices=['int8', 'pq'], default=None,
+                        help='scan the quantized codes saved by quantization.py --save')
+    parser.add_argument('--rescore', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    ids, vectors = EmbeddingStore(args.store).load()
+    if not ids:
+        print("❌ Embedding store is empty, run embeddings.py first")
+        return 1
+    path = os.path.join(args.store, INDEX_FILE)
+
+    if args.command == 'build':
+        index = IVFFlatIndex.build(ids, vectors, args.nlist)
+        index.save(path)
+        print(f"✅ Built IVF-flat index: {len(ids)} vectors in {index.nlist} lists -> {path}")
+        return 0
+
+    index = IVFFlatIndex.load(path)
+    if args.quantization:
+        index.with_quantizer(QuantizedIndex.load(quantized_path(args.store, args.quantization)), args.rescore)
+    rng = np.random.default_rng(0)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, (len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    scan = f", {args.quantization} codes rescored x{args.rescore}" if args.quantization else ''
+    print(f"📈 recall@{args.k} vs latency, {len(ids)} vectors, {index.nlist} lists{scan}")
+    for nprobe, recall, ms in benchmark(index, vectors, ids, queries, args.k):
+        label = 'exact' if nprobe is None else f'nprobe={nprobe}'
+        print(f"   {label:<12} recall {recall:.3f}   {ms:.3f} ms/query")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
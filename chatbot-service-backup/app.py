@@ -1,10 +1,43 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import json
 import logging
+import random
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from analytics import QueryAnalytics
+from channel import ChannelServer
+from config import get_config
+from conversation_state import ConversationStore, MemoryBackend, create_backend
+from deadline import Deadline, DeadlineStats
+from generation import ProfileStats, model_thinks
+from knowledge import UNKNOWN_INTENT, detect_language
+from knowledge_export import KnowledgeExport
+from llm_limiter import PRIORITIES, PRIORITY_HEADER, PRIORITY_INTERACTIVE, AdaptiveLimiter, LLMShed, is_rate_limited
+from llm_stub import StubLLM
+from memory import MemoryAccountant
+from model_server import RemoteCrossEncoder, RemoteEncoder
+import normalizer
+from normalizer import normalize, query_key
+from profiler import SamplingProfiler
+from quantization import QuantizedIndex
+from ann_index import INDEX_FILE, IVFFlatIndex, quantized_path
+from rerank import Reranker
+from response_store import ResponseStore
+from retrieval import DenseRetriever, fuse_rankings
+from router import QueryRouter
+from snapshot import SnapshotManager
+from traffic import TrafficRecorder
+import translation
+from translation import translate_query
+from warmup import WARMUP_USER_ID, CacheWarmer
 
 # Load environment variables
 load_dotenv()
@@ -16,99 +49,235 @@ CORS(app, origins=["http://localhost:3002"])  # Allow frontend access
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+settings = get_config()
+
 # Initialize Gemini
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
-    logger.error("GEMINI_API_KEY not found in environment variables")
-    exit(1)
+if settings.LLM_STUB:
+    # Offline load replay: measure the service, not Gemini
+    logger.warning(f"LLM stubbed with {settings.LLM_STUB_LATENCY}s latency, answers are not real")
+    model = StubLLM(settings.LLM_STUB_LATENCY)
+else:
+    if not GEMINI_API_KEY:
+        logger.error("GEMINI_API_KEY not found in environment variables")
+        exit(1)
+
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel(settings.MODEL_NAME)
+
+LLM_EMPTY_RESPONSE = "I apologize, but I'm having trouble generating a response right now. Please try again."
+LLM_ERROR_RESPONSE = "I'm experiencing some technical difficulties. Please try again in a moment."
+DEADLINE_RESPONSE = "This is taking longer than expected. Please ask again in a moment."
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Record the wall time of one pipeline stage in milliseconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = (time.perf_counter() - start) * 1000
+
+
+def create_reranker():
+    """Cross-encoder reranker when enabled and installed, otherwise None"""
+    if not settings.RERANK_ENABLED:
+        return None
+    try:
+        return Reranker(
+            settings.RERANK_MODEL,
+            top_n=settings.RERANK_CANDIDATES,
+            budget_ms=settings.RERANK_BUDGET_MS,
+            skip_margin=settings.RERANK_SKIP_MARGIN,
+            model=RemoteCrossEncoder(settings.MODEL_SERVER_SOCKET) if settings.MODEL_SERVER_SOCKET else None
+        )
+    except Exception as e:
+        logger.warning(f"Reranking disabled: {str(e)}")
+        return None
+
+
+def create_dense_retriever():
+    """ANN-backed dense retriever when enabled and built, otherwise None"""
+    if not settings.DENSE_RETRIEVAL_ENABLED:
+        return None
+    try:
+        from embeddings import QueryEncoder
+        index = IVFFlatIndex.load(os.path.join(settings.EMBEDDING_DIR, INDEX_FILE), settings.ANN_NPROBE)
+        if settings.ANN_QUANTIZATION:
+            quantized = QuantizedIndex.load(quantized_path(settings.EMBEDDING_DIR, settings.ANN_QUANTIZATION))
+            index.with_quantizer(quantized, settings.ANN_RESCORE)
+        model = RemoteEncoder(settings.MODEL_SERVER_SOCKET) if settings.MODEL_SERVER_SOCKET else None
+        encoder = QueryEncoder(settings.EMBEDDING_MODEL, model=model)
+        return DenseRetriever(index, encoder, settings.ANN_NPROBE)
+    except Exception as e:
+        logger.warning(f"Dense retrieval disabled: {str(e)}")
+        return None
+
+
+def create_conversation_store():
+    """Conversation history in the configured backend, in-process if it is unavailable"""
+    try:
+        backend = create_backend(settings.CONVERSATION_BACKEND, settings.CONVERSATION_DB_PATH,
+                                 settings.CONVERSATION_REDIS_URL)
+    except Exception as e:
+        logger.warning(f"Conversation backend {settings.CONVERSATION_BACKEND} unavailable, using memory: {str(e)}")
+        backend = MemoryBackend()
+    return ConversationStore(backend, settings.CONVERSATION_HISTORY_LIMIT, settings.CONVERSATION_TTL,
+                             settings.CONVERSATION_CACHE_TTL)
+
+
+def create_query_analytics():
+    """Heavy-hitter counts snapshotted in the background, or None when disabled"""
+    if not settings.ANALYTICS_ENABLED:
+        return None
+    analytics = QueryAnalytics(settings.ANALYTICS_CAPACITY, settings.ANALYTICS_GROUP_CAPACITY,
+                               settings.ANALYTICS_SNAPSHOT_DIR, settings.ANALYTICS_SNAPSHOT_INTERVAL,
+                               settings.ANALYTICS_SNAPSHOT_RETENTION)
+    analytics.start()
+    return analytics
+
+
+def create_knowledge_export(chatbot):
+    """Revision log kept in step with every snapshot, or None when disabled"""
+    if not settings.KNOWLEDGE_EXPORT_PATH:
+        return None
+    try:
+        export = KnowledgeExport(settings.KNOWLEDGE_EXPORT_PATH)
+        export.sync(chatbot.snapshots.current)
+    except Exception as e:
+        logger.warning(f"Knowledge export disabled: {str(e)}")
+        return None
+    chatbot.snapshots.on_swap(lambda snapshot, previous: export.sync(snapshot))
+    return export
+
+
+def create_traffic_recorder():
+    """Anonymized trace recorder when TRAFFIC_RECORD_PATH is set, else None"""
+    if not settings.TRAFFIC_RECORD_PATH:
+        return None
+    return TrafficRecorder(settings.TRAFFIC_RECORD_PATH, settings.TRAFFIC_SALT)
+
+
+def create_llm_limiter():
+    """Adaptive concurrency limit for Gemini calls when enabled, otherwise None"""
+    if not settings.LLM_LIMITER_ENABLED:
+        return None
+    return AdaptiveLimiter(
+        initial_limit=settings.LLM_CONCURRENCY_INITIAL,
+        min_limit=settings.LLM_CONCURRENCY_MIN,
+        max_limit=settings.LLM_CONCURRENCY_MAX,
+        backoff=settings.LLM_CONCURRENCY_BACKOFF,
+        latency_target_ms=settings.LLM_LATENCY_TARGET_MS,
+        max_queue=settings.LLM_QUEUE_SIZE
+    )
+
+
+def create_memory_accountant(chatbot):
+    """Register the chatbot's in-memory state; lower priorities are shrunk first"""
+    accountant = MemoryAccountant(int(settings.MEMORY_BUDGET_MB * 1024 * 1024), settings.MEMORY_CHECK_INTERVAL)
+    # Memo tables and session copies rebuild cheaply, cached answers cost an LLM call each
+    accountant.register('normalizer', normalizer.memory_bytes, normalizer.shrink, priority=10)
+    accountant.register('query_translation', translation.memory_bytes, translation.shrink, priority=10)
+    accountant.register('conversation_cache', chatbot.conversations.memory_bytes, chatbot.conversations.shrink,
+                        priority=20)
+    if isinstance(chatbot.conversations.backend, MemoryBackend):
+        accountant.register('conversation_store', chatbot.conversations.backend.memory_bytes,
+                            chatbot.conversations.backend.shrink, priority=60)
+    if chatbot.reranker:
+        cache = chatbot.reranker.cache
+        accountant.register('rerank_cache', lambda: cache.bytes, cache.shrink, priority=30)
+    if chatbot.dense_retriever:
+        encoder = chatbot.dense_retriever.encoder
+        accountant.register('query_embeddings', encoder.memory_bytes, encoder.shrink, priority=40)
+        accountant.register('ann_index', chatbot.dense_retriever.index.memory_bytes)
+    accountant.register('response_cache', lambda: chatbot.snapshots.current.response_cache.bytes,
+                        lambda target: chatbot.snapshots.current.response_cache.shrink(target), priority=50)
+    accountant.register('knowledge', lambda: chatbot.snapshots.current.memory_bytes())
+    if chatbot.analytics:
+        accountant.register('query_analytics', chatbot.analytics.memory_bytes)
+    return accountant
+
+
+def create_cache_warmer(chatbot):
+    """Warm the cache now and after every reload, or None when disabled"""
+    if not settings.WARMUP_ENABLED:
+        return None
+    warmer = CacheWarmer(chatbot, settings.WARMUP_WORKERS, settings.WARMUP_RATE, settings.WARMUP_TOP_N,
+                         settings.WARMUP_LOCK_PATH)
+    chatbot.snapshots.on_swap(warmer.on_snapshot_swap)
+    warmer.start()
+    return warmer
+
+
+def create_response_store():
+    """SQLite response store shared across workers, or None when disabled"""
+    if not settings.RESPONSE_STORE_PATH:
+        return None
+    try:
+        return ResponseStore(settings.RESPONSE_STORE_PATH, ttl_seconds=settings.RESPONSE_STORE_TTL,
+                             retain_versions=settings.RESPONSE_STORE_RETAIN_VERSIONS)
+    except Exception as e:
+        logger.warning(f"Response store disabled: {str(e)}")
+        return None
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash')  # Updated to working model
 
 class SaarthiChatbot:
-    def __init__(self):
-        self.system_prompt = """
-        You are Saarthi, the official JECRC Foundation chatbot. You are knowledgeable about:
-        
-        JECRC FOUNDATION COMPREHENSIVE INFORMATION:
-        
-        📍 LOCATION & CAMPUS:
-        - Main Campus: Kukas, Jaipur, Rajasthan, India
-        - Sprawling 40-acre modern campus with Wi-Fi connectivity
-        - Well-planned infrastructure with green spaces and modern architecture
-        
-        🎓 ACADEMIC PROGRAMS:
-        - B.Tech: Computer Science, IT, ECE, Mechanical, Civil, Electrical, Automobile
-        - M.Tech: Various specializations available
-        - MBA: Full-time and Executive programs
-        - BBA, MCA, B.Sc, M.Sc programs
-        - Ph.D. programs in multiple disciplines
-        
-        📚 LIBRARY FACILITIES:
-        - Central Library: Open 8:00 AM to 8:00 PM (Monday-Saturday)
-        - Digital Library: 24/7 access with online resources
-        - Over 50,000+ books, journals, and digital resources
-        - Separate reading halls for UG and PG students
-        - Air-conditioned with comfortable seating for 200+ students
-        - Access to IEEE, ACM, and other premium digital databases
-        - Quiet study zones and group discussion areas
-        
-        🏠 HOSTEL FACILITIES:
-        - Separate hostels for boys and girls
-        - AC and Non-AC rooms available
-        - Mess facilities with vegetarian and non-vegetarian options
-        - 24/7 security and medical facilities
-        - Recreation rooms with TV, indoor games
-        - High-speed internet connectivity
-        
-        💰 FEES & SCHOLARSHIPS:
-        - Merit-based scholarships for JEE Main toppers
-        - Financial assistance for economically weaker students
-        - Sports scholarships for outstanding athletes
-        - Girl child scholarships and SC/ST concessions
-        - Payment plans available with installment options
-        
-        🏆 PLACEMENTS:
-        - 85%+ placement record consistently
-        - Top recruiters: TCS, Infosys, Wipro, Cognizant, Amazon, Microsoft, Adobe
-        - Average package: 4-6 LPA, Highest: 25+ LPA
-        - Dedicated Training & Placement Cell
-        - Industry partnerships and internship programs
-        
-        🔬 FACILITIES:
-        - State-of-the-art laboratories for all departments
-        - Research centers and innovation labs
-        - Sports complex with cricket, football, basketball courts
-        - Gymnasium and fitness center
-        - Medical facilities with qualified staff
-        - Transportation facility from major city points
-        - Cafeteria and food courts with variety of options
-        
-        📞 CONTACT INFORMATION:
-        - Admissions Office: Open 9:00 AM to 5:00 PM
-        - Phone: +91-141-2770270, 2770271
-        - Email: admissions@jecrc.ac.in
-        - Website: www.jecrc.ac.in
-        - Address: JECRC Foundation, Kukas, Jaipur-302028
-        
-        RESPONSE GUIDELINES:
-        - Always introduce yourself as Saarthi, the JECRC Foundation chatbot
-        - Provide specific, detailed, and actionable information
-        - Use bullet points and structured formatting when helpful
-        - Include relevant contact details when appropriate
-        - If you don't have specific information, acknowledge it and provide general guidance
-        - Be warm, professional, and student-friendly
-        - Support queries in English, Hindi, and Rajasthani
-        - Always end with "Is there anything else I can help you with regarding JECRC Foundation?"
-        """
-        
-        self.conversation_contexts = {}
+    def __init__(self, llm=None, snapshots=None, reranker=None, store=None, dense_retriever=None, router=None,
+                 conversations=None, analytics=None, recorder=None, llm_limiter=None):
+        self.llm = llm or model
+        self.llm_thinks = model_thinks(settings.MODEL_NAME)
+        self.llm_limiter = llm_limiter
+        self.analytics = analytics
+        self.recorder = recorder
+        self.profile_stats = ProfileStats()
+        self.deadline_stats = DeadlineStats()
+        self.router = router or QueryRouter.from_settings(settings)
+        self.conversations = conversations or ConversationStore(MemoryBackend(), settings.CONVERSATION_HISTORY_LIMIT)
+        self.snapshots = snapshots or SnapshotManager(cache_size=settings.RESPONSE_CACHE_SIZE)
+        self.reranker = reranker
+        self.dense_retriever = dense_retriever
+        self.store = store
+
+        if self.store:
+            self.warm_from_store(self.snapshots.current)
+            self.snapshots.on_swap(self.on_snapshot_swap)
+
+    def warm_from_store(self, snapshot):
+        """Load the hottest stored answers for this snapshot into its memory cache"""
+        entries = self.store.warm(snapshot.kb_version, snapshot.prompt_version,
+                                  settings.RESPONSE_STORE_WARM_ENTRIES)
+        for cache_key, entry in entries:
+            snapshot.response_cache.put(cache_key, entry)
+        logger.info(f"Warmed {len(entries)} cached answers for {snapshot.version}")
+
+    def on_snapshot_swap(self, snapshot, previous):
+        self.warm_from_store(snapshot)
+        # Other workers may still serve the previous version until their own reload
+        self.store.compact([(snapshot.kb_version, snapshot.prompt_version),
+                            (previous.kb_version, previous.prompt_version)])
+
+    @property
+    def system_prompt(self):
+        return self.snapshots.current.system_prompt
     
-    def generate_response(self, user_message, user_id="default", language="en"):
-        try:
-            # Create context-aware prompt
-            full_prompt = f"""
-            {self.system_prompt}
+    def build_prompt(self, user_message, user_id="default", language="en", system_prompt=None, context=None,
+                     brief=False, history=None, style=None):
+        context_block = ''
+        if context:
+            passages = '\n'.join(f"[{chunk.title}]\n{chunk.text}" for chunk in context)
+            context_block = f"Relevant JECRC Information:\n{passages}"
+        if history:
+            speakers = {'user': 'Student', 'assistant': 'Saarthi'}
+            turns = '\n'.join(f"{speakers.get(role, role)}: {text}" for role, text in history)
+            context_block = f"{context_block}\n\nConversation so far:\n{turns}".strip()
+        length_hint = "Keep the answer short: three sentences at most." if brief else ''
+        # The profile's style instruction overrides the prompt's general response guidelines
+        style_hint = f"Answer style: {style}" if style else ''
+
+        return f"""
+            {system_prompt or self.system_prompt}
+            
+            {context_block}
             
             User Language: {language}
             User ID: {user_id}
@@ -116,60 +285,424 @@ class SaarthiChatbot:
             
             Please respond as Saarthi, the JECRC chatbot, in a helpful and informative manner.
             If the user is asking in Hindi or Rajasthani, try to respond in that language when appropriate.
+            {style_hint}
+            {length_hint}
             """
-            
+
+    def generate_response(self, user_message, user_id="default", language="en"):
+        return self.call_llm(self.build_prompt(user_message, user_id, language))
+
+    def call_llm(self, full_prompt, generation_config=None, timeout=None, slot=None):
+        """Gemini answer text, or one of the fixed error answers; releases the limiter `slot` if given"""
+        outcome = 'ok'
+        try:
             # Generate response using Gemini
-            response = model.generate_content(full_prompt)
+            kwargs = {}
+            if generation_config:
+                kwargs['generation_config'] = generation_config
+            if timeout:
+                # The client abandons the request at the timeout, so Gemini stops generating too
+                kwargs['request_options'] = {'timeout': timeout}
+            response = self.llm.generate_content(full_prompt, **kwargs)
             
             if response.text:
                 return response.text.strip()
             else:
-                return "I apologize, but I'm having trouble generating a response right now. Please try again."
+                return LLM_EMPTY_RESPONSE
                 
         except Exception as e:
+            outcome = 'overloaded' if is_rate_limited(e) else 'error'
             logger.error(f"Error generating response: {str(e)}")
-            return "I'm experiencing some technical difficulties. Please try again in a moment."
+            return LLM_ERROR_RESPONSE
+        finally:
+            if slot:
+                slot.release(outcome)
+
+    def process_message(self, user_message, user_id="default", language=None, snapshot=None, deadline=None,
+                        priority=PRIORITY_INTERACTIVE):
+        """Run the chat pipeline along the routed path and return the answer with per-stage timings
+
+        With a `deadline`, stages past the cheap paths only run while the
+        budget lasts; otherwise the best cheap answer comes back degraded.
+        `priority` orders the request in the LLM queue.
+        """
+        timings = {}
+        start = time.perf_counter()
+        # One snapshot for the whole request, even if a reload swaps it meanwhile
+        snapshot = snapshot or self.snapshots.current
+
+        with stage_timer(timings, 'normalize'):
+            text = normalize(user_message)
+
+        with stage_timer(timings, 'language'):
+            language = language or detect_language(text)
+            key = query_key(text, language)
+
+        with stage_timer(timings, 'intent'):
+            intent, confidence = snapshot.knowledge_base.match_intent(text)
+
+        with stage_timer(timings, 'route'):
+            decision = self.router.route(text, key, language, intent, confidence)
+
+        response, sources, route, fallback, degraded = self.answer(
+            user_message, user_id, language, text, key, intent, decision, snapshot, timings, deadline, priority)
+        error = response in (LLM_EMPTY_RESPONSE, LLM_ERROR_RESPONSE, DEADLINE_RESPONSE)
+        if not error and user_id != WARMUP_USER_ID:
+            with stage_timer(timings, 'history'):
+                self.conversations.append(user_id, user_message, response)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.router.record(decision, route, elapsed_ms, fallback, error)
+        if user_id != WARMUP_USER_ID:
+            if self.analytics:
+                self.analytics.record(key, language, intent, route)
+            if self.recorder:
+                self.recorder.record(text, language, user_id, route, elapsed_ms)
+
+        return {
+            'response': response,
+            'language': language,
+            'intent': intent,
+            'confidence': confidence,
+            'sources': sources,
+            'cached': route == 'cache',
+            'route': route,
+            'degraded': degraded,
+            'kb_version': snapshot.version,
+            'timings': timings
+        }
+
+    def answer(self, user_message, user_id, language, text, key, intent, decision, snapshot, timings,
+               deadline=None, priority=PRIORITY_INTERACTIVE):
+        """Try the cheap paths the decision allows, then the decided one
+
+        Returns (response, sources, route that answered, whether it fell
+        back, whether the deadline degraded it).
+        """
+        if decision.try_facts:
+            with stage_timer(timings, 'facts'):
+                fact_answer = snapshot.facts.answer(text, language)
+            if fact_answer:
+                response, fact = fact_answer
+                return response, [fact.section], 'facts', False, False
+
+        cache_key = (language, key)
+        if decision.try_cache:
+            entry = self.cached_answer(cache_key, key, language, snapshot, timings)
+            if entry is not None:
+                return entry[0], entry[1], 'cache', False, False
+
+        route, fallback = decision.route, False
+        if route == 'kb':
+            with stage_timer(timings, 'kb'):
+                response = snapshot.knowledge_base.get_response(intent, language)
+            if response:
+                return response, [f"{intent} ({language})"], 'kb', False, False
+            route, fallback = 'rag_short', True
+
+        brief = route == 'rag_short'
+        profile = snapshot.generation_profiles.for_intent(intent)
+        context = self.retrieve(user_message, text, key, language, snapshot, timings, deadline)
+
+        if deadline and deadline.remaining_ms() - settings.DEADLINE_RESERVE_MS < settings.DEADLINE_MIN_LLM_MS:
+            self.deadline_stats.record('llm_skipped')
+            return self.degraded_answer(text, language, intent, decision, context, route, snapshot, timings)
+
+        with stage_timer(timings, 'prompt'):
+            # Only follow-ups need the earlier turns; other answers stand alone and stay cacheable
+            history = self.conversations.history(user_id) if decision.reason == 'follow_up' else None
+            full_prompt = self.build_prompt(user_message, user_id, language, snapshot.system_prompt, context,
+                                            brief, history, profile.style)
+
+        slot = None
+        if self.llm_limiter:
+            max_wait_ms = settings.LLM_QUEUE_MAX_WAIT_MS
+            if deadline:
+                # Queueing may only spend what the call itself will not need
+                max_wait_ms = min(max_wait_ms, deadline.remaining_ms() - settings.DEADLINE_RESERVE_MS
+                                  - settings.DEADLINE_MIN_LLM_MS)
+            try:
+                with stage_timer(timings, 'llm_queue'):
+                    slot = self.llm_limiter.acquire(priority, max_wait_ms)
+            except LLMShed:
+                return self.degraded_answer(text, language, intent, decision, context, route, snapshot, timings)
+
+        try:
+            llm_timeout = None
+            if deadline:
+                llm_timeout = (deadline.remaining_ms() - settings.DEADLINE_RESERVE_MS) / 1000
+            with stage_timer(timings, 'llm'):
+                generation_config = profile.generation_config(self.router.short_max_tokens if brief else None,
+                                                              self.llm_thinks)
+                response = self.call_llm(full_prompt, generation_config, llm_timeout, slot)
+        finally:
+            # call_llm releases with the call's outcome; this only returns a slot it never reached
+            if slot:
+                slot.release('error')
+        timed_out = deadline and deadline.remaining_ms() <= settings.DEADLINE_RESERVE_MS
+        if timed_out and response in (LLM_EMPTY_RESPONSE, LLM_ERROR_RESPONSE):
+            self.deadline_stats.record('llm_timeout')
+            return self.degraded_answer(text, language, intent, decision, context, route, snapshot, timings)
+        self.profile_stats.record(profile.name, timings['llm'], response)
+
+        sources = [chunk.title for chunk in context]
+        # Follow-ups skip the cache both ways, their answers depend on the earlier turn
+        if decision.try_cache and response not in (LLM_EMPTY_RESPONSE, LLM_ERROR_RESPONSE):
+            snapshot.response_cache.put(cache_key, (response, sources))
+            if self.store:
+                self.store.put(key, language, snapshot.kb_version, snapshot.prompt_version,
+                               response, sources)
+        return response, sources, route, fallback, False
+
+    def degraded_answer(self, text, language, intent, decision, context, route, snapshot, timings):
+        """Best answer the cheap sources still have once the budget cannot cover generation
+
+        Facts the router skipped, then the matched intent's KB answer, then
+        the best retrieved passage as it stands. Returned like answer(),
+        never cached.
+        """
+        self.deadline_stats.record('degraded')
+        with stage_timer(timings, 'degraded'):
+            if not decision.try_facts:
+                fact_answer = snapshot.facts.answer(text, language)
+                if fact_answer:
+                    response, fact = fact_answer
+                    return response, [fact.section], 'facts', True, True
+            if intent != UNKNOWN_INTENT:
+                response = snapshot.knowledge_base.get_response(intent, language)
+                if response:
+                    return response, [f"{intent} ({language})"], 'kb', True, True
+            if context:
+                return context[0].text, [context[0].title], route, True, True
+        return DEADLINE_RESPONSE, [], route, True, True
+
+    def cached_answer(self, cache_key, key, language, snapshot, timings):
+        """(response, sources) from the memory cache, then the shared store, or None"""
+        with stage_timer(timings, 'cache'):
+            entry = snapshot.response_cache.get(cache_key)
+
+        if entry is None and self.store:
+            with stage_timer(timings, 'store'):
+                entry = self.store.get(key, language, snapshot.kb_version, snapshot.prompt_version)
+            if entry is not None:
+                snapshot.response_cache.put(cache_key, entry)
+        return entry
+
+    def retrieve(self, user_message, text, key, language, snapshot, timings, deadline=None):
+        """First-stage retrieval, narrowed by the reranker when one is configured
+
+        BM25 searches the query with its glossary translation appended; the
+        multilingual dense retriever gets the query as written. Under a
+        deadline, dense search and reranking share DEADLINE_RETRIEVAL_SHARE
+        of the remaining budget and are skipped when that is too little.
+        """
+        top_k = settings.RETRIEVAL_TOP_K
+        if top_k <= 0:
+            return []
+
+        with stage_timer(timings, 'translate'):
+            query = translate_query(text, language) if settings.QUERY_TRANSLATION else text
+
+        with stage_timer(timings, 'retrieval'):
+            wanted = self.reranker.top_n if self.reranker else top_k
+            candidates = snapshot.retriever.search(query, wanted)
+
+        if self.dense_retriever:
+            if deadline and deadline.share_ms(settings.DEADLINE_RETRIEVAL_SHARE) < settings.DEADLINE_MIN_DENSE_MS:
+                self.deadline_stats.record('dense_skipped')
+            else:
+                with stage_timer(timings, 'dense'):
+                    dense = self.dense_retriever.search(text, snapshot.chunks, wanted)
+                    candidates = fuse_rankings([candidates, dense], wanted)
+
+        if self.reranker:
+            budget_ms = None
+            if deadline:
+                # The reranker falls back to first-stage order when its budget is too small
+                budget_ms = deadline.share_ms(settings.DEADLINE_RETRIEVAL_SHARE, self.reranker.budget_ms)
+            with stage_timer(timings, 'rerank'):
+                candidates, _ = self.reranker.rerank(user_message, candidates, top_k, budget_ms, cache_key=key)
+
+        return [chunk for chunk, _ in candidates[:top_k]]
+
+    def process_two_phase(self, user_message, user_id="default", language=None, deadline=None,
+                          priority=PRIORITY_INTERACTIVE):
+        """Yield the canned KB answer at once, then the LLM-refined answer
+
+        Refinement is skipped when the KB match is confident enough that the
+        canned answer is already the final one.
+        """
+        snapshot = self.snapshots.current
+        text = normalize(user_message)
+        language = language or detect_language(text)
+        intent, confidence = snapshot.knowledge_base.match_intent(text)
+        meta = {'language': language, 'intent': intent, 'confidence': confidence}
+
+        fact_answer = snapshot.facts.answer(text, language)
+        if fact_answer:
+            yield dict(meta, phase='final', response=fact_answer[0], source='facts', refined=False)
+            return
+
+        provisional = None
+        if intent != UNKNOWN_INTENT:
+            provisional = snapshot.knowledge_base.get_response(intent, language)
+
+        if provisional:
+            yield dict(meta, phase='provisional', response=provisional, source='knowledge_base')
+            if confidence >= settings.TWO_PHASE_SKIP_CONFIDENCE:
+                yield dict(meta, phase='final', response=provisional, source='knowledge_base', refined=False)
+                return
+
+        result = self.process_message(user_message, user_id, language, snapshot, deadline, priority)
+        yield dict(meta, phase='final', response=result['response'], source='gemini-pro', route=result['route'],
+                   refined=not result['degraded'], degraded=result['degraded'])
+
+def is_admin_request():
+    """X-Admin-Token matches ADMIN_TOKEN, or the request is local when no token is set"""
+    if settings.ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == settings.ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def admin_required(view):
+    """Require X-Admin-Token when ADMIN_TOKEN is set, otherwise localhost only"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+PROFILE_HEADER = 'X-Saarthi-Profile'
+
+def start_request_profile():
+    """Profile this request when an admin asks for it or it falls in the sample rate"""
+    requested = request.headers.get(PROFILE_HEADER) and is_admin_request()
+    sampled = settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE
+    if requested or sampled:
+        g.profiler = SamplingProfiler(interval=settings.PROFILE_INTERVAL_MS / 1000).start()
+
+def write_request_profile(outcome=''):
+    """Stop this request's profiler and write it out; returns the profile name, or None if not profiled"""
+    profiler = g.pop('profiler', None)
+    if not profiler:
+        return None
+    profiler.stop()
+    name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}{outcome}-{profiler.elapsed * 1000:.0f}ms-"
+            f"{uuid.uuid4().hex[:8]}")
+    profiler.write(settings.PROFILE_DIR, name)
+    logger.info(f"Profiled {request.path} into {name}")
+    return name
+
+def finish_request_profile(response):
+    # Streamed bodies are produced after this hook, so /chat/stream profiles cover setup only
+    name = write_request_profile()
+    if name:
+        response.headers[PROFILE_HEADER] = name
+    return response
+
+def teardown_request_profile(error=None):
+    # after_request is skipped when a view raises; the profiler of a failed request is written here
+    write_request_profile('-failed')
+
+# Hooks exist only when profiling is enabled, so disabled requests pay nothing
+if settings.PROFILING_ENABLED:
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(teardown_request_profile)
 
 # Initialize chatbot
-saarthi = SaarthiChatbot()
+saarthi = SaarthiChatbot(
+    reranker=create_reranker(),
+    store=create_response_store(),
+    dense_retriever=create_dense_retriever(),
+    conversations=create_conversation_store(),
+    analytics=create_query_analytics(),
+    recorder=create_traffic_recorder(),
+    llm_limiter=create_llm_limiter()
+)
+saarthi.snapshots.start_watching(settings.KB_WATCH_INTERVAL)
+memory_accountant = create_memory_accountant(saarthi)
+memory_accountant.start()
+if settings.MEMORY_TRACEMALLOC:
+    tracemalloc.start()
+cache_warmer = create_cache_warmer(saarthi)
+knowledge_export = create_knowledge_export(saarthi)
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
+def health_payload():
+    return {
         'status': 'healthy',
         'service': 'Saarthi - JECRC Chatbot',
         'version': '1.0',
         'gemini_api': 'connected' if GEMINI_API_KEY else 'not configured'
-    })
+    }
+
+def chat_payload(result, user_id):
+    """The /chat reply body, shared by HTTP and the socket channel"""
+    return {
+        'response': result['response'],
+        'status': 'success',
+        'rag_enabled': bool(result['sources']),  # For compatibility with backend service
+        'source': 'gemini-pro',
+        'language': result['language'],
+        'intent': result['intent'],
+        'confidence': result['confidence'],
+        'route': result['route'],
+        'degraded': result['degraded'],
+        'user_id': user_id
+    }
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify(health_payload())
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness with cache warm-up progress; 503 until the first pass ends if READY_AFTER_WARMUP"""
+    warmup = cache_warmer.status() if cache_warmer else None
+    is_ready = not (settings.READY_AFTER_WARMUP and cache_warmer and cache_warmer.passes == 0)
+    return jsonify({
+        'ready': is_ready,
+        'kb_version': saarthi.snapshots.current.version,
+        'warmup': warmup
+    }), 200 if is_ready else 503
+
+def parse_chat_request():
+    """Return (message, user_id, language, deadline, priority, error_response) for a chat POST body"""
+    data = request.get_json()
+    
+    if not data:
+        return None, None, None, None, None, (jsonify({'error': 'No data provided'}), 400)
+    
+    user_message = data.get('message', '').strip()
+    user_id = data.get('user_id', 'default')
+    language = data.get('language')
+    
+    if not user_message:
+        return None, None, None, None, None, (jsonify({'error': 'Empty message'}), 400)
+
+    try:
+        deadline = Deadline.from_headers(request.headers, settings.REQUEST_BUDGET_MS)
+    except ValueError as e:
+        return None, None, None, None, None, (jsonify({'error': str(e)}), 400)
+
+    priority = request.headers.get(PRIORITY_HEADER, PRIORITY_INTERACTIVE)
+    if priority not in PRIORITIES:
+        error = f"{PRIORITY_HEADER} must be one of {', '.join(PRIORITIES)}"
+        return None, None, None, None, None, (jsonify({'error': error}), 400)
+    
+    logger.info(f"Received message from {user_id}: {user_message}")
+    return user_message, user_id, language, deadline, priority, None
 
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        user_message = data.get('message', '').strip()
-        user_id = data.get('user_id', 'default')
-        language = data.get('language', 'en')
-        
-        if not user_message:
-            return jsonify({'error': 'Empty message'}), 400
-        
-        logger.info(f"Received message from {user_id}: {user_message}")
+        user_message, user_id, language, deadline, priority, error = parse_chat_request()
+        if error:
+            return error
         
         # Generate response
-        response = saarthi.generate_response(user_message, user_id, language)
+        result = saarthi.process_message(user_message, user_id, language, deadline=deadline, priority=priority)
         
-        return jsonify({
-            'response': response,
-            'status': 'success',
-            'rag_enabled': False,  # For compatibility with backend service
-            'source': 'gemini-pro',
-            'language': language,
-            'user_id': user_id
-        })
+        return jsonify(chat_payload(result, user_id))
         
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
@@ -179,14 +712,151 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Two-phase chat as NDJSON: a provisional KB answer, then the final answer"""
+    try:
+        user_message, user_id, language, deadline, priority, error = parse_chat_request()
+        if error:
+            return error
+    except Exception as e:
+        logger.error(f"Chat stream endpoint error: {str(e)}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
+    def generate():
+        try:
+            for phase in saarthi.process_two_phase(user_message, user_id, language, deadline, priority):
+                phase.update(status='success', user_id=user_id)
+                yield json.dumps(phase, ensure_ascii=False) + '\n'
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}")
+            yield json.dumps({
+                'phase': 'final',
+                'response': 'I apologize, but I encountered an error processing your request. Please try again.',
+                'status': 'error',
+                'error': str(e)
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/admin/reload', methods=['POST'])
+@admin_required
+def admin_reload():
+    """Rebuild the knowledge snapshot in the background and swap it in"""
+    saarthi.snapshots.reload_async()
+    return jsonify({
+        'status': 'reloading',
+        'current': saarthi.snapshots.current.describe()
+    }), 202
+
+@app.route('/admin/knowledge', methods=['GET'])
+@admin_required
+def admin_knowledge():
+    return jsonify({
+        'current': saarthi.snapshots.current.describe(),
+        'last_error': saarthi.snapshots.last_error,
+        'rerank': saarthi.reranker.stats() if saarthi.reranker else None,
+        'normalizer': normalizer.cache_info(),
+        'query_translation': translation.cache_info(),
+        'response_store': saarthi.store.stats() if saarthi.store else None,
+        'router': saarthi.router.stats(),
+        'deadlines': saarthi.deadline_stats.stats(),
+        'llm_limiter': saarthi.llm_limiter.stats() if saarthi.llm_limiter else None,
+        'generation_profiles': dict(saarthi.snapshots.current.generation_profiles.to_dict(),
+                                    stats=saarthi.profile_stats.stats()),
+        'conversations': saarthi.conversations.stats(),
+        'traffic_recorder': saarthi.recorder.stats() if saarthi.recorder else None
+    })
+
+@app.route('/admin/knowledge/export', methods=['GET'])
+@admin_required
+def admin_knowledge_export():
+    """Intents, answers and facts changed after revision ?since=N, as NDJSON headed by the current revision"""
+    if not knowledge_export:
+        return jsonify({'error': 'Knowledge export is disabled'}), 404
+    since = request.args.get('since', default=0, type=int)
+    lines = knowledge_export.stream(since, saarthi.snapshots.current.kb_version)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+@app.route('/admin/analytics', methods=['GET'])
+@admin_required
+def admin_analytics():
+    """Heaviest queries, optionally within ?by=language|intent|route&value=..., ?scope=all merges every worker"""
+    if not saarthi.analytics:
+        return jsonify({'error': 'Query analytics are disabled'}), 404
+    analytics = saarthi.analytics
+    if request.args.get('scope') == 'all' and analytics.snapshot_dir:
+        analytics = analytics.merged()
+    top = request.args.get('top', default=20, type=int)
+    return jsonify(analytics.report(top, request.args.get('by'), request.args.get('value')))
+
+def channel_chat(frame):
+    """Chat frame handler for the socket channel, validated like POST /chat"""
+    user_message = (frame.get('message') or '').strip()
+    if not user_message:
+        return {'status': 'error', 'error': 'Empty message'}
+    user_id = frame.get('user_id', 'default')
+    budget_ms = frame.get('budget_ms') or settings.REQUEST_BUDGET_MS
+    deadline = Deadline(float(budget_ms)) if budget_ms else None
+    priority = frame.get('priority') if frame.get('priority') in PRIORITIES else PRIORITY_INTERACTIVE
+    result = saarthi.process_message(user_message, user_id, frame.get('language'), deadline=deadline,
+                                     priority=priority)
+    return chat_payload(result, user_id)
+
+def channel_heartbeat():
+    return dict(health_payload(), kb_version=saarthi.snapshots.current.version)
+
+def start_channel():
+    """Serve the socket channel from this worker unless another one already does"""
+    if not settings.CHANNEL_SOCKET_PATH:
+        return None
+    server = ChannelServer(
+        settings.CHANNEL_SOCKET_PATH,
+        {'chat': channel_chat, 'health': lambda frame: health_payload()},
+        channel_heartbeat,
+        workers=settings.CHANNEL_WORKERS,
+        heartbeat_interval=settings.CHANNEL_HEARTBEAT_INTERVAL,
+        max_pending=settings.CHANNEL_MAX_PENDING
+    )
+    return server if server.start() else None
+
+channel = start_channel()
+
+@app.route('/admin/memory', methods=['GET'])
+@admin_required
+def admin_memory():
+    """Per-component bytes against the budget, plus tracemalloc top allocators when tracing"""
+    top = request.args.get('top', default=10, type=int)
+    return jsonify(memory_accountant.report(top))
+
+@app.route('/admin/memory/tracemalloc', methods=['POST'])
+@admin_required
+def admin_tracemalloc():
+    """Start (optionally with {"frames": n}) or stop tracemalloc; tracing slows allocation"""
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(int(data.get('frames', 1)))
+    else:
+        tracemalloc.stop()
+    return jsonify({'tracing': tracemalloc.is_tracing()})
+
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({
         'message': 'Saarthi - JECRC Chatbot API',
         'endpoints': {
             '/health': 'GET - Health check',
+            '/ready': 'GET - Readiness and cache warm-up progress',
             '/chat': 'POST - Chat with Saarthi',
+            '/chat/stream': 'POST - Two-phase chat (provisional KB answer, then final answer) as NDJSON',
+            '/admin/reload': 'POST - Reload knowledge base and system prompt',
+            '/admin/knowledge': 'GET - Current knowledge snapshot',
+            '/admin/knowledge/export': 'GET - Intents, answers and facts changed since ?since=N as NDJSON',
+            '/admin/memory': 'GET - Memory per component and top allocators',
+            '/admin/analytics': 'GET - Most frequent queries by language, intent and route',
         },
+        'channel': channel.path if channel else None,
         'version': '1.0'
     })
 
@@ -0,0 +1,73 @@
+"""In-memory response cache for Saarthi"""
+
+import threading
+from collections import OrderedDict
+
+from memory import approx_size
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of generated answers
+
+    One cache belongs to one knowledge snapshot, so entries never outlive the
+    KB and prompt version they were generated from. The approximate size of
+    its entries is tracked so the memory accountant can shrink it.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, approximate bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        size = approx_size(key) + approx_size(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        _, (_, size) = self._entries.popitem(last=False)
+        self.bytes -= size
+        self.evictions += 1
+        return size
+
+    def shrink(self, target_bytes):
+        """Evict least recently used entries until at most target_bytes remain; returns bytes freed"""
+        freed = 0
+        with self._lock:
+            while self._entries and self.bytes > target_bytes:
+                freed += self._evict_oldest()
+        return freed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'bytes': self.bytes, 'evictions': self.evictions}
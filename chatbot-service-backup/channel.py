@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Persistent multiplexed channel for the Express backend over a Unix socket
+
+Each frame is a 4-byte big-endian length followed by a UTF-8 JSON object.
+Requests carry an `id` that the matching reply echoes, so any number of chats
+share one connection and replies may come back out of order:
+
+    -> {"id": 7, "type": "chat", "message": "...", "user_id": "...", "language": "hi"}
+    <- {"id": 7, "type": "chat", "response": "...", "status": "success", ...}
+
+`chat` requests may carry `budget_ms`, the X-Request-Budget-Ms of HTTP
+/chat (deadline.py). `chat` replies carry the same fields as HTTP /chat,
+`health` replies the /health body, and `ping` is answered at once for
+transport measurements. The server also pushes {"type": "heartbeat", ...}
+frames so the client knows the service is up without polling /health.
+
+One worker per node serves the socket: the one holding an exclusive flock on
+`<path>.lock`, which only that worker may unlink and re-bind the path under.
+Frames beyond `max_pending` waiting for or running on the worker pool are
+answered at once with {"status": "error", "shed": "queue_full"} instead of
+queueing without limit behind a slow LLM.
+
+    python channel.py benchmark [--requests 500]   # channel vs HTTP per-message overhead
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 1024 * 1024
+
+
+def encode_frame(payload):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(len(body)) + body
+
+
+def read_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_frame(sock):
+    """Next decoded frame, or None when the peer closed the connection"""
+    header = read_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"frame of {size} bytes exceeds {MAX_FRAME_BYTES}")
+    body = read_exact(sock, size)
+    if body is None:
+        return None
+    return json.loads(body.decode('utf-8'))
+
+
+class Connection:
+    """One client socket; replies and heartbeats share a write lock"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.write_lock = threading.Lock()
+        self.open = True
+
+    def send(self, payload):
+        frame = encode_frame(payload)
+        with self.write_lock:
+            self.sock.sendall(frame)
+
+    def close(self):
+        self.open = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ChannelServer:
+    """Serves chat, health and ping frames through `handlers` on a worker pool
+
+    `handlers` maps a frame type to a function taking the request frame and
+    returning the reply body; `heartbeat` returns the body pushed every
+    `heartbeat_interval` seconds.
+    """
+
+    def __init__(self, path, handlers, heartbeat, workers=16, heartbeat_interval=5.0, max_pending=256):
+        self.path = path
+        self.handlers = handlers
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='channel')
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._bind_lock = None
+        self.frames = 0
+        self.pending = 0  # frames queued for or running on the pool
+        self.shed = 0
+
+    def start(self):
+        """Bind and serve in background threads; False when another worker already serves the path"""
+        bind_lock = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(bind_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            bind_lock.close()
+            logger.info(f"Channel {self.path} is already served by another worker")
+            return False
+
+        # The lock dies with its holder, so a socket file found now was left by a dead process
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            listener.bind(self.path)
+            listener.listen(64)
+        except OSError as e:
+            listener.close()
+            bind_lock.close()
+            logger.info(f"Channel {self.path} not bound: {e}")
+            return False
+        self._bind_lock = bind_lock
+        self._listener = listener
+
+        threading.Thread(target=self._accept_loop, name='channel-accept', daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, name='channel-heartbeat', daemon=True).start()
+        logger.info(f"Channel listening on {self.path}")
+        return True
+
+    def stop(self):
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+        if self._bind_lock:
+            # Unlink while still holding the lock, so no other worker's fresh socket is removed
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._bind_lock.close()
+            self._bind_lock = None
+
+    def _accept_loop(self):
+        while self._listener:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            connection = Connection(sock)
+            with self._lock:
+                self.connections.add(connection)
+            threading.Thread(target=self._read_loop, args=(connection,), name='channel-reader', daemon=True).start()
+
+    def _read_loop(self, connection):
+        try:
+            while connection.open:
+                frame = read_frame(connection.sock)
+                if frame is None:
+                    break
+                self.frames += 1
+                if frame.get('type') == 'ping':
+                    connection.send({'id': frame.get('id'), 'type': 'ping'})
+                    continue
+                with self._lock:
+                    admitted = self.pending < self.max_pending
+                    if admitted:
+                        self.pending += 1
+                    else:
+                        self.shed += 1
+                if admitted:
+                    self.pool.submit(self._dispatch, connection, frame)
+                else:
+                    connection.send({'id': frame.get('id'), 'type': frame.get('type'), 'status': 'error',
+                                     'error': 'Channel overloaded', 'shed': 'queue_full'})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Channel connection dropped: {e}")
+        finally:
+            connection.close()
+            with self._lock:
+                self.connections.discard(connection)
+
+    def _dispatch(self, connection, frame):
+        kind = frame.get('type')
+        handler = self.handlers.get(kind)
+        try:
+            if handler is None:
+                body = {'status': 'error', 'error': f"Unknown frame type: {kind}"}
+            else:
+                body = handler(frame)
+        except Exception as e:
+            logger.error(f"Channel {kind} handler error: {str(e)}")
+            body = {'status': 'error', 'error': str(e)}
+        finally:
+            with self._lock:
+                self.pending -= 1
+        try:
+            connection.send(dict(body, id=frame.get('id'), type=kind))
+        except OSError:
+            connection.close()
+
+    def _heartbeat_loop(self):
+        while self._listener:
+            time.sleep(self.heartbeat_interval)
+            try:
+                beat = dict(self.heartbeat(), type='heartbeat', ts=time.time())
+            except Exception as e:
+                beat = {'type': 'heartbeat', 'ts': time.time(), 'status': 'unhealthy', 'error': str(e)}
+            with self._lock:
+                connections = list(self.connections)
+            for connection in connections:
+                try:
+                    connection.send(beat)
+                except OSError:
+                    connection.close()
+
+
+class ChannelClient:
+    """Multiplexing client: many callers share one connection, replies matched by id"""
+
+    def __init__(self, path, timeout=15.0, sock=None):
+        """Connect to `path`, or use the already connected `sock`"""
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(path)
+        self.sock = sock
+        self.timeout = timeout
+        self.write_lock = threading.Lock()
+        self.pending = {}
+        self.next_id = 0
+        self.last_heartbeat = None
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read_loop, name='channel-client', daemon=True).start()
+
+    def request(self, kind, **fields):
+        with self._lock:
+            self.next_id += 1
+            request_id = self.next_id
+            future = self.pending[request_id] = Future()
+        frame = encode_frame(dict(fields, id=request_id, type=kind))
+        with self.write_lock:
+            self.sock.sendall(frame)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.pending.pop(request_id, None)
+            raise
+
+    def _read_loop(self):
+        while True:
+            try:
+                frame = read_frame(self.sock)
+            except OSError:
+                frame = None
+            if frame is None:
+                with self._lock:
+                    for future in self.pending.values():
+                        future.set_exception(ConnectionError('channel closed'))
+                    self.pending.clear()
+                return
+            if frame.get('type') == 'heartbeat':
+                self.last_heartbeat = frame
+                continue
+            with self._lock:
+                future = self.pending.pop(frame.get('id'), None)
+            if future:
+                future.set_result(frame)
+
+    def close(self):
+        self.sock.close()
+
+
+def measure(call, requests, workers):
+    """Mean and percentile latency in ms of `requests` calls spread over `workers` threads"""
+    samples = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        'mean': sum(samples) / len(samples),
+        'p50': samples[len(samples) // 2],
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'rps': requests / elapsed
+    }
+
+
+def main(argv=None):
+    from config import get_config
+
+    settings = get_config()
+    parser = argparse.ArgumentParser(description='Benchmark the Unix socket channel against HTTP')
+    parser.add_argument('command', choices=['benchmark'])
+    parser.add_argument('--socket', default=settings.CHANNEL_SOCKET_PATH)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--message', default='library timing on Sunday')
+    args = parser.parse_args(argv)
+
+    import requests
+
+    client = ChannelClient(args.socket)
+    session = requests.Session()  # keep-alive, the kinder comparison for HTTP
+    body = {'message': args.message, 'user_id': 'benchmark', 'language': 'en'}
+
+    cases = [
+        ('ping', lambda: client.request('ping'),
+         lambda: session.get(f"{args.url}/health", timeout=15)),
+        ('chat', lambda: client.request('chat', **body),
+         lambda: session.post(f"{args.url}/chat", json=body, timeout=15)),
+    ]
+    print(f"📡 {args.requests} requests x {args.workers} workers, message {args.message!r}")
+    for name, over_channel, over_http in cases:
+        for transport, call in (('channel', over_channel), ('http', over_http)):
+            stats = measure(call, args.requests, args.workers)
+            print(f"   {name:<5} {transport:<8} mean {stats['mean']:.3f} ms   p50 {stats['p50']:.3f}   "
+                  f"p95 {stats['p95']:.3f}   {stats['rps']:.0f} req/s")
+    client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
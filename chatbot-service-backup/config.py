@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     """Base configuration class"""
     
@@ -15,7 +17,7 @@ class Config:
     
     # Gemini API Configuration
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-    MODEL_NAME = os.environ.get('MODEL_NAME') or 'gemini-pro'
+    MODEL_NAME = os.environ.get('MODEL_NAME') or 'gemini-2.5-flash'
     
     # College Information
     COLLEGE_NAME = os.environ.get('COLLEGE_NAME') or 'JECRC University'
@@ -25,6 +27,144 @@ class Config:
     MAX_MESSAGE_LENGTH = 1000
     CONVERSATION_HISTORY_LIMIT = 10
     
+    # Admin endpoints (localhost only when no token is set)
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    
+    # Knowledge hot reload and response caching
+    KB_WATCH_INTERVAL = float(os.environ.get('KB_WATCH_INTERVAL', '2'))  # seconds, 0 disables
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '1000'))
+    
+    # Persistent response store shared by workers (empty path disables it)
+    RESPONSE_STORE_PATH = os.environ.get('RESPONSE_STORE_PATH', os.path.join(SERVICE_DIR, 'response_store.sqlite3'))
+    RESPONSE_STORE_TTL = int(os.environ.get('RESPONSE_STORE_TTL', str(7 * 24 * 3600)))  # seconds
+    RESPONSE_STORE_WARM_ENTRIES = int(os.environ.get('RESPONSE_STORE_WARM_ENTRIES', '500'))
+    RESPONSE_STORE_RETAIN_VERSIONS = int(os.environ.get('RESPONSE_STORE_RETAIN_VERSIONS', '3'))  # kept on a KB swap
+    
+    # Revision log behind the incremental NDJSON knowledge export (empty path disables it)
+    KNOWLEDGE_EXPORT_PATH = os.environ.get('KNOWLEDGE_EXPORT_PATH',
+                                           os.path.join(SERVICE_DIR, 'knowledge_export.sqlite3'))
+    
+    # Background cache pre-warming after startup and reloads (intents in en/hi/raj plus top stored queries).
+    # Off by default: every pass makes real Gemini calls. Workers sharing WARMUP_LOCK_PATH warm one at a time
+    # and the others read the answers from the response store
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'false').lower() == 'true'
+    WARMUP_LOCK_PATH = os.environ.get('WARMUP_LOCK_PATH', os.path.join(SERVICE_DIR, 'warmup.lock'))
+    WARMUP_WORKERS = int(os.environ.get('WARMUP_WORKERS', '2'))
+    WARMUP_RATE = float(os.environ.get('WARMUP_RATE', '1'))  # warm-up queries per second, 0 unlimited
+    WARMUP_TOP_N = int(os.environ.get('WARMUP_TOP_N', '200'))
+    READY_AFTER_WARMUP = os.environ.get('READY_AFTER_WARMUP', 'false').lower() == 'true'
+    
+    # Opt-in anonymized traffic traces for replay.py (empty path disables recording)
+    TRAFFIC_RECORD_PATH = os.environ.get('TRAFFIC_RECORD_PATH', '')
+    TRAFFIC_SALT = os.environ.get('TRAFFIC_SALT')  # keyed user hashes, share it across workers
+    
+    # Stubbed LLM for offline load replay: fixed answer after LLM_STUB_LATENCY seconds
+    LLM_STUB = os.environ.get('LLM_STUB', 'false').lower() == 'true'
+    LLM_STUB_LATENCY = float(os.environ.get('LLM_STUB_LATENCY', '0'))
+    
+    # Heavy-hitter query analytics in fixed memory, snapshotted per worker (empty dir disables snapshots)
+    ANALYTICS_ENABLED = os.environ.get('ANALYTICS_ENABLED', 'true').lower() == 'true'
+    ANALYTICS_CAPACITY = int(os.environ.get('ANALYTICS_CAPACITY', '500'))
+    ANALYTICS_GROUP_CAPACITY = int(os.environ.get('ANALYTICS_GROUP_CAPACITY', '100'))
+    ANALYTICS_SNAPSHOT_DIR = os.environ.get('ANALYTICS_SNAPSHOT_DIR', os.path.join(SERVICE_DIR, 'analytics'))
+    ANALYTICS_SNAPSHOT_INTERVAL = float(os.environ.get('ANALYTICS_SNAPSHOT_INTERVAL', '300'))  # seconds
+    # Snapshots of exited workers, or not rewritten for this long, drop out of the merged report
+    ANALYTICS_SNAPSHOT_RETENTION = float(os.environ.get('ANALYTICS_SNAPSHOT_RETENTION', str(24 * 3600)))  # seconds
+    
+    # Retrieval and optional cross-encoder reranking (needs sentence-transformers)
+    RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', '3'))
+    # Append English glossary terms to hi/raj queries before lexical search (translation.py)
+    QUERY_TRANSLATION = os.environ.get('QUERY_TRANSLATION', 'true').lower() == 'true'
+    RERANK_ENABLED = os.environ.get('RERANK_ENABLED', 'false').lower() == 'true'
+    RERANK_MODEL = os.environ.get('RERANK_MODEL') or 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+    RERANK_CANDIDATES = int(os.environ.get('RERANK_CANDIDATES', '20'))
+    RERANK_BUDGET_MS = float(os.environ.get('RERANK_BUDGET_MS', '150'))
+    RERANK_SKIP_MARGIN = float(os.environ.get('RERANK_SKIP_MARGIN', '0.35'))  # relative top-1 lead
+    
+    # Dense embeddings of knowledge chunks (needs sentence-transformers)
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL') or 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+    EMBEDDING_DIR = os.environ.get('EMBEDDING_DIR', os.path.join(SERVICE_DIR, 'embeddings'))
+    
+    # Shared model server (model_server.py) holding the embedding and rerank models once per node;
+    # empty loads the models in every worker
+    MODEL_SERVER_SOCKET = os.environ.get('MODEL_SERVER_SOCKET', '')
+    MODEL_SERVER_MAX_BATCH = int(os.environ.get('MODEL_SERVER_MAX_BATCH', '64'))
+    MODEL_SERVER_MAX_WAIT_MS = float(os.environ.get('MODEL_SERVER_MAX_WAIT_MS', '5'))
+    MODEL_SERVER_WORKERS = int(os.environ.get('MODEL_SERVER_WORKERS', '64'))
+    
+    # Dense retrieval through the IVF-flat index built by ann_index.py
+    DENSE_RETRIEVAL_ENABLED = os.environ.get('DENSE_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+    ANN_NPROBE = int(os.environ.get('ANN_NPROBE', '8'))
+    # Scan int8 or pq codes saved by `quantization.py --save` instead of the float vectors ('' = floats),
+    # re-scoring the best k * ANN_RESCORE candidates exactly
+    ANN_QUANTIZATION = os.environ.get('ANN_QUANTIZATION', '')
+    ANN_RESCORE = int(os.environ.get('ANN_RESCORE', '4'))
+    
+    # Request time budgets (deadline.py): default for /chat calls without a budget header (0 = unbounded),
+    # time kept back to send the reply, the least worth starting an LLM call with, and the share of what
+    # is left that dense retrieval and reranking may spend
+    REQUEST_BUDGET_MS = float(os.environ.get('REQUEST_BUDGET_MS', '14000'))
+    DEADLINE_RESERVE_MS = float(os.environ.get('DEADLINE_RESERVE_MS', '50'))
+    DEADLINE_MIN_LLM_MS = float(os.environ.get('DEADLINE_MIN_LLM_MS', '1000'))
+    DEADLINE_RETRIEVAL_SHARE = float(os.environ.get('DEADLINE_RETRIEVAL_SHARE', '0.2'))
+    DEADLINE_MIN_DENSE_MS = float(os.environ.get('DEADLINE_MIN_DENSE_MS', '50'))
+    
+    # Adaptive concurrency limit for Gemini calls (llm_limiter.py): AIMD between min and max, backed off
+    # on 429s and calls slower than the latency target (0 = 429s only); calls over the limit queue,
+    # interactive before batch, and are shed past the queue size or wait
+    LLM_LIMITER_ENABLED = os.environ.get('LLM_LIMITER_ENABLED', 'true').lower() == 'true'
+    LLM_CONCURRENCY_INITIAL = int(os.environ.get('LLM_CONCURRENCY_INITIAL', '8'))
+    LLM_CONCURRENCY_MIN = int(os.environ.get('LLM_CONCURRENCY_MIN', '1'))
+    LLM_CONCURRENCY_MAX = int(os.environ.get('LLM_CONCURRENCY_MAX', '64'))
+    LLM_CONCURRENCY_BACKOFF = float(os.environ.get('LLM_CONCURRENCY_BACKOFF', '0.7'))
+    LLM_LATENCY_TARGET_MS = float(os.environ.get('LLM_LATENCY_TARGET_MS', '10000'))
+    LLM_QUEUE_SIZE = int(os.environ.get('LLM_QUEUE_SIZE', '256'))
+    LLM_QUEUE_MAX_WAIT_MS = float(os.environ.get('LLM_QUEUE_MAX_WAIT_MS', '10000'))
+    
+    # Two-phase answers: KB answers at or above this confidence are not refined by the LLM
+    TWO_PHASE_SKIP_CONFIDENCE = int(os.environ.get('TWO_PHASE_SKIP_CONFIDENCE', '93'))
+    
+    # Conversation history shared by all workers: memory, sqlite or redis
+    CONVERSATION_BACKEND = os.environ.get('CONVERSATION_BACKEND', 'sqlite')
+    CONVERSATION_DB_PATH = os.environ.get('CONVERSATION_DB_PATH', os.path.join(SERVICE_DIR, 'conversations.sqlite3'))
+    CONVERSATION_REDIS_URL = os.environ.get('CONVERSATION_REDIS_URL', 'redis://localhost:6379/0')
+    CONVERSATION_TTL = int(os.environ.get('CONVERSATION_TTL', str(24 * 3600)))  # seconds since the last turn
+    CONVERSATION_CACHE_TTL = float(os.environ.get('CONVERSATION_CACHE_TTL', '2'))  # local read-through cache
+    
+    # Persistent Unix socket channel for the Express backend (empty path disables it)
+    CHANNEL_SOCKET_PATH = os.environ.get('CHANNEL_SOCKET_PATH', os.path.join(SERVICE_DIR, 'saarthi.sock'))
+    CHANNEL_WORKERS = int(os.environ.get('CHANNEL_WORKERS', '16'))
+    CHANNEL_MAX_PENDING = int(os.environ.get('CHANNEL_MAX_PENDING', '256'))  # queued frames before shedding
+    CHANNEL_HEARTBEAT_INTERVAL = float(os.environ.get('CHANNEL_HEARTBEAT_INTERVAL', '5'))  # seconds
+    
+    # Sampling profiler for single requests, triggered by the X-Saarthi-Profile header
+    # (admin only) or a sample rate; disabled means no request hooks at all
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # share of requests, 0-1
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '1'))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(SERVICE_DIR, 'profiles'))
+    
+    # Memory accounting: components are shrunk, least valuable first, above the budget
+    MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', '256'))  # 0 only accounts
+    MEMORY_CHECK_INTERVAL = float(os.environ.get('MEMORY_CHECK_INTERVAL', '5'))  # seconds
+    MEMORY_TRACEMALLOC = os.environ.get('MEMORY_TRACEMALLOC', 'false').lower() == 'true'
+    
+    # Query router thresholds, tuned offline with `evaluate.py --router name=value`
+    ROUTER_KB_CONFIDENCE = int(os.environ.get('ROUTER_KB_CONFIDENCE', '93'))  # canned KB answer at or above
+    ROUTER_KB_MAX_TERMS = int(os.environ.get('ROUTER_KB_MAX_TERMS', '6'))
+    ROUTER_SHORT_CONFIDENCE = int(os.environ.get('ROUTER_SHORT_CONFIDENCE', '85'))  # short generation at or above
+    ROUTER_SHORT_MAX_TERMS = int(os.environ.get('ROUTER_SHORT_MAX_TERMS', '12'))
+    ROUTER_SHORT_MAX_TOKENS = int(os.environ.get('ROUTER_SHORT_MAX_TOKENS', '256'))
+    ROUTER_FACTS_MAX_TERMS = int(os.environ.get('ROUTER_FACTS_MAX_TERMS', '8'))
+    
+    # A stubbed LLM must not reach the shared state real instances read: its fake answers would be stored
+    # and warmed under the real kb/prompt versions and mixed into conversation history
+    if LLM_STUB:
+        RESPONSE_STORE_PATH = ''
+        CONVERSATION_BACKEND = 'memory'
+        ANALYTICS_SNAPSHOT_DIR = ''
+        KNOWLEDGE_EXPORT_PATH = ''
+    
     # JECRC-specific context for Gemini
     COLLEGE_CONTEXT = f"""
     You are an intelligent assistant for {COLLEGE_NAME} located in {COLLEGE_LOCATION}.
@@ -0,0 +1,285 @@
+"""Conversation history shared by every chat worker
+
+The backend sends the session id as `user_id`, and any worker may receive the
+next turn, so history cannot live in one process. ConversationStore keeps it
+in a pluggable backend:
+
+- memory  a dict in this process (single worker, tests)
+- sqlite  one WAL database file shared by the workers of a node
+- redis   any Redis-compatible server reachable at CONVERSATION_REDIS_URL
+
+Turns are stored as compact JSON arrays. Appends are atomic in the backend
+(a write transaction in SQLite, MULTI/EXEC on Redis), so turns written by
+different workers are never lost; reads go through a small local cache with
+a short TTL so a burst of turns does not cost a round trip each. Expired
+sessions are swept by the writes in memory and SQLite, by the server in Redis.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from memory import approx_size
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 300  # seconds between sweeps of expired sessions, run by the next write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id TEXT PRIMARY KEY,
+    turns TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS conversations_expiry ON conversations (expires_at);
+"""
+
+
+def encode_turns(turns):
+    """[(role, text), ...] as a compact JSON array"""
+    return json.dumps(turns, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_turns(payload):
+    if not payload:
+        return []
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    return [tuple(turn) for turn in json.loads(payload)]
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, purge_interval=PURGE_INTERVAL):
+        self._data = {}  # user_id -> (turns, expires_at)
+        self._lock = threading.Lock()
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+
+    def load(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+        if entry is None or entry[1] <= time.time():
+            return []
+        return list(entry[0])
+
+    def append(self, user_id, new_turns, limit, ttl_seconds):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(user_id)
+            turns = list(entry[0]) if entry and entry[1] > now else []
+            turns = (turns + new_turns)[-limit:]
+            self._data[user_id] = (turns, now + ttl_seconds)
+            if now >= self._next_purge:
+                self._purge(now)
+        return turns
+
+    def delete(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def _purge(self, now):
+        self._data = {user_id: entry for user_id, entry in self._data.items() if entry[1] > now}
+        self._next_purge = now + self.purge_interval
+
+    def memory_bytes(self):
+        with self._lock:
+            return approx_size(self._data, depth=5)
+
+    def shrink(self, target_bytes):
+        """Drop expired sessions, then the ones closest to expiry; returns bytes freed"""
+        with self._lock:
+            size = approx_size(self._data, depth=5)
+            if size <= target_bytes:
+                return 0
+            self._purge(time.time())
+            remaining = approx_size(self._data, depth=5)
+            if remaining > target_bytes and self._data:
+                drop = int((remaining - target_bytes) / (remaining / len(self._data))) + 1
+                for user_id, _ in sorted(self._data.items(), key=lambda item: item[1][1])[:drop]:
+                    del self._data[user_id]
+            return size - approx_size(self._data, depth=5)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, path, purge_interval=PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0  # purge leftovers of earlier runs on the first write
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def load(self, user_id):
+        row = self._conn().execute(
+            'SELECT turns FROM conversations WHERE user_id = ? AND expires_at > ?',
+            (user_id, time.time())
+        ).fetchone()
+        return decode_turns(row[0] if row else None)
+
+    def append(self, user_id, new_turns, limit, ttl_seconds):
+        conn = self._conn()
+        now = time.time()
+        # IMMEDIATE takes the write lock before reading, so workers appending to one session serialise
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT turns FROM conversations WHERE user_id = ? AND expires_at > ?',
+                               (user_id, now)).fetchone()
+            turns = (decode_turns(row[0] if row else None) + new_turns)[-limit:]
+            conn.execute('INSERT OR REPLACE INTO conversations (user_id, turns, expires_at) VALUES (?, ?, ?)',
+                         (user_id, encode_turns(turns), now + ttl_seconds))
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                conn.execute('DELETE FROM conversations WHERE expires_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return turns
+
+    def delete(self, user_id):
+        self._conn().execute('DELETE FROM conversations WHERE user_id = ?', (user_id,))
+
+    def purge_expired(self):
+        return self._conn().execute('DELETE FROM conversations WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+class RedisBackend:
+    """Any server speaking the Redis protocol; one list of JSON turns per session, expired by the server"""
+
+    name = 'redis'
+    KEY_PREFIX = 'saarthi:turns:'
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.client.ping()
+
+    def load(self, user_id):
+        return [tuple(json.loads(item)) for item in self.client.lrange(self.KEY_PREFIX + user_id, 0, -1)]
+
+    def append(self, user_id, new_turns, limit, ttl_seconds):
+        key = self.KEY_PREFIX + user_id
+        # MULTI/EXEC: concurrent appends from other workers land whole and in order
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.rpush(key, *[encode_turns(turn) for turn in new_turns])
+        pipeline.ltrim(key, -limit, -1)
+        pipeline.expire(key, int(ttl_seconds))
+        pipeline.lrange(key, 0, -1)
+        items = pipeline.execute()[-1]
+        return [tuple(json.loads(item)) for item in items]
+
+    def delete(self, user_id):
+        self.client.delete(self.KEY_PREFIX + user_id)
+
+
+def create_backend(name, sqlite_path=None, redis_url=None):
+    if name == 'sqlite':
+        return SQLiteBackend(sqlite_path)
+    if name == 'redis':
+        return RedisBackend(redis_url)
+    if name == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"Unknown conversation backend: {name}")
+
+
+class ConversationStore:
+    """Recent turns per user, read through a short-lived local cache"""
+
+    def __init__(self, backend, history_limit=10, ttl_seconds=24 * 3600, cache_ttl=2.0, cache_size=10000):
+        self.backend = backend
+        self.history_limit = history_limit
+        self.ttl_seconds = ttl_seconds
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = {}  # user_id -> (expires_at, turns)
+        self._lock = threading.Lock()
+        self.backend_reads = 0
+        self.cache_hits = 0
+
+    def history(self, user_id):
+        """Recent (role, text) turns, oldest first"""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(user_id)
+        if entry and entry[0] > now:
+            self.cache_hits += 1
+            return entry[1]
+
+        self.backend_reads += 1
+        try:
+            turns = self.backend.load(user_id)
+        except Exception as e:
+            logger.warning(f"Conversation load failed for {user_id}: {e}")
+            turns = []
+        self._remember(user_id, turns, now)
+        return turns
+
+    def append(self, user_id, user_message, response):
+        """Add one exchange to the backend's history, bypassing the local cache, and cache the result"""
+        exchange = [('user', user_message), ('assistant', response)]
+        try:
+            turns = self.backend.append(user_id, exchange, 2 * self.history_limit, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Conversation save failed for {user_id}: {e}")
+            with self._lock:
+                self._cache.pop(user_id, None)
+            return exchange
+        self._remember(user_id, turns, time.time())
+        return turns
+
+    def clear(self, user_id):
+        self.backend.delete(user_id)
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def _remember(self, user_id, turns, now):
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                # Drop expired entries first, and everything if that is not enough
+                self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+                if len(self._cache) >= self.cache_size:
+                    self._cache.clear()
+            self._cache[user_id] = (now + self.cache_ttl, turns)
+
+    def memory_bytes(self):
+        with self._lock:
+            return approx_size(self._cache, depth=5)
+
+    def shrink(self, target_bytes):
+        """Drop locally cached histories, soonest to expire first; the backend keeps them"""
+        with self._lock:
+            size = approx_size(self._cache, depth=5)
+            if size <= target_bytes:
+                return 0
+            average = size / len(self._cache)
+            drop = int((size - target_bytes) / average) + 1
+            for user_id, _ in sorted(self._cache.items(), key=lambda item: item[1][0])[:drop]:
+                del self._cache[user_id]
+            return size - approx_size(self._cache, depth=5)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'cached_users': len(self._cache),
+            'cache_hits': self.cache_hits,
+            'backend_reads': self.backend_reads
+        }
@@ -0,0 +1,76 @@
+"""Per-request time budgets carried from the caller through every pipeline stage
+
+The backend gives up on a chat call after a fixed time. It sends what is
+left of that as a header, and the pipeline spends it stage by stage instead
+of finishing answers nobody waits for:
+
+    X-Request-Budget-Ms: 14000           milliseconds from now (preferred, immune to clock skew)
+    X-Request-Deadline: 1760000014000    absolute unix time in milliseconds
+
+Both may be sent; the earlier one wins. Without either, /chat uses
+REQUEST_BUDGET_MS. Cheap paths (facts, cache, KB) always run. Dense retrieval
+and reranking only get a share of what remains, and the LLM call carries the
+rest as its request timeout, so Gemini stops generating when the caller has
+gone. When the budget cannot cover a stage, the request is answered from the
+best cheap source instead and marked degraded.
+"""
+
+import threading
+import time
+from collections import Counter
+
+BUDGET_HEADER = 'X-Request-Budget-Ms'
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+
+class Deadline:
+    """Point in time by which the answer must be on its way back"""
+
+    __slots__ = ('expires_at', 'budget_ms')
+
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.expires_at = time.perf_counter() + budget_ms / 1000
+
+    @classmethod
+    def from_headers(cls, headers, default_ms=0):
+        """Deadline from the request headers, the default budget, or None for no limit"""
+        budgets = []
+        try:
+            if headers.get(BUDGET_HEADER):
+                budgets.append(float(headers[BUDGET_HEADER]))
+            if headers.get(DEADLINE_HEADER):
+                budgets.append(float(headers[DEADLINE_HEADER]) - time.time() * 1000)
+        except ValueError:
+            raise ValueError(f"{BUDGET_HEADER} and {DEADLINE_HEADER} must be numbers of milliseconds")
+        if not budgets:
+            return cls(default_ms) if default_ms > 0 else None
+        return cls(max(0.0, min(budgets)))
+
+    def remaining_ms(self):
+        return max(0.0, (self.expires_at - time.perf_counter()) * 1000)
+
+    @property
+    def expired(self):
+        return time.perf_counter() >= self.expires_at
+
+    def share_ms(self, share, cap_ms=None):
+        """`share` of the remaining budget, at most `cap_ms`"""
+        budget = self.remaining_ms() * share
+        return budget if cap_ms is None else min(budget, cap_ms)
+
+
+class DeadlineStats:
+    """How often budgets cut stages short, by reason, and how often answers degraded"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, reason):
+        with self._lock:
+            self._counts[reason] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Near-duplicate detection of knowledge chunks with MinHash and LSH
+
+Each chunk is reduced to the set of word bigrams of its folded index terms,
+and that set to a MinHash signature; chunks whose signatures agree in every
+row of at least one LSH band become candidate pairs, and a pair is kept when
+the estimated Jaccard similarity reaches the threshold. Chunks are only
+compared within one script, so a Hindi answer never collapses into its
+English twin.
+
+Near-duplicates that quote the same numbers are collapsed to the earliest
+chunk before indexing and embedding. Near-duplicates that quote different
+numbers are conflicts: both are kept, since it is not known which is right,
+and they are reported so the sources can be fixed.
+
+    python dedupe.py [--threshold 0.3] [--prompts]
+
+audits the corpus, with --prompts also against system_prompt.txt and
+config.COLLEGE_CONTEXT, and prints every near-duplicate and conflict.
+"""
+
+import argparse
+import logging
+import re
+import sys
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from knowledge import DEVANAGARI_PATTERN
+from normalizer import index_terms
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+SHINGLE_SIZE = 2
+COLLAPSE_THRESHOLD = 0.8
+AUDIT_THRESHOLD = 0.3
+PRIME = (1 << 31) - 1
+NUMBER_PATTERN = re.compile(r'\d[\d,.:]*\d|\d')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    terms = index_terms(text)
+    if len(terms) <= size:
+        return {' '.join(terms)} if terms else set()
+    return {' '.join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def numbers(text):
+    """Numbers quoted in a text, with digit grouping removed ("1,25,000" -> "125000")"""
+    return {match.replace(',', '').rstrip('.') for match in NUMBER_PATTERN.findall(text)}
+
+
+def script(text):
+    return 'devanagari' if DEVANAGARI_PATTERN.search(text) else 'latin'
+
+
+class MinHasher:
+    """Universal hashes (a * x + b) mod p over CRC32 shingle hashes, vectorised"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(len(self.a), PRIME, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_set), dtype=np.uint64,
+                             count=len(shingle_set))
+        return ((np.outer(hashes, self.a) + self.b) % PRIME).min(axis=0)
+
+
+def band_rows(threshold, num_perm=NUM_PERM):
+    """Most rows per band whose LSH threshold (1 / bands) ** (1 / rows) stays 0.1 below `threshold`
+
+    Taller bands mean fewer spurious candidates, but pairs close to the
+    threshold must still collide in some band with high probability.
+    """
+    for rows in (8, 4, 2, 1):
+        if (rows / num_perm) ** (1 / rows) <= threshold - 0.1:
+            return rows
+    return 1
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(first == second))
+
+
+class NearDuplicate:
+    __slots__ = ('indexes', 'first', 'second', 'similarity', 'only_first', 'only_second')
+
+    def __init__(self, indexes, first, second, similarity, only_first, only_second):
+        self.indexes = indexes  # positions of the pair in the chunk list
+        self.first = first
+        self.second = second
+        self.similarity = similarity
+        self.only_first = only_first  # numbers quoted by the first chunk only
+        self.only_second = only_second
+
+    @property
+    def conflict(self):
+        return bool(self.only_first or self.only_second)
+
+    def to_dict(self):
+        entry = {
+            'first': f"{self.first.source}: {self.first.title}",
+            'second': f"{self.second.source}: {self.second.title}",
+            'similarity': round(self.similarity, 3)
+        }
+        if self.conflict:
+            entry.update(only_first=sorted(self.only_first), only_second=sorted(self.only_second))
+        return entry
+
+
+def find_near_duplicates(chunks, threshold=COLLAPSE_THRESHOLD, hasher=None):
+    """Pairs of chunks at or above the estimated similarity threshold, in input order"""
+    hasher = hasher or MinHasher()
+    rows = band_rows(threshold, len(hasher.a))
+    bands = len(hasher.a) // rows
+    signatures = [hasher.signature(shingles(chunk.text)) for chunk in chunks]
+
+    buckets = defaultdict(list)
+    for index, (chunk, signature) in enumerate(zip(chunks, signatures)):
+        kind = script(chunk.text)
+        for band in range(bands):
+            buckets[(kind, band, signature[band * rows:(band + 1) * rows].tobytes())].append(index)
+
+    candidates = set()
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                candidates.add((first, second))
+
+    pairs = []
+    for first, second in sorted(candidates):
+        score = similarity(signatures[first], signatures[second])
+        if score >= threshold:
+            a, b = chunks[first], chunks[second]
+            first_numbers, second_numbers = numbers(a.text), numbers(b.text)
+            pairs.append(NearDuplicate((first, second), a, b, score, first_numbers - second_numbers,
+                                       second_numbers - first_numbers))
+    return pairs
+
+
+def collapse_near_duplicates(chunks, threshold=COLLAPSE_THRESHOLD):
+    """(kept chunks, report): agreeing near-duplicates collapse into the earliest one"""
+    pairs = find_near_duplicates(chunks, threshold)
+    parent = list(range(len(chunks)))
+
+    def root(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    conflicts = []
+    for pair in pairs:
+        if pair.conflict:
+            conflicts.append(pair)
+            logger.warning(f"Conflicting near-duplicates {pair.to_dict()}")
+            continue
+        first, second = (root(index) for index in pair.indexes)
+        parent[max(first, second)] = min(first, second)
+
+    kept = [chunk for index, chunk in enumerate(chunks) if root(index) == index]
+    def label(chunk):
+        return f"{chunk.source}: {chunk.title}"
+
+    collapsed = [
+        {'dropped': label(chunk), 'into': label(chunks[root(index)])}
+        for index, chunk in enumerate(chunks) if root(index) != index
+    ]
+    report = {
+        'chunks': len(chunks),
+        'kept': len(kept),
+        'collapsed': collapsed,
+        'conflicts': [pair.to_dict() for pair in conflicts]
+    }
+    return kept, report
+
+
+def prompt_chunks():
+    """Paragraphs of the system prompt and COLLEGE_CONTEXT, which are never indexed"""
+    from config import Config
+    from retrieval import Chunk
+    from snapshot import SYSTEM_PROMPT_PATH
+
+    with open(SYSTEM_PROMPT_PATH, 'r', encoding='utf-8') as f:
+        sources = [('system_prompt.txt', f.read()), ('config.COLLEGE_CONTEXT', Config.COLLEGE_CONTEXT)]
+    chunks = []
+    for source, text in sources:
+        for paragraph in re.split(r'\n\s*\n', text):
+            paragraph = paragraph.strip()
+            if paragraph:
+                chunks.append(Chunk(source, paragraph.splitlines()[0].strip(' :'), paragraph))
+    return chunks
+
+
+def main(argv=None):
+    from retrieval import load_corpus
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threshold', type=float, default=AUDIT_THRESHOLD)
+    parser.add_argument('--prompts', action='store_true',
+                        help='also compare against system_prompt.txt and COLLEGE_CONTEXT')
+    args = parser.parse_args(argv)
+
+    chunks = load_corpus(dedupe=False) + (prompt_chunks() if args.prompts else [])
+    pairs = find_near_duplicates(chunks, args.threshold)
+    _, report = collapse_near_duplicates(load_corpus(dedupe=False))
+
+    print(f"📦 Chunks: {report['chunks']}  kept after collapsing: {report['kept']}")
+    print(f"🔁 Near-duplicates at {args.threshold:.2f}: {len(pairs)}")
+    for pair in pairs:
+        marker = '⚠️ ' if pair.conflict else '  '
+        print(f"{marker}{pair.similarity:.2f}  {pair.first.source}: {pair.first.title}  <->  "
+              f"{pair.second.source}: {pair.second.title}")
+        if pair.conflict:
+            print(f"      only first: {', '.join(sorted(pair.only_first)) or '-'}   "
+                  f"only second: {', '.join(sorted(pair.only_second)) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Incremental embedding of knowledge chunks with content-hash reuse
+
+Chunk ids are content hashes, so after an edit only chunks whose text changed
+need encoding. The store in EMBEDDING_DIR is append-only:
+
+- vectors.f32     float32 rows, one per encoded chunk, never rewritten
+- manifest.jsonl  {"id": ..., "row": n} when a chunk is added and
+                  {"id": ..., "deleted": true} tombstones when it goes away
+- meta.json       model name and dimension; a different model starts over
+
+New chunks are encoded in large batches spread over a process pool sized to
+the machine's cores. `--compact` rewrites the store without dead rows.
+
+    python embeddings.py [--workers N] [--batch-size 256] [--compact]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from config import get_config
+from retrieval import load_corpus
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = 'vectors.f32'
+MANIFEST_FILE = 'manifest.jsonl'
+META_FILE = 'meta.json'
+
+_worker_model = None
+
+
+def load_encoder(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(model_name):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(1)  # one core per process, the pool provides the parallelism
+    except ImportError:
+        pass
+    _worker_model = load_encoder(model_name)
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                normalize_embeddings=True).astype(np.float32)
+
+
+class QueryEncoder:
+    """Encodes normalized queries at request time, memoizing hot ones"""
+
+    def __init__(self, model_name, cache_size=4096, model=None):
+        self.model_name = model_name
+        self.model = model or load_encoder(model_name)
+        self.encode = lru_cache(maxsize=cache_size)(self._encode)
+        self.entry_bytes = 0
+
+    def _encode(self, text):
+        vector = self.model.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
+        vector = vector.astype(np.float32)
+        vector.setflags(write=False)  # shared between requests through the cache
+        self.entry_bytes = vector.nbytes + 2 * len(text) + 200
+        return vector
+
+    def memory_bytes(self):
+        return self.encode.cache_info().currsize * self.entry_bytes
+
+    def shrink(self, target_bytes):
+        size = self.memory_bytes()
+        if size <= target_bytes:
+            return 0
+        self.encode.cache_clear()
+        return size
+
+
+def chunk_text(chunk):
+    return f"{chunk.title}\n{chunk.text}"
+
+
+class EmbeddingStore:
+    """Append-only vector file with a manifest of live rows and tombstones"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.meta_path = os.path.join(directory, META_FILE)
+        self.meta = self._read_json(self.meta_path) or {}
+        self.rows = {}  # chunk id -> row of its live vector
+        self.total_rows = 0
+        self.tombstones = 0
+        self._read_manifest()
+
+    @staticmethod
+    def _read_json(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('deleted'):
+                    self.rows.pop(record['id'], None)
+                    self.tombstones += 1
+                else:
+                    self.rows[record['id']] = record['row']
+                    self.total_rows = max(self.total_rows, record['row'] + 1)
+
+    @property
+    def dimension(self):
+        return self.meta.get('dimension')
+
+    def matches_model(self, model_name):
+        return not self.meta or self.meta.get('model') == model_name
+
+    def reset(self, model_name):
+        for path in (self.vectors_path, self.manifest_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.meta = {'model': model_name}
+        self.rows, self.total_rows, self.tombstones = {}, 0, 0
+
+    def append(self, ids, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not self.dimension:
+            self.meta['dimension'] = int(vectors.shape[1])
+        with open(self.vectors_path, 'ab') as f:
+            vectors.tofile(f)
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            for chunk_id in ids:
+                f.write(json.dumps({'id': chunk_id, 'row': self.total_rows}) + '\n')
+                self.rows[chunk_id] = self.total_rows
+                self.total_rows += 1
+
+    def delete(self, ids):
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            for chunk_id in ids:
+                f.write(json.dumps({'id': chunk_id, 'deleted': True}) + '\n')
+                self.rows.pop(chunk_id, None)
+                self.tombstones += 1
+
+    def save_meta(self, model_name):
+        self.meta['model'] = model_name
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def _matrix(self):
+        if not self.total_rows:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                         shape=(self.total_rows, self.dimension))
+
+    def load(self):
+        """Return (ids, matrix) of live vectors, in row order"""
+        ids = sorted(self.rows, key=self.rows.get)
+        matrix = self._matrix()
+        return ids, np.asarray(matrix[[self.rows[i] for i in ids]]) if ids else matrix[:0]
+
+    def compact(self):
+        """Rewrite the store with live rows only"""
+        ids, vectors = self.load()
+        model_name = self.meta.get('model')
+        dimension = self.dimension
+        self.reset(model_name)
+        self.meta['dimension'] = dimension
+        if ids:
+            self.append(ids, vectors)
+        self.save_meta(model_name)
+
+
+def encode_texts(texts, model_name, workers, batch_size):
+    """Encode texts in batches across a process pool (workers=0 encodes in-process)"""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not batches:
+        return None
+    if workers <= 0:
+        _init_worker(model_name)
+        return np.vstack([_encode_batch(batch) for batch in batches])
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker,
+                             initargs=(model_name,)) as pool:
+        return np.vstack(list(pool.map(_encode_batch, batches)))
+
+
+def update_embeddings(chunks, store, model_name, workers=None, batch_size=256):
+    """Encode only new or changed chunks and tombstone removed ones; returns a report"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not store.matches_model(model_name):
+        logger.info(f"Embedding model changed to {model_name}, re-encoding everything")
+        store.reset(model_name)
+
+    current = {chunk.id: chunk for chunk in chunks}
+    reused = [chunk_id for chunk_id in current if chunk_id in store.rows]
+    new_ids = [chunk_id for chunk_id in current if chunk_id not in store.rows]
+    removed = [chunk_id for chunk_id in store.rows if chunk_id not in current]
+
+    start = time.perf_counter()
+    if new_ids:
+        vectors = encode_texts([chunk_text(current[i]) for i in new_ids], model_name, workers, batch_size)
+        store.append(new_ids, vectors)
+    encode_seconds = time.perf_counter() - start
+
+    if removed:
+        store.delete(removed)
+    store.save_meta(model_name)
+
+    return {
+        'chunks': len(current),
+        'reused': len(reused),
+        'encoded': len(new_ids),
+        'deleted': len(removed),
+        'reuse_ratio': len(reused) / len(current) if current else 1.0,
+        'encode_seconds': encode_seconds,
+        'chunks_per_second': len(new_ids) / encode_seconds if new_ids and encode_seconds else 0.0,
+        'tombstones': store.tombstones,
+        'dead_rows': store.total_rows - len(store.rows)
+    }
+
+
+def main(argv=None):
+    settings = get_config()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=settings.EMBEDDING_MODEL)
+    parser.add_argument('--output', default=settings.EMBEDDING_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--compact', action='store_true', help='drop dead rows after updating')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = EmbeddingStore(args.output)
+    report = update_embeddings(load_corpus(), store, args.model, args.workers, args.batch_size)
+    if args.compact:
+        store.compact()
+
+    print(f"📦 Chunks: {report['chunks']}  reused: {report['reused']}  "
+          f"encoded: {report['encoded']}  deleted: {report['deleted']}")
+    print(f"♻️  Reuse ratio: {report['reuse_ratio']:.1%}")
+    print(f"⚡ Encode throughput: {report['chunks_per_second']:.1f} chunks/s "
+          f"({report['encode_seconds']:.2f}s with {args.workers} workers)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
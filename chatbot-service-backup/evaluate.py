@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""In-process evaluation of the Saarthi pipeline against the golden query set
+
+Runs every case in golden_queries.json through SaarthiChatbot.process_message
+with the LLM stubbed out, reports intent/language/confidence accuracy,
+per-stage latency and lexical retrieval recall per language, and exits
+non-zero when accuracy or recall drops or latency regresses past the
+threshold relative to eval_baseline.json.
+
+    python evaluate.py                     # check against the stored baseline
+    python evaluate.py --update-baseline   # record the current run as baseline
+    python evaluate.py --router kb_confidence=89   # try other router thresholds
+    python evaluate.py --llm-latency 2 --budget-ms 1500   # answers under a caller deadline
+    python evaluate.py --llm-thinking-tokens 2048   # short answers under heavier thinking
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_stub import StubLLM
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(SERVICE_DIR, 'golden_queries.json')
+BASELINE_PATH = os.path.join(SERVICE_DIR, 'eval_baseline.json')
+
+# app.py refuses to start without a key; the stub never calls Gemini
+os.environ.setdefault('GEMINI_API_KEY', 'evaluation-stub')
+# Evaluation must not read from or write to the shared stores
+os.environ.setdefault('RESPONSE_STORE_PATH', '')
+os.environ.setdefault('CONVERSATION_BACKEND', 'memory')
+os.environ.setdefault('CHANNEL_SOCKET_PATH', '')
+os.environ.setdefault('WARMUP_ENABLED', 'false')
+os.environ.setdefault('ANALYTICS_SNAPSHOT_DIR', '')
+os.environ.setdefault('KNOWLEDGE_EXPORT_PATH', '')
+
+EXPECTED_DEFAULTS = {'response': 'a non-empty answer'}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_cases(path=GOLDEN_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_case(case, result):
+    """Return {'intent'|'language'|'route'|'confidence'|'response': bool} for the expectations a case has"""
+    from app import LLM_EMPTY_RESPONSE, LLM_ERROR_RESPONSE
+
+    # Every case must get an answer: a token cap spent on thinking comes back empty or as an error
+    checks = {'response': result['response'] not in (LLM_EMPTY_RESPONSE, LLM_ERROR_RESPONSE)}
+    if 'expected_intent' in case:
+        checks['intent'] = result['intent'] == case['expected_intent']
+    if 'expected_language' in case:
+        checks['language'] = result['language'] == case['expected_language']
+    if 'expected_route' in case:
+        checks['route'] = result['route'] == case['expected_route']
+    if 'min_confidence' in case or 'max_confidence' in case:
+        low = case.get('min_confidence', 0)
+        high = case.get('max_confidence', 100)
+        checks['confidence'] = low <= result['confidence'] <= high
+    return checks
+
+
+def run_evaluation(chatbot, cases, workers=8, repeat=20, budget_ms=0):
+    """Run each case `repeat` times in parallel and aggregate accuracy and latency"""
+    from deadline import Deadline
+
+    def run_case(index):
+        case = cases[index % len(cases)]
+        start = time.perf_counter()
+        deadline = Deadline(budget_ms) if budget_ms else None
+        result = chatbot.process_message(case['message'], f"eval_{index}", deadline=deadline)
+        result['timings']['total'] = (time.perf_counter() - start) * 1000
+        return index, case, result
+
+    stage_samples = {}
+    outcomes = {}
+    failures = []
+    routes = {}
+    degraded = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, case, result in pool.map(run_case, range(len(cases) * repeat)):
+            for stage, ms in result['timings'].items():
+                stage_samples.setdefault(stage, []).append(ms)
+            if index >= len(cases):
+                continue  # accuracy is deterministic, score the first pass only
+            routes[result['route']] = routes.get(result['route'], 0) + 1
+            degraded += result['degraded']
+            for check, passed in check_case(case, result).items():
+                outcomes.setdefault(check, []).append(passed)
+                if not passed:
+                    failures.append({
+                        'message': case['message'],
+                        'check': check,
+                        'expected': EXPECTED_DEFAULTS.get(check) or case.get(
+                            f'expected_{check}', [case.get('min_confidence'), case.get('max_confidence')]),
+                        'actual': result[check]
+                    })
+
+    accuracy = {check: sum(passed) / len(passed) for check, passed in outcomes.items()}
+    latency = {
+        stage: {'p50': percentile(samples, 50), 'p95': percentile(samples, 95)}
+        for stage, samples in stage_samples.items()
+    }
+    return {'accuracy': accuracy, 'latency_ms': latency, 'routes': routes, 'degraded': degraded, 'failures': failures}
+
+
+def retrieval_recall(chatbot, cases, k):
+    """Share of each case's expected_sources in the top k lexical hits, per language
+
+    Returns {language: {'recall', 'untranslated', 'cases'}}; `untranslated`
+    is the same search without the glossary translation, for comparison.
+    """
+    from knowledge import detect_language
+    from normalizer import normalize
+    from translation import translate_query
+
+    retriever = chatbot.snapshots.current.retriever
+    found = {}
+    for case in cases:
+        expected = case.get('expected_sources')
+        if not expected:
+            continue
+        text = normalize(case['message'])
+        language = case.get('expected_language') or detect_language(text)
+        scores = found.setdefault(language, {'recall': [], 'untranslated': []})
+        for name, query in (('recall', translate_query(text, language)), ('untranslated', text)):
+            titles = {chunk.title for chunk, _ in retriever.search(query, k)}
+            scores[name].append(sum(title in titles for title in expected) / len(expected))
+    return {
+        language: {
+            'recall': sum(scores['recall']) / len(scores['recall']),
+            'untranslated': sum(scores['untranslated']) / len(scores['untranslated']),
+            'cases': len(scores['recall'])
+        }
+        for language, scores in found.items()
+    }
+
+
+def compare_to_baseline(report, baseline, latency_threshold=0.5, min_delta_ms=0.05, accuracy_tolerance=0.0):
+    """Return a list of human readable regressions, empty when the run passes
+
+    A stage regresses when its p95 grows past the relative threshold and by more than
+    max(min_delta_ms, 2 x baseline p95): stages take microseconds, so a fixed floor of
+    a millisecond would let them get a hundred times slower unnoticed.
+    """
+    regressions = []
+
+    for check, base in baseline.get('accuracy', {}).items():
+        current = report['accuracy'].get(check, 0.0)
+        if current + accuracy_tolerance < base:
+            regressions.append(f"{check} accuracy {current:.0%} < baseline {base:.0%}")
+
+    for language, base in baseline.get('recall', {}).items():
+        current = report.get('recall', {}).get(language, {}).get('recall', 0.0)
+        if current + accuracy_tolerance < base:
+            regressions.append(f"{language} retrieval recall {current:.0%} < baseline {base:.0%}")
+
+    for stage, base in baseline.get('latency_ms', {}).items():
+        current = report['latency_ms'].get(stage)
+        if not current:
+            continue
+        limit = base['p95'] * (1 + latency_threshold)
+        if current['p95'] > limit and current['p95'] - base['p95'] > max(min_delta_ms, 2 * base['p95']):
+            regressions.append(
+                f"{stage} p95 {current['p95']:.3f} ms > {limit:.3f} ms "
+                f"(baseline {base['p95']:.3f} ms + {latency_threshold:.0%})"
+            )
+
+    return regressions
+
+
+def print_report(report):
+    print("📊 Accuracy")
+    for check, value in sorted(report['accuracy'].items()):
+        print(f"   {check:<12} {value:.0%}")
+
+    print("⏱️  Latency (ms)")
+    for stage, stats in report['latency_ms'].items():
+        print(f"   {stage:<12} p50 {stats['p50']:.3f}   p95 {stats['p95']:.3f}")
+
+    if report.get('recall'):
+        print(f"🌐 Retrieval recall@{report['recall_k']} (without translation)")
+        for language, stats in sorted(report['recall'].items()):
+            print(f"   {language:<12} {stats['recall']:.0%} ({stats['untranslated']:.0%})   {stats['cases']} cases")
+
+    print("🧭 Routes")
+    for route, count in sorted(report['routes'].items()):
+        print(f"   {route:<12} {count}")
+
+    if report['degraded']:
+        print(f"🐢 Degraded by the deadline: {report['degraded']}")
+
+    for failure in report['failures']:
+        print(f"❌ {failure['check']}: {failure['message']} "
+              f"(expected {failure['expected']}, got {failure['actual']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help='seconds the stub LLM sleeps per call')
+    parser.add_argument('--llm-thinking-tokens', type=int, default=512,
+                        help='tokens the stub LLM spends thinking when the request sets no thinking budget')
+    parser.add_argument('--budget-ms', type=float, default=0,
+                        help='per-request deadline, as sent in X-Request-Budget-Ms (0 = none)')
+    parser.add_argument('--latency-threshold', type=float, default=0.5,
+                        help='allowed relative p95 growth per stage')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='ignore p95 growth smaller than this or twice the baseline p95')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.0)
+    parser.add_argument('--router', action='append', default=[], metavar='NAME=VALUE',
+                        help='override a router threshold, e.g. kb_confidence=89')
+    parser.add_argument('--log-routes', action='store_true', help='print every routing decision')
+    args = parser.parse_args(argv)
+
+    from app import SaarthiChatbot, settings
+    from router import QueryRouter
+
+    if not args.log_routes:
+        logging.getLogger('router').setLevel(logging.WARNING)
+
+    overrides = {}
+    for item in args.router:
+        name, _, value = item.partition('=')
+        overrides[name] = int(value)
+    router = QueryRouter.from_settings(settings, **overrides)
+
+    def evaluate_fresh():
+        # A fresh chatbot per run, so every run starts with the same cold caches
+        chatbot = SaarthiChatbot(llm=StubLLM(args.llm_latency, args.llm_thinking_tokens), router=router)
+        report = run_evaluation(chatbot, cases, workers=args.workers, repeat=args.repeat, budget_ms=args.budget_ms)
+        return chatbot, report
+
+    cases = load_cases(args.golden)
+
+    print(f"🧪 Evaluating {len(cases)} golden queries x{args.repeat} with {args.workers} workers")
+    print(f"🧭 Router thresholds: {router.thresholds()}")
+    print("=" * 60)
+    chatbot, report = evaluate_fresh()
+    report['recall_k'] = settings.RETRIEVAL_TOP_K
+    report['recall'] = retrieval_recall(chatbot, cases, report['recall_k'])
+    print_report(report)
+    print("=" * 60)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'accuracy': report['accuracy'],
+                'latency_ms': report['latency_ms'],
+                'recall': {language: stats['recall'] for language, stats in report['recall'].items()}
+            }, f, indent=2)
+        print(f"💾 Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️  No baseline found, run with --update-baseline first")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def compare():
+        return compare_to_baseline(
+            report, baseline,
+            latency_threshold=args.latency_threshold,
+            min_delta_ms=args.min_delta_ms,
+            accuracy_tolerance=args.accuracy_tolerance
+        )
+
+    regressions = compare()
+    if compare_to_baseline(report, {'latency_ms': baseline.get('latency_ms', {})}, args.latency_threshold,
+                           args.min_delta_ms):
+        # Stage p95s are microseconds, so one scheduler stall can lift them; only a repeatable slowdown counts
+        print("⏳ Latency above baseline, measuring again to rule out a one-off stall")
+        _, again = evaluate_fresh()
+        report['latency_ms'] = {
+            stage: min(stats, again['latency_ms'].get(stage, stats), key=lambda entry: entry['p95'])
+            for stage, stats in report['latency_ms'].items()
+        }
+        regressions = compare()
+    for regression in regressions:
+        print(f"🚨 {regression}")
+    if regressions:
+        return 1
+
+    print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
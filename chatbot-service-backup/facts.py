@@ -0,0 +1,213 @@
+"""Structured facts parsed from the markdown knowledge file for direct answers
+
+Every `- **Key**: value` bullet in jecrc_knowledge_base.md becomes one fact:
+the entity is the section it sits in, the attribute is the bold key and the
+value is the rest of the line (or its nested bullets). Slot-filling questions
+such as "library timing on Sunday" or "minimum percentage for OBC" are
+matched against the table and answered from a template in the user's
+language, without retrieval or an LLM call.
+"""
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+
+from normalizer import index_terms
+from retrieval import DOCUMENTS_PATH, HEADING_PATTERN
+
+logger = logging.getLogger(__name__)
+
+BULLET_PATTERN = re.compile(r'^(\s*)(?:[-*]|\d+\.)\s+\*\*(.+?)\*\*:?\s*(.*)$')
+SUB_BULLET_PATTERN = re.compile(r'^\s+[-*]\s+(.*)$')
+
+# Hindi, Rajasthani and Hinglish words mapped onto the English terms facts are indexed by
+TERM_ALIASES = {
+    'पुस्तकालय': 'library', 'लाइब्रेरी': 'library', 'library': 'library',
+    'समय': 'timing', 'टाइमिंग': 'timing', 'samay': 'timing', 'timing': 'timing', 'hours': 'timing',
+    'रविवार': 'sunday', 'इतवार': 'sunday', 'ravivar': 'sunday',
+    'परीक्षा': 'exam', 'एग्जाम': 'exam', 'pariksha': 'exam', 'exams': 'exam',
+    'न्यूनतम': 'minimum', 'कम': 'minimum', 'percentage': 'minimum', 'प्रतिशत': 'minimum',
+    'उम्र': 'age', 'आयु': 'age', 'umar': 'age',
+    'फोन': 'phone', 'नंबर': 'phone', 'number': 'phone',
+    'ईमेल': 'email', 'mail': 'email',
+    'हॉस्टल': 'hostel', 'छात्रावास': 'hostel',
+    'मेस': 'mess', 'खाना': 'mess',
+    'पैकेज': 'package', 'औसत': 'average', 'avg': 'average', 'सबसे': 'highest', 'max': 'highest',
+    'प्लेसमेंट': 'placement', 'विकास': 'development', 'जमा': 'deposit',
+    'ट्यूशन': 'tuition', 'फीस': 'fee', 'शुल्क': 'fee', 'fees': 'fee',
+    'ओबीसी': 'obc', 'एससी': 'sc', 'एसटी': 'st', 'सामान्य': 'general',
+}
+
+# Attribute labels shown in Hindi and Rajasthani answers; others stay in English
+ATTRIBUTE_LABELS = {
+    'hi': {
+        'Timings': 'समय', 'Sunday': 'रविवार', 'Exam Period': 'परीक्षा के दौरान',
+        'Minimum': 'न्यूनतम अंक', 'Age Limit': 'आयु सीमा', 'Phone': 'फोन', 'Email': 'ईमेल',
+        'Average Package': 'औसत पैकेज', 'Highest Package': 'सबसे ऊँचा पैकेज', 'Mess': 'मेस',
+    },
+    'raj': {
+        'Timings': 'टैम', 'Sunday': 'दीतवार', 'Exam Period': 'परीक्षा रै टैम',
+        'Minimum': 'कम सूं कम अंक', 'Age Limit': 'उमर री सीमा', 'Phone': 'फोन', 'Email': 'ईमेल',
+        'Average Package': 'औसत पैकेज', 'Highest Package': 'सबसूं ऊँचो पैकेज', 'Mess': 'मेस',
+    },
+}
+
+FACT_TEMPLATES = {
+    'en': "📌 {entity} — {attribute}: {value}\n\nSource: JECRC knowledge base ({section})",
+    'hi': "📌 {entity} — {attribute}: {value}\n\nस्रोत: JECRC जानकारी ({section})",
+    'raj': "📌 {entity} — {attribute}: {value}\n\nस्रोत: JECRC री जानकारी ({section})",
+}
+
+MIN_COVERAGE = 0.6  # share of query terms a fact must explain before it answers alone
+
+
+def fact_terms(text):
+    """Index terms with aliases resolved and plural 's' dropped"""
+    terms = []
+    for term in index_terms(text):
+        term = TERM_ALIASES.get(term, term)
+        if len(term) > 3 and term.endswith('s') and term.isascii():
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+class Fact:
+    __slots__ = ('entity', 'section', 'attribute', 'value', 'language',
+                 'entity_terms', 'attribute_terms', 'value_terms')
+
+    def __init__(self, section, attribute, value, language='en'):
+        self.section = section
+        self.entity = section.rsplit(' > ', 1)[-1]
+        self.attribute = attribute
+        self.value = value
+        self.language = language
+        self.entity_terms = set(fact_terms(section))
+        self.attribute_terms = set(fact_terms(attribute))
+        self.value_terms = set(fact_terms(value))
+
+    def render(self, language):
+        labels = ATTRIBUTE_LABELS.get(language, {})
+        template = FACT_TEMPLATES.get(language, FACT_TEMPLATES['en'])
+        return template.format(entity=self.entity, attribute=labels.get(self.attribute, self.attribute),
+                               value=self.value, section=self.section)
+
+    def to_dict(self):
+        return {'entity': self.entity, 'section': self.section, 'attribute': self.attribute,
+                'value': self.value, 'language': self.language}
+
+
+def parse_facts(path=DOCUMENTS_PATH):
+    """One Fact per bold-key bullet, with nested bullets folded into the value"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    facts = []
+    headings = []
+    pending = None  # (section, attribute, [sub-bullet values]) of a key with no inline value
+
+    def flush():
+        if pending and pending[2]:
+            facts.append(Fact(pending[0], pending[1], ', '.join(pending[2])))
+
+    for line in lines:
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush()
+            pending = None
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2).strip()))
+            continue
+
+        section = ' > '.join(title for level, title in headings if level > 1)
+        bullet = BULLET_PATTERN.match(line)
+        if bullet and not bullet.group(1):
+            flush()
+            pending = None
+            attribute, value = bullet.group(2).strip(), bullet.group(3).strip()
+            if value.startswith('(') and value.endswith(')'):
+                # Numbered steps carry their note in parentheses: "**JEE Main Score** (Primary criteria)"
+                value = value[1:-1]
+            if value:
+                facts.append(Fact(section, attribute, value))
+            else:
+                pending = (section, attribute, [])
+            continue
+
+        sub_bullet = SUB_BULLET_PATTERN.match(line)
+        if pending and sub_bullet:
+            pending[2].append(sub_bullet.group(1).strip())
+    flush()
+    return facts
+
+
+class FactTable:
+    """Facts indexed by term, answering a query only when one fact clearly fits"""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.postings = defaultdict(set)
+        self.section_terms = defaultdict(set)
+        for position, fact in enumerate(facts):
+            for term in fact.entity_terms | fact.attribute_terms:
+                self.postings[term].add(position)
+            self.section_terms[fact.section] |= fact.entity_terms | fact.attribute_terms
+        total = len(facts) or 1
+        self.idf = {term: math.log(1 + total / len(positions)) for term, positions in self.postings.items()}
+        logger.info(f"Parsed {len(facts)} facts")
+
+    def __len__(self):
+        return len(self.facts)
+
+    def lookup(self, text):
+        """Return (fact, score) for the best fitting fact, or None
+
+        A fact only fits when the query names its whole attribute, the fact
+        explains most of the query and the rest of the query does not point at
+        another section ("hostel fees for girls" is not the girls' hostel phone
+        number). Two equally good fits are ambiguous and answer nothing.
+        """
+        query_terms = set(fact_terms(text))
+        if not query_terms:
+            return None
+
+        scores = Counter()
+        for term in query_terms:
+            for position in self.postings.get(term, ()):
+                fact = self.facts[position]
+                # A matched attribute names the slot being asked for, so it outweighs the entity
+                weight = 2.0 if term in fact.attribute_terms else 1.0
+                scores[position] += weight * self.idf[term]
+
+        fits = []
+        for position, score in scores.most_common():
+            fact = self.facts[position]
+            if not fact.attribute_terms or not fact.attribute_terms <= query_terms:
+                continue
+            covered = query_terms & (fact.entity_terms | fact.attribute_terms | fact.value_terms)
+            if len(covered) / len(query_terms) < MIN_COVERAGE:
+                continue
+            if any(term in self.postings and term not in self.section_terms[fact.section]
+                   for term in query_terms - covered):
+                continue
+            fits.append((fact, score))
+            if len(fits) == 2:
+                break
+
+        if not fits or (len(fits) == 2 and math.isclose(fits[0][1], fits[1][1])):
+            return None
+        return fits[0]
+
+    def answer(self, text, language):
+        """Templated answer in the user's language, or None when no fact fits"""
+        match = self.lookup(text)
+        if match is None:
+            return None
+        fact, _ = match
+        return fact.render(language), fact
+
+    def to_list(self):
+        return [fact.to_dict() for fact in self.facts]
@@ -0,0 +1,146 @@
+"""Per-intent generation profiles and their latency and length statistics
+
+generation_profiles.json is the single table: named profiles set the output
+token cap, temperature and an answer-style instruction, and every intent maps
+to one profile. Short factual intents get a small cap and a low temperature,
+counselling intents room for a detailed answer. The table is part of the
+knowledge snapshot and of its prompt version, so an edit hot-reloads and
+stops serving answers generated under the old profiles.
+
+On gemini-2.5-flash thinking tokens count against max_output_tokens, so a
+small cap can be spent before the answer starts and the reply comes back
+empty. A profile's cap is therefore the answer length only: its
+`thinking_budget` (0 turns thinking off) is sent as thinking_config and added
+to the cap. SDKs without thinking_config (the pinned 0.3.2 among them) cannot
+limit thinking, and the cap gets THINKING_HEADROOM_TOKENS on top instead.
+Models that do not think (see `model_thinks`) get neither: their caps are the
+answer length as configured.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+
+from knowledge import SERVICE_DIR
+
+GENERATION_PROFILES_PATH = os.path.join(SERVICE_DIR, 'generation_profiles.json')
+DEFAULT_PROFILE = 'default'
+LATENCY_WINDOW = 512  # recent LLM calls per profile kept for percentiles
+THINKING_HEADROOM_TOKENS = 1024  # room for thinking the request cannot limit
+THINKING_MODELS = ('gemini-2.5', 'gemini-3')  # model name prefixes that think by default
+
+
+def _thinking_config_supported():
+    try:
+        from google.ai import generativelanguage
+    except ImportError:
+        return False
+    return 'thinking_config' in generativelanguage.GenerationConfig.pb().DESCRIPTOR.fields_by_name
+
+
+THINKING_CONFIG_SUPPORTED = _thinking_config_supported()
+
+
+def model_thinks(model_name):
+    """Whether the Gemini model spends output tokens thinking before it answers"""
+    return model_name.rsplit('/', 1)[-1].startswith(THINKING_MODELS)
+
+
+class GenerationProfile:
+    __slots__ = ('name', 'max_output_tokens', 'temperature', 'style', 'thinking_budget')
+
+    def __init__(self, name, max_output_tokens=None, temperature=None, style='', thinking_budget=None):
+        self.name = name
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.style = style
+        self.thinking_budget = thinking_budget
+
+    def generation_config(self, max_output_tokens=None, thinks=True):
+        """Gemini generation_config, with the answer cap lowered to `max_output_tokens` if given
+
+        `thinks` says whether the model thinks; only then are thinking tokens added to the cap.
+        """
+        config = {}
+        thinking_tokens = THINKING_HEADROOM_TOKENS if thinks else 0
+        if thinks and self.thinking_budget is not None and THINKING_CONFIG_SUPPORTED:
+            config['thinking_config'] = {'thinking_budget': self.thinking_budget}
+            thinking_tokens = self.thinking_budget
+        caps = [cap for cap in (self.max_output_tokens, max_output_tokens) if cap]
+        if caps:
+            config['max_output_tokens'] = min(caps) + thinking_tokens
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        return config
+
+    def to_dict(self):
+        return {
+            'max_output_tokens': self.max_output_tokens,
+            'temperature': self.temperature,
+            'style': self.style,
+            'thinking_budget': self.thinking_budget
+        }
+
+
+class GenerationProfiles:
+    """Profile table loaded from JSON; unmapped intents use the default profile"""
+
+    def __init__(self, path=GENERATION_PROFILES_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        self.profiles = {
+            name: GenerationProfile(name, **settings) for name, settings in table['profiles'].items()
+        }
+        self.profiles.setdefault(DEFAULT_PROFILE, GenerationProfile(DEFAULT_PROFILE))
+        unknown = set(table.get('intents', {}).values()) - set(self.profiles)
+        if unknown:
+            raise ValueError(f"Intents mapped to undefined generation profiles: {sorted(unknown)}")
+        self.intents = table.get('intents', {})
+
+    def for_intent(self, intent):
+        return self.profiles[self.intents.get(intent, DEFAULT_PROFILE)]
+
+    def to_dict(self):
+        return {
+            'profiles': {name: profile.to_dict() for name, profile in self.profiles.items()},
+            'intents': self.intents
+        }
+
+
+class ProfileStats:
+    """LLM latency and answer length per profile, for tuning the table"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, profile, elapsed_ms, response):
+        with self._lock:
+            stats = self._stats.get(profile)
+            if stats is None:
+                stats = self._stats[profile] = {
+                    'requests': 0, 'total_ms': 0.0, 'total_chars': 0, 'recent_ms': deque(maxlen=self.window)
+                }
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['total_chars'] += len(response)
+            stats['recent_ms'].append(elapsed_ms)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {
+                profile: dict(stats, recent_ms=sorted(stats['recent_ms'])) for profile, stats in self._stats.items()
+            }
+        report = {}
+        for profile, stats in snapshot.items():
+            recent = stats['recent_ms']
+            report[profile] = {
+                'requests': stats['requests'],
+                'mean_ms': stats['total_ms'] / stats['requests'],
+                'p50_ms': recent[len(recent) // 2],
+                'p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                'mean_chars': stats['total_chars'] / stats['requests']
+            }
+        return report
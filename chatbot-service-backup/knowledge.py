@@ -0,0 +1,89 @@
+"""Knowledge base loading, language detection and intent matching for Saarthi"""
+
+import json
+import logging
+import os
+import re
+
+from normalizer import fold, normalize
+
+logger = logging.getLogger(__name__)
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_BASE_PATH = os.path.join(SERVICE_DIR, 'knowledge_base.json')
+
+DEVANAGARI_PATTERN = re.compile(r'[\u0900-\u097F]')
+
+# Words that mark a Devanagari message as Rajasthani rather than Hindi
+RAJASTHANI_MARKERS = {
+    'सै', 'छै', 'कोनी', 'थारो', 'थारी', 'थारे', 'म्हारो', 'म्हारी', 'म्हारे',
+    'म्हैं', 'म्हूं', 'सूं', 'बताओ', 'दाखले',
+}
+RAJASTHANI_SUFFIXES = ('वां',)
+RAJASTHANI_ROMAN_MARKERS = {'tharo', 'thari', 'mhane', 'mharo', 'koni', 'kathe'}
+HINDI_ROMAN_MARKERS = {
+    'kya', 'hai', 'hain', 'kitne', 'kitna', 'kitni', 'kaise', 'kahan', 'batao',
+    'bataiye', 'nahi', 'nahin', 'aap', 'mujhe', 'namaste', 'dhanyawad',
+}
+
+UNKNOWN_INTENT = 'unknown'
+UNKNOWN_CONFIDENCE = 40
+BASE_CONFIDENCE = 85
+MAX_CONFIDENCE = 98
+CONFIDENCE_STEP = 4
+
+
+def detect_language(message):
+    """Detect 'en', 'hi' or 'raj' from script and marker words"""
+    tokens = normalize(message).split()
+
+    if DEVANAGARI_PATTERN.search(message):
+        for token in tokens:
+            if token in RAJASTHANI_MARKERS or token.endswith(RAJASTHANI_SUFFIXES):
+                return 'raj'
+        return 'hi'
+
+    token_set = set(tokens)
+    if token_set & RAJASTHANI_ROMAN_MARKERS:
+        return 'raj'
+    if token_set & HINDI_ROMAN_MARKERS:
+        return 'hi'
+    return 'en'
+
+
+class KnowledgeBase:
+    """Intent keywords and canned multilingual answers from knowledge_base.json"""
+
+    def __init__(self, path=KNOWLEDGE_BASE_PATH):
+        self.path = path
+        with open(path, 'r', encoding='utf-8') as f:
+            self.intents = json.load(f)
+        # Keywords go through the same folding as queries so spelling variants match
+        self.keywords = {
+            intent: [fold(keyword) for keyword in entry.get('keywords', [])]
+            for intent, entry in self.intents.items()
+        }
+        logger.info(f"Loaded {len(self.intents)} intents from {os.path.basename(path)}")
+
+    def match_intent(self, message):
+        """Return (intent, confidence) using keyword hits; ties go to the earlier intent"""
+        text = normalize(message)
+        best_intent, best_hits = UNKNOWN_INTENT, 0
+
+        for intent, keywords in self.keywords.items():
+            hits = sum(1 for keyword in keywords if keyword in text)
+            if hits > best_hits:
+                best_intent, best_hits = intent, hits
+
+        if not best_hits:
+            return UNKNOWN_INTENT, UNKNOWN_CONFIDENCE
+        confidence = min(MAX_CONFIDENCE, BASE_CONFIDENCE + CONFIDENCE_STEP * (best_hits - 1))
+        return best_intent, confidence
+
+    def get_response(self, intent, language):
+        """Canned answer for an intent, falling back raj -> hi -> en"""
+        responses = self.intents.get(intent, {}).get('responses', {})
+        for lang in (language, 'hi' if language == 'raj' else 'en', 'en'):
+            if lang in responses:
+                return responses[lang]
+        return None
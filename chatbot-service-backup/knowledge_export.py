@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Incremental NDJSON export of intents, answers and facts for the backend FAQ sync
+
+Every exported entry has a stable id and a content hash. Each time a
+snapshot with changed entries is synced, the changes get the next revision
+number, and removed entries become tombstones at that revision. Revisions
+only ever increase, so a consumer that remembers the last revision it
+applied asks for `since=<revision>` and receives only what changed:
+
+    {"type": "header", "revision": 7, "since": 5, "kb_version": "76ee243c2e7e"}
+    {"type": "answer", "id": "answer:fees:hi", "rev": 6, "intent": "fees", "language": "hi", ...}
+    {"type": "fact", "id": "fact:Hostel > AC Rooms|Fees", "rev": 7, "deleted": true}
+
+A fact's id is `fact:<section>|<attribute>`. A section listing the same
+attribute twice keeps that id for the first and gives each repeat a short
+hash of its value, so no fact silently replaces another.
+
+The revision log lives in SQLite, shared by all workers of a node.
+
+    python knowledge_export.py [--since 0] > knowledge.ndjson
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+import threading
+
+from knowledge import UNKNOWN_INTENT
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    rev INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_rev ON entries (rev);
+"""
+
+FACT_LANGUAGES = ('en', 'hi', 'raj')
+
+
+def snapshot_entries(snapshot):
+    """id -> entry body for everything a snapshot exports"""
+    entries = {}
+    for intent, entry in snapshot.knowledge_base.intents.items():
+        if intent == UNKNOWN_INTENT:
+            continue
+        keywords = entry.get('keywords', [])
+        entries[f"intent:{intent}"] = {'type': 'intent', 'intent': intent, 'keywords': keywords}
+        for language, answer in entry.get('responses', {}).items():
+            entries[f"answer:{intent}:{language}"] = {
+                'type': 'answer', 'intent': intent, 'language': language, 'answer': answer, 'keywords': keywords
+            }
+    for fact in snapshot.facts.facts:
+        entry_id = f"fact:{fact.section}|{fact.attribute}"
+        if entry_id in entries:
+            logger.warning(f"Duplicate fact {fact.section} | {fact.attribute}, exported under its value hash")
+            entry_id += '#' + hashlib.sha1(fact.value.encode('utf-8')).hexdigest()[:8]
+        entries[entry_id] = dict(
+            fact.to_dict(), type='fact', answers={language: fact.render(language) for language in FACT_LANGUAGES}
+        )
+    return entries
+
+
+def entry_hash(body):
+    return hashlib.sha1(json.dumps(body, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class KnowledgeExport:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def sync(self, snapshot):
+        """Record the snapshot's changes under one new revision; returns the current revision"""
+        entries = {entry_id: (entry_hash(body), body) for entry_id, body in snapshot_entries(snapshot).items()}
+        conn = self._conn()
+        # IMMEDIATE: workers syncing the same reload at once serialise, the second finds nothing to do
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            known = {row[0]: (row[1], row[2]) for row in conn.execute('SELECT id, hash, deleted FROM entries')}
+            revision = conn.execute('SELECT COALESCE(MAX(rev), 0) FROM entries').fetchone()[0]
+            changed = [
+                (entry_id, digest, json.dumps(body, ensure_ascii=False))
+                for entry_id, (digest, body) in entries.items()
+                if known.get(entry_id) != (digest, 0)
+            ]
+            removed = [entry_id for entry_id, (_, deleted) in known.items() if entry_id not in entries and not deleted]
+            if changed or removed:
+                revision += 1
+                conn.executemany('INSERT OR REPLACE INTO entries (id, hash, body, rev, deleted) VALUES (?, ?, ?, ?, 0)',
+                                 [(entry_id, digest, body, revision) for entry_id, digest, body in changed])
+                conn.executemany('UPDATE entries SET rev = ?, deleted = 1 WHERE id = ?',
+                                 [(revision, entry_id) for entry_id in removed])
+                logger.info(f"Knowledge export revision {revision}: {len(changed)} changed, {len(removed)} removed")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return revision
+
+    def revision(self):
+        return self._conn().execute('SELECT COALESCE(MAX(rev), 0) FROM entries').fetchone()[0]
+
+    def stream(self, since=0, kb_version=None):
+        """NDJSON lines: a header with the current revision, then entries changed after `since`"""
+        # A private connection keeps the header and the rows in one read transaction
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            revision = conn.execute('SELECT COALESCE(MAX(rev), 0) FROM entries').fetchone()[0]
+            header = {'type': 'header', 'revision': revision, 'since': since, 'kb_version': kb_version}
+            yield json.dumps(header) + '\n'
+            rows = conn.execute('SELECT id, body, rev, deleted FROM entries WHERE rev > ? ORDER BY rev, id', (since,))
+            for entry_id, body, rev, deleted in rows:
+                entry = json.loads(body)
+                if deleted:
+                    entry = {'type': entry['type'], 'deleted': True}
+                entry.update(id=entry_id, rev=rev)
+                yield json.dumps(entry, ensure_ascii=False) + '\n'
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    from config import get_config
+    from snapshot import KnowledgeSnapshot
+
+    settings = get_config()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--since', type=int, default=0)
+    parser.add_argument('--state', default=settings.KNOWLEDGE_EXPORT_PATH)
+    args = parser.parse_args(argv)
+
+    export = KnowledgeExport(args.state)
+    snapshot = KnowledgeSnapshot()
+    export.sync(snapshot)
+    for line in export.stream(args.since, snapshot.kb_version):
+        sys.stdout.write(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Adaptive concurrency limit and priority queue in front of the Gemini calls
+
+Unbounded parallel calls under a burst run into Gemini's rate limits and
+every request slows down together. The limiter admits at most `limit` calls
+at once and adapts the limit AIMD-style: every completed call raises it by
+1/limit (about +1 per round of calls), a 429 or a call slower than
+LLM_LATENCY_TARGET_MS multiplies it by the backoff factor, at most once per
+typical call duration. Failures for other reasons, such as a caller's
+deadline cutting the call short, leave it unchanged.
+
+Calls over the limit wait in a priority queue: interactive student chats
+are admitted before batch work (cache warm-up, evaluation and other jobs
+sending X-Request-Priority: batch). A queued call is shed with LLMShed
+instead of waiting when it cannot be admitted within its maximum wait: at
+once if the queue is full or the expected wait is already too long, and
+otherwise as soon as its wait runs out. The caller then answers without the
+LLM.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+PRIORITY_HEADER = 'X-Request-Priority'
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+WAIT_WINDOW = 512  # recent queue waits kept for percentiles
+
+
+class LLMShed(Exception):
+    """The call was not admitted in time; `reason` is queue_full, expected_wait or wait_expired"""
+
+    def __init__(self, reason):
+        super().__init__(f"LLM call shed: {reason}")
+        self.reason = reason
+
+
+def is_rate_limited(error):
+    """True for Gemini's 429 / ResourceExhausted, without importing google.api_core"""
+    return getattr(error, 'code', None) == 429 or type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+
+
+class _Waiter:
+    __slots__ = ('priority', 'event', 'admitted', 'cancelled')
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.event = threading.Event()
+        self.admitted = False
+        self.cancelled = False
+
+
+class Slot:
+    """One admitted call; the first release returns it with the call's outcome, later ones are ignored"""
+
+    __slots__ = ('limiter', 'started', 'released')
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.started = time.perf_counter()
+        self.released = False
+
+    def release(self, outcome='ok'):
+        """`outcome` is ok, overloaded (429) or error (anything else)"""
+        if self.released:
+            return
+        self.released = True
+        self.limiter._release((time.perf_counter() - self.started) * 1000, outcome)
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, backoff=0.7, latency_target_ms=0,
+                 max_queue=256):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_target_ms = latency_target_ms
+        self.max_queue = max_queue
+        self.inflight = 0
+        self.latency_ms = None  # moving average of successful call time
+        self._last_decrease = 0.0
+        self._heap = []  # (priority rank, sequence, waiter); cancelled waiters are skipped lazily
+        self._sequence = itertools.count()
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=WAIT_WINDOW) for priority in PRIORITIES}
+        self._counts = {'admitted': 0, 'completed': 0, 'overloaded': 0, 'slow': 0, 'errors': 0, 'decreases': 0}
+        self._shed = {'queue_full': 0, 'expected_wait': 0, 'wait_expired': 0}
+        self._lock = threading.Lock()
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, max_wait_ms=None):
+        """Slot for one call, waiting at most `max_wait_ms` (None: until admitted); raises LLMShed"""
+        rank = PRIORITIES[priority]
+        start = time.perf_counter()
+        with self._lock:
+            if self.inflight < int(self.limit) and not any(self._queued.values()):
+                return self._admit(priority, 0.0)
+            if sum(self._queued.values()) >= self.max_queue:
+                raise self._shed_call('queue_full')
+            if max_wait_ms is not None and self._expected_wait_ms(rank) > max_wait_ms:
+                raise self._shed_call('expected_wait')
+            waiter = _Waiter(priority)
+            heapq.heappush(self._heap, (rank, next(self._sequence), waiter))
+            self._queued[priority] += 1
+
+        waiter.event.wait(None if max_wait_ms is None else max(0.0, max_wait_ms) / 1000)
+        with self._lock:
+            # Admission happens under the lock, so a waiter woken by its timeout may still have won a slot
+            if waiter.admitted:
+                return self._slot(priority, start)
+            waiter.cancelled = True
+            self._queued[priority] -= 1
+            raise self._shed_call('wait_expired')
+
+    def _expected_wait_ms(self, rank):
+        """Time until a new call of this rank would be admitted, from the queue ahead of it"""
+        if not self.latency_ms:
+            return 0.0
+        ahead = sum(count for priority, count in self._queued.items() if PRIORITIES[priority] <= rank)
+        return (ahead + 1) * self.latency_ms / max(1, int(self.limit))
+
+    def _admit(self, priority, waited_ms):
+        self.inflight += 1
+        self._counts['admitted'] += 1
+        self._waits[priority].append(waited_ms)
+        return Slot(self)
+
+    def _slot(self, priority, start):
+        # Counted in inflight by _dispatch already
+        self._waits[priority].append((time.perf_counter() - start) * 1000)
+        return Slot(self)
+
+    def _shed_call(self, reason):
+        self._shed[reason] += 1
+        return LLMShed(reason)
+
+    def _release(self, elapsed_ms, outcome):
+        with self._lock:
+            self.inflight -= 1
+            self._counts['completed'] += 1
+            now = time.perf_counter()
+            slow = outcome == 'ok' and self.latency_target_ms and elapsed_ms > self.latency_target_ms
+            if outcome == 'overloaded' or slow:
+                self._counts['overloaded' if outcome == 'overloaded' else 'slow'] += 1
+                # One decrease per typical call duration: calls already in flight saw the same congestion
+                if (now - self._last_decrease) * 1000 >= (self.latency_ms or 0.0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+                    self._counts['decreases'] += 1
+            elif outcome == 'ok':
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self._counts['errors'] += 1
+            if outcome == 'ok':
+                self.latency_ms = elapsed_ms if self.latency_ms is None else 0.9 * self.latency_ms + 0.1 * elapsed_ms
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the best queued waiters; caller holds the lock"""
+        while self._heap and self.inflight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            waiter.admitted = True
+            self._queued[waiter.priority] -= 1
+            self.inflight += 1
+            self._counts['admitted'] += 1
+            waiter.event.set()
+
+    def stats(self):
+        with self._lock:
+            waits = {priority: sorted(samples) for priority, samples in self._waits.items()}
+            report = {
+                'limit': round(self.limit, 2),
+                'inflight': self.inflight,
+                'queued': dict(self._queued),
+                'latency_ms': self.latency_ms,
+                'shed': dict(self._shed),
+                **self._counts
+            }
+        report['wait_ms'] = {
+            priority: {
+                'p50': samples[len(samples) // 2],
+                'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            }
+            for priority, samples in waits.items() if samples
+        }
+        return report
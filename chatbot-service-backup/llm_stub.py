@@ -0,0 +1,35 @@
+"""Stand-in for the Gemini model, for evaluation and offline load replay"""
+
+import time
+from types import SimpleNamespace
+
+STUB_ANSWER = "Stub answer from Saarthi evaluation."
+STUB_ANSWER_TOKENS = 16
+
+
+class StubLLM:
+    """Answers every prompt with a fixed text after `latency` seconds, never leaving the process
+
+    Like gemini-2.5-flash, the stub spends `thinking_tokens` of max_output_tokens
+    before answering unless thinking_config sets a budget, and a cap too small
+    for the answer fails the way the Gemini client does.
+    """
+
+    def __init__(self, latency=0.0, thinking_tokens=0):
+        self.latency = latency
+        self.thinking_tokens = thinking_tokens
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, **kwargs):
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and self.latency > timeout:
+            # Like the Gemini client: give up at the request timeout
+            time.sleep(timeout)
+            raise TimeoutError(f"stub answer takes {self.latency}s, timeout is {timeout:.3f}s")
+        if self.latency:
+            time.sleep(self.latency)
+        generation_config = generation_config or {}
+        cap = generation_config.get('max_output_tokens')
+        thinking = generation_config.get('thinking_config', {}).get('thinking_budget', self.thinking_tokens)
+        if cap is not None and cap < thinking + STUB_ANSWER_TOKENS:
+            raise ValueError("Invalid operation: the response has no parts, finish_reason is MAX_TOKENS")
+        return SimpleNamespace(text=STUB_ANSWER)
@@ -0,0 +1,163 @@
+"""Memory accounting and budget enforcement for the service's in-memory state
+
+Components (response caches, session cache, indexes, memo tables) register
+a function returning their approximate size in bytes and, if they can give
+memory back, a function that shrinks them to a target size. A background
+thread sums the sizes and, while the total exceeds the budget, shrinks the
+lowest-priority components first. Sizes are estimates of Python object
+sizes, not RSS; the report shows process RSS next to them for comparison.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+def approx_size(obj, depth=3):
+    """Shallow-recursive size estimate of strings, numbers, arrays and small containers"""
+    nbytes = getattr(obj, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, depth - 1) + approx_size(v, depth - 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, depth - 1) for item in obj)
+    return size
+
+
+def process_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, on Linux in KiB
+
+
+class Component:
+    __slots__ = ('name', 'size', 'shrink', 'priority', 'evicted_bytes')
+
+    def __init__(self, name, size, shrink, priority):
+        self.name = name
+        self.size = size
+        self.shrink = shrink
+        self.priority = priority
+        self.evicted_bytes = 0
+
+
+class MemoryAccountant:
+    """Keeps registered components within `budget_bytes` (0 only accounts)"""
+
+    def __init__(self, budget_bytes=0, check_interval=5.0):
+        self.budget_bytes = budget_bytes
+        self.check_interval = check_interval
+        self.components = {}
+        self.enforcements = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, size, shrink=None, priority=100):
+        """size() -> bytes; shrink(target_bytes) -> bytes freed; lower priority is evicted first"""
+        with self._lock:
+            self.components[name] = Component(name, size, shrink, priority)
+
+    def usage(self):
+        with self._lock:
+            components = list(self.components.values())
+        usage = {}
+        for component in components:
+            try:
+                usage[component.name] = component.size()
+            except Exception as e:
+                logger.warning(f"Memory size of {component.name} failed: {e}")
+                usage[component.name] = 0
+        return usage
+
+    def enforce(self):
+        """Shrink components, lowest priority first, until the total fits; returns bytes freed"""
+        if not self.budget_bytes:
+            return 0
+        usage = self.usage()
+        excess = sum(usage.values()) - self.budget_bytes
+        if excess <= 0:
+            return 0
+
+        self.enforcements += 1
+        freed = 0
+        with self._lock:
+            shrinkable = sorted((c for c in self.components.values() if c.shrink), key=lambda c: c.priority)
+        for component in shrinkable:
+            current = usage.get(component.name, 0)
+            if not current:
+                continue
+            released = component.shrink(max(0, current - (excess - freed))) or 0
+            component.evicted_bytes += released
+            freed += released
+            if freed >= excess:
+                break
+        logger.info(f"Memory budget exceeded by {excess} bytes, freed {freed}")
+        return freed
+
+    def start(self):
+        if self._thread or self.check_interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.check_interval)
+                try:
+                    self.enforce()
+                except Exception as e:
+                    logger.error(f"Memory enforcement failed: {e}")
+
+        self._thread = threading.Thread(target=watch, name='memory-accountant', daemon=True)
+        self._thread.start()
+
+    def report(self, top=10):
+        usage = self.usage()
+        with self._lock:
+            components = {
+                name: {
+                    'bytes': usage.get(name, 0),
+                    'priority': c.priority,
+                    'shrinkable': c.shrink is not None,
+                    'evicted_bytes': c.evicted_bytes
+                }
+                for name, c in self.components.items()
+            }
+        return {
+            'budget_bytes': self.budget_bytes,
+            'accounted_bytes': sum(usage.values()),
+            'rss_bytes': process_rss_bytes(),
+            'enforcements': self.enforcements,
+            'components': components,
+            'tracemalloc': tracemalloc_top(top)
+        }
+
+
+def tracemalloc_top(limit=10):
+    """Top allocating source lines, or None while tracemalloc is not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'top': [
+            {'where': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+            for stat in snapshot.statistics('lineno')[:limit]
+        ]
+    }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Shared model server: one copy of the embedding and rerank models per node
+
+Every gunicorn worker loading sentence-transformers itself costs hundreds of
+MB and a slow boot each. Instead, this process loads the models once and
+serves them over a Unix socket using the channel framing (channel.py):
+
+    -> {"id": 1, "type": "encode", "texts": ["..."]}
+    <- {"id": 1, "type": "encode", "dim": 384, "vectors": "<base64 float32, row-major>"}
+    -> {"id": 2, "type": "rerank", "pairs": [["query", "passage"], ...]}
+    <- {"id": 2, "type": "rerank", "scores": [...]}
+
+Requests from all workers are coalesced: a batcher takes the first waiting
+request, gathers whatever else arrives within MODEL_SERVER_MAX_WAIT_MS up to
+MODEL_SERVER_MAX_BATCH items, and runs the model once for all of them.
+
+    python model_server.py serve     # load the models and serve MODEL_SERVER_SOCKET
+    python model_server.py stats     # batch sizes seen by a running server
+
+Workers use it when MODEL_SERVER_SOCKET is set, through RemoteEncoder and
+RemoteCrossEncoder, which stand in for the in-process models.
+"""
+
+import argparse
+import base64
+import json
+import logging
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from channel import ChannelClient, ChannelServer
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher:
+    """Coalesces concurrent requests into one model call of up to `max_batch` items"""
+
+    def __init__(self, name, run, max_batch=64, max_wait_ms=5.0):
+        self.name = name
+        self.run = run  # list of items -> list of results, same order
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, items):
+        """Future resolving to the results for `items`"""
+        future = Future()
+        self._queue.put((items, future))
+        return future
+
+    def _loop(self):
+        while True:
+            waiting = [self._queue.get()]
+            size = len(waiting[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                waiting.append(request)
+                size += len(request[0])
+
+            items = [item for request_items, _ in waiting for item in request_items]
+            start = time.perf_counter()
+            try:
+                results = self.run(items)
+            except Exception as e:
+                for _, future in waiting:
+                    future.set_exception(e)
+                continue
+            self.busy_seconds += time.perf_counter() - start
+            self.requests += len(waiting)
+            self.items += len(items)
+            self.batches += 1
+
+            offset = 0
+            for request_items, future in waiting:
+                future.set_result(results[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'items': self.items,
+            'batches': self.batches,
+            'mean_batch': self.items / self.batches if self.batches else 0.0,
+            'requests_per_batch': self.requests / self.batches if self.batches else 0.0,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'queued': self._queue.qsize()
+        }
+
+
+def encode_vectors(matrix):
+    return base64.b64encode(np.ascontiguousarray(matrix, dtype=np.float32).tobytes()).decode('ascii')
+
+
+def decode_vectors(payload, dim):
+    return np.frombuffer(base64.b64decode(payload), dtype=np.float32).reshape(-1, dim)
+
+
+class ModelServer:
+    def __init__(self, path, encoder=None, cross_encoder=None, max_batch=64, max_wait_ms=5.0, workers=64):
+        self.batchers = {}
+        if encoder is not None:
+            self.batchers['encode'] = Batcher('encode', lambda texts: encoder.encode(
+                texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+            ).astype(np.float32), max_batch, max_wait_ms)
+        if cross_encoder is not None:
+            self.batchers['rerank'] = Batcher('rerank', lambda pairs: [
+                float(score) for score in cross_encoder.predict(pairs, batch_size=len(pairs))
+            ], max_batch, max_wait_ms)
+        self.channel = ChannelServer(path, {
+            'encode': self.handle_encode,
+            'rerank': self.handle_rerank,
+            'stats': lambda frame: self.stats()
+        }, self.stats, workers=workers)
+
+    def handle_encode(self, frame):
+        vectors = np.asarray(self.batchers['encode'].submit(frame['texts']).result())
+        return {'dim': int(vectors.shape[1]), 'vectors': encode_vectors(vectors)}
+
+    def handle_rerank(self, frame):
+        return {'scores': self.batchers['rerank'].submit([tuple(pair) for pair in frame['pairs']]).result()}
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+
+class RemoteModel:
+    """Channel client that reconnects once when the server was restarted"""
+
+    def __init__(self, path, timeout=15.0):
+        self.path = path
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def request(self, kind, **fields):
+        for attempt in (1, 2):
+            with self._lock:
+                if self._client is None:
+                    self._client = ChannelClient(self.path, self.timeout)
+                client = self._client
+            try:
+                reply = client.request(kind, **fields)
+                break
+            except ConnectionError:
+                # Broken pipe or closed connection: the server restarted. A timeout is not retried,
+                # it means the server is busy and resending would only double its work
+                with self._lock:
+                    if self._client is client:
+                        self._client = None
+                client.close()
+                if attempt == 2:
+                    raise
+        if reply.get('status') == 'error':
+            raise RuntimeError(f"Model server {kind} failed: {reply.get('error')}")
+        return reply
+
+
+class RemoteEncoder(RemoteModel):
+    """Stands in for SentenceTransformer.encode; vectors come back normalized"""
+
+    def encode(self, texts, **kwargs):
+        reply = self.request('encode', texts=list(texts))
+        return decode_vectors(reply['vectors'], reply['dim'])
+
+
+class RemoteCrossEncoder(RemoteModel):
+    """Stands in for CrossEncoder.predict"""
+
+    def predict(self, pairs, **kwargs):
+        return self.request('rerank', pairs=[list(pair) for pair in pairs])['scores']
+
+
+def main(argv=None):
+    from config import get_config
+
+    settings = get_config()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['serve', 'stats'])
+    parser.add_argument('--socket', default=settings.MODEL_SERVER_SOCKET)
+    parser.add_argument('--no-rerank', action='store_true', help='serve the embedding model only')
+    args = parser.parse_args(argv)
+    if not args.socket:
+        parser.error('set MODEL_SERVER_SOCKET or pass --socket')
+
+    if args.command == 'stats':
+        print(json.dumps(RemoteModel(args.socket).request('stats'), indent=2))
+        return 0
+
+    logging.basicConfig(level=logging.INFO)
+    from embeddings import load_encoder
+    encoder = load_encoder(settings.EMBEDDING_MODEL)
+    cross_encoder = None
+    if not args.no_rerank:
+        from sentence_transformers import CrossEncoder
+        cross_encoder = CrossEncoder(settings.RERANK_MODEL)
+
+    server = ModelServer(args.socket, encoder, cross_encoder, settings.MODEL_SERVER_MAX_BATCH,
+                         settings.MODEL_SERVER_MAX_WAIT_MS, settings.MODEL_SERVER_WORKERS)
+    if not server.channel.start():
+        print(f"⚠️  {args.socket} is already served")
+        return 1
+    print(f"🧠 Serving {', '.join(server.batchers)} on {args.socket}")
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    server.channel.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Query normalization shared by intent matching, caching and indexing
+
+Two spellings of the same question must produce the same keys, so every
+lookup key in the service is derived here:
+
+- `normalize()` folds a message to canonical text: NFKC, nukta folding,
+  zero-width joiner and emoji removal, Devanagari digits to ASCII, case
+  folding, punctuation and whitespace collapse. Intent keywords are matched
+  against this text.
+- `query_key()` additionally drops per-language stopwords and is used for
+  response caches, stores and rerank caches.
+- `index_terms()` applies the same folding to document text for indexing.
+
+The character tables are compiled once for str.translate, and the two query
+functions are memoized because the same hot questions arrive again and again.
+"""
+
+import string
+import unicodedata
+from functools import lru_cache
+
+NUKTA = '\u093c'
+
+# Characters that only change how text renders, never what it says
+INVISIBLE_CHARS = (
+    NUKTA,
+    '\u200b',  # zero width space
+    '\u200c',  # zero width non-joiner
+    '\u200d',  # zero width joiner
+    '\u2060',  # word joiner
+    '\ufeff',  # byte order mark
+    '\u00ad',  # soft hyphen
+    '\ufe0e', '\ufe0f',  # variation selectors
+)
+
+# Letters NFC keeps precomposed with a nukta
+NUKTA_LETTERS = {'\u0929': '\u0928', '\u0931': '\u0930', '\u0934': '\u0933'}
+
+PUNCTUATION = string.punctuation + '।॥“”‘’«»…–—•·¡¿'
+
+EMOJI_RANGES = (
+    (0x1F000, 0x1FAFF),  # emoticons, pictographs, transport, flags
+    (0x2600, 0x27BF),    # misc symbols and dingbats
+    (0x2B00, 0x2BFF),    # arrows and stars
+)
+
+
+def _build_fold_table():
+    table = {ord(char): None for char in INVISIBLE_CHARS}
+    table.update({ord(src): dst for src, dst in NUKTA_LETTERS.items()})
+    table.update({0x0966 + digit: str(digit) for digit in range(10)})  # ० - ९
+    table.update({ord(char): ' ' for char in PUNCTUATION})
+    for start, end in EMOJI_RANGES:
+        table.update({code: ' ' for code in range(start, end + 1)})
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+
+STOPWORDS = {
+    'en': frozenset({
+        'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'am', 'do', 'does', 'did',
+        'what', 'whats', 'which', 'who', 'how', 'when', 'where', 'of', 'for', 'to', 'in',
+        'on', 'at', 'by', 'with', 'about', 'from', 'and', 'or', 'i', 'me', 'my', 'you',
+        'your', 'we', 'our', 'it', 'this', 'that', 'there', 'any', 'some', 'can', 'could',
+        'would', 'please', 'tell', 'know', 'want', 'give', 'information', 'details', 'info',
+    }),
+    'hi': frozenset({
+        'का', 'की', 'के', 'है', 'हैं', 'था', 'थे', 'में', 'से', 'को', 'पर', 'और', 'या',
+        'क्या', 'कि', 'यह', 'वह', 'ये', 'वो', 'मैं', 'मुझे', 'मेरा', 'आप', 'आपका', 'हम',
+        'बताएं', 'बताइए', 'बताओ', 'बताना', 'बारे', 'जानकारी', 'कृपया', 'कितना', 'कितनी',
+        'kya', 'hai', 'hain', 'ka', 'ki', 'ke', 'ko', 'me', 'se', 'aur', 'kitna', 'kitni',
+        'kitne', 'batao', 'bataiye', 'mujhe', 'aap',
+    }),
+    'raj': frozenset({
+        'सै', 'छै', 'को', 'री', 'रो', 'रा', 'रै', 'में', 'सूं', 'अर', 'कांई', 'कांईं',
+        'म्हनै', 'थानै', 'बताओ', 'बतावो', 'बारे', 'जानकारी', 'का', 'की', 'के', 'है',
+        'kai', 'kaai', 'ko', 'ri', 'ro', 'batao',
+    }),
+}
+ALL_STOPWORDS = frozenset().union(*STOPWORDS.values())
+
+
+def fold(text):
+    """Canonical form of arbitrary text (uncached, safe for large documents)"""
+    text = unicodedata.normalize('NFKC', text)
+    # NFKC decomposes क़-style letters, so nukta removal must come after it
+    text = text.translate(FOLD_TABLE).casefold()
+    return ' '.join(text.split())
+
+
+@lru_cache(maxsize=8192)
+def normalize(message):
+    """Memoized canonical form of a user message"""
+    return fold(message)
+
+
+@lru_cache(maxsize=8192)
+def query_key(text, language=None):
+    """Cache and index key for normalized text: content words only
+
+    Falls back to the full text when every word is a stopword, so
+    messages like "who are you" still get distinct keys.
+    """
+    stopwords = STOPWORDS['en'] | STOPWORDS[language] if language in STOPWORDS else ALL_STOPWORDS
+    words = [word for word in text.split() if word not in stopwords]
+    return ' '.join(words) if words else text
+
+
+def index_terms(text):
+    """Terms to index a document by, folded exactly like queries"""
+    return [word for word in fold(text).split() if word not in ALL_STOPWORDS]
+
+
+# lru_cache does not expose its entries, so memory is estimated per entry
+MEMO_ENTRY_BYTES = 400
+
+
+def memory_bytes():
+    return (normalize.cache_info().currsize + query_key.cache_info().currsize) * MEMO_ENTRY_BYTES
+
+
+def shrink(target_bytes):
+    """Clear the memo tables when they exceed target_bytes; returns bytes freed"""
+    size = memory_bytes()
+    if size <= target_bytes:
+        return 0
+    normalize.cache_clear()
+    query_key.cache_clear()
+    return size
+
+
+def cache_info():
+    return {
+        'normalize': normalize.cache_info()._asdict(),
+        'query_key': query_key.cache_info()._asdict()
+    }
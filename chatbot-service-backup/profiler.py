@@ -0,0 +1,105 @@
+"""Sampling profiler for single requests, written as collapsed stacks and speedscope
+
+A background thread reads the stack of the request's thread from
+sys._current_frames() every `interval` seconds, so the profiled code runs
+unmodified and the overhead is paid only while a profile is being taken.
+Each profile is written twice into the output directory:
+
+- <name>.collapsed         "outer;inner;leaf count" lines for flamegraph.pl / inferno
+- <name>.speedscope.json   open at https://www.speedscope.app
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()  # tuple of code objects, root first -> count
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        lines = [
+            f"{';'.join(frame_label(code) for code in stack)} {count}"
+            for stack, count in self.samples.most_common()
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name):
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            indexes = []
+            for code in stack:
+                if code not in frame_index:
+                    frame_index[code] = len(frames)
+                    frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+                indexes.append(frame_index[code])
+            samples.append(indexes)
+            weights.append(count * self.interval * 1000)
+
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'saarthi-profiler',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }]
+        }
+
+    def write(self, directory, name):
+        """Write both formats; returns the path without extension"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        with open(base + '.speedscope.json', 'w', encoding='utf-8') as f:
+            json.dump(self.speedscope(name), f)
+        return base
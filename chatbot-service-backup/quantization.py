@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Quantized storage and search for knowledge chunk embeddings
+
+Float32 matrices are large once prospectuses and circulars are ingested, so
+workers can hold compressed codes instead:
+
+- ScalarQuantizer: per-dimension int8 codes, 4x smaller than float32
+- ProductQuantizer: M sub-vectors coded against 256-centroid codebooks, one
+  byte per sub-vector (e.g. 384 floats -> 48 bytes)
+
+Both score a float query against the codes directly (asymmetric distance
+computation), and QuantizedIndex re-scores the best candidates exactly from
+the float vectors, memory-mapped from the embedding store so they are paged
+in on demand rather than pinned in every worker.
+
+    python quantization.py [--k 10] [--pq-subvectors 48]   # memory and recall report
+    python quantization.py --save   # quantized_<kind>.npz, served with ANN_QUANTIZATION=int8|pq
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+BLOCK_ROWS = 65536  # decode at most this many rows at once while scoring
+
+
+def nearest_centers(data, centers):
+    distances = (data ** 2).sum(1)[:, None] - 2 * data @ centers.T + (centers ** 2).sum(1)[None, :]
+    return distances.argmin(axis=1)
+
+
+def kmeans(data, k, iterations=20, rng=None):
+    """Lloyd's k-means; returns float32 centers"""
+    rng = rng or np.random.default_rng(0)
+    centers = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centers(data, centers)
+        for c in range(k):
+            members = data[assignment == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return centers.astype(np.float32)
+
+
+class ScalarQuantizer:
+    """Per-dimension affine int8 quantization"""
+
+    kind = 'int8'
+
+    def fit(self, vectors):
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255.0
+        self.offset = (low + 128 * self.scale).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, codes, query):
+        """Inner products of query with every decoded row, without decoding the matrix"""
+        weighted = (query * self.scale).astype(np.float32)
+        bias = float(query @ self.offset)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS].astype(np.float32)
+            out[start:start + BLOCK_ROWS] = block @ weighted + bias
+        return out
+
+    def state(self):
+        return {'scale': self.scale, 'offset': self.offset}
+
+    def load_state(self, state):
+        self.scale, self.offset = state['scale'], state['offset']
+        return self
+
+
+class ProductQuantizer:
+    """Product quantization with k-means codebooks per sub-vector"""
+
+    kind = 'pq'
+
+    def __init__(self, subvectors=48, centroids=256, iterations=20, seed=0):
+        self.subvectors = subvectors
+        self.centroids = centroids
+        self.iterations = iterations
+        self.seed = seed
+
+    def _split(self, vectors):
+        return np.split(vectors, self.subvectors, axis=1)
+
+    def fit(self, vectors):
+        dimension = vectors.shape[1]
+        if dimension % self.subvectors:
+            raise ValueError(f"dimension {dimension} is not divisible by {self.subvectors} sub-vectors")
+        rng = np.random.default_rng(self.seed)
+        k = min(self.centroids, len(vectors))
+        self.codebooks = np.stack([
+            kmeans(part, k, self.iterations, rng) for part in self._split(vectors)
+        ])
+        return self
+
+    def encode(self, vectors):
+        return np.stack([
+            nearest_centers(part, self.codebooks[m]) for m, part in enumerate(self._split(vectors))
+        ], axis=1).astype(np.uint8)
+
+    def decode(self, codes):
+        return np.hstack([self.codebooks[m][codes[:, m]] for m in range(self.subvectors)])
+
+    def scores(self, codes, query):
+        """Inner products via per-sub-vector lookup tables"""
+        tables = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.subvectors, -1))
+        out = np.zeros(len(codes), dtype=np.float32)
+        for m in range(self.subvectors):
+            out += tables[m][codes[:, m]]
+        return out
+
+    def state(self):
+        return {'codebooks': self.codebooks}
+
+    def load_state(self, state):
+        self.codebooks = state['codebooks']
+        self.subvectors = self.codebooks.shape[0]
+        self.centroids = self.codebooks.shape[1]
+        return self
+
+
+QUANTIZERS = {'int8': ScalarQuantizer, 'pq': ProductQuantizer}
+
+
+class QuantizedIndex:
+    """Quantized codes for search plus optional float vectors for exact re-scoring"""
+
+    def __init__(self, ids, codes, quantizer, float_vectors=None):
+        self.ids = list(ids)
+        self.codes = codes
+        self.quantizer = quantizer
+        self.float_vectors = float_vectors
+
+    @classmethod
+    def build(cls, ids, vectors, quantizer):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        quantizer.fit(vectors)
+        return cls(ids, quantizer.encode(vectors), quantizer, vectors)
+
+    def search(self, query, k=10, rescore=4):
+        """Top k (id, score) by approximate score, re-scored exactly over k*rescore candidates"""
+        query = np.asarray(query, dtype=np.float32)
+        approximate = self.quantizer.scores(self.codes, query)
+        pool = min(len(approximate), k * rescore if self.float_vectors is not None else k)
+        if not pool:
+            return []
+        candidates = np.argpartition(-approximate, pool - 1)[:pool]
+        if self.float_vectors is not None and rescore > 1:
+            candidates = np.sort(candidates)  # ascending rows read a memmap sequentially
+            exact = np.asarray(self.float_vectors[candidates]) @ query
+            order = np.argsort(-exact)[:k]
+            return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+        order = candidates[np.argsort(-approximate[candidates])][:k]
+        return [(self.ids[i], float(approximate[i])) for i in order]
+
+    @property
+    def code_bytes(self):
+        extra = sum(array.nbytes for array in self.quantizer.state().values())
+        return self.codes.nbytes + extra
+
+    def save(self, path):
+        np.savez(path, kind=self.quantizer.kind, ids=np.array(self.ids), codes=self.codes,
+                 **self.quantizer.state())
+
+    @classmethod
+    def load(cls, path, float_vectors=None):
+        data = np.load(path, allow_pickle=False)
+        quantizer = QUANTIZERS[str(data['kind'])]().load_state(data)
+        return cls(data['ids'].tolist(), data['codes'], quantizer, float_vectors)
+
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(index, ids, vectors, queries, k, rescore):
+    truth = exact_top_k(vectors, queries, k)
+    found = 0
+    for row, query in enumerate(queries):
+        expected = {ids[i] for i in truth[row]}
+        found += len(expected & {chunk_id for chunk_id, _ in index.search(query, k, rescore)})
+    return found / (len(queries) * min(k, len(ids)))
+
+
+def main(argv=None):
+    from config import get_config
+    from embeddings import EmbeddingStore
+
+    settings = get_config()
+    parser = argparse.ArgumentParser(description='Quantized embedding memory and recall report')
+    parser.add_argument('--store', default=settings.EMBEDDING_DIR)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--pq-subvectors', type=int, default=48)
+    parser.add_argument('--save', action='store_true', help='write quantized indexes next to the store')
+    args = parser.parse_args(argv)
+
+    ids, vectors = EmbeddingStore(args.store).load()
+    if not ids:
+        print("❌ Embedding store is empty, run embeddings.py first")
+        return 1
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    # Perturbed corpus vectors stand in for queries that land near real chunks
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, (len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"📦 {len(ids)} vectors x {vectors.shape[1]} dims, float32 = {vectors.nbytes / 1024:.1f} KiB")
+    for quantizer in (ScalarQuantizer(), ProductQuantizer(args.pq_subvectors)):
+        index = QuantizedIndex.build(ids, vectors, quantizer)
+        saved = 1 - index.code_bytes / vectors.nbytes
+        print(f"🗜️  {quantizer.kind:<5} {index.code_bytes / 1024:.1f} KiB ({saved:.0%} saved)")
+        for rescore in (1, 4):
+            recall = recall_at_k(index, ids, vectors, queries, args.k, rescore)
+            label = 'approximate' if rescore == 1 else f'rescore x{rescore}'
+            print(f"   recall@{args.k} {label:<12} {recall:.3f}")
+        if args.save:
+            index.save(os.path.join(args.store, f'quantized_{quantizer.kind}.npz'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
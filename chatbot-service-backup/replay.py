@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Replay a recorded traffic trace against a running Saarthi instance
+
+Requests are re-issued with their recorded spacing divided by --speed, so an
+admission-day burst keeps its shape and language mix. Each recorded user hash
+becomes one replay user, so follow-ups land in the same conversation. Start
+the target with the LLM stubbed so the replay measures the service and not
+Gemini:
+
+    LLM_STUB=true LLM_STUB_LATENCY=0.8 python app.py
+    python replay.py traffic.ndjson --speed 10 [--url http://localhost:5001 | --socket saarthi.sock]
+
+A stubbed instance keeps everything it writes in its own process: the
+response store, analytics snapshots and knowledge export are off and
+conversations stay in memory, so stub answers never reach the SQLite files
+that real instances warm from and serve.
+
+The report compares the replay's latency and routes with the recorded ones
+and shows how far sending fell behind schedule, the first sign that the
+client pool, not the service, is the bottleneck.
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from traffic import read_trace
+
+MIN_SPEED = 1.0
+MAX_SPEED = 50.0
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    ordered = sorted(values)
+    return {
+        f"p{pct}": ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] for pct in (50, 95, 99)
+    }
+
+
+def http_sender(url, timeout):
+    import requests
+
+    local = threading.local()
+
+    def send(body):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(f"{url}/chat", json=body, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    return send
+
+
+def channel_sender(path, timeout):
+    from channel import ChannelClient
+
+    client = ChannelClient(path, timeout)
+
+    def send(body):
+        reply = client.request('chat', **body)
+        if reply.get('status') == 'error':
+            raise RuntimeError(reply.get('error'))
+        return reply
+
+    return send
+
+
+def replay(trace, send, speed, workers):
+    """Send every trace line on its scaled schedule; returns the measurements"""
+    latencies, lags = [], []
+    routes, errors = Counter(), Counter()
+    lock = threading.Lock()
+
+    def issue(line):
+        body = {'message': line['m'], 'user_id': f"replay-{line['u']}", 'language': line['l']}
+        start = time.perf_counter()
+        try:
+            route = send(body).get('route')
+            error = None
+        except Exception as e:
+            route, error = None, type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if error:
+                errors[error] += 1
+            else:
+                latencies.append(elapsed)
+                routes[route] += 1
+
+    origin = trace[0]['t']
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for line in trace:
+            due = started + (line['t'] - origin) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lags.append(-delay * 1000)
+            pool.submit(issue, line)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(trace),
+        'elapsed': elapsed,
+        'recorded_span': (trace[-1]['t'] - origin),
+        'latency_ms': percentiles(latencies),
+        'recorded_latency_ms': percentiles([line['ms'] for line in trace]),
+        'max_lag_ms': max(lags, default=0.0),
+        'routes': dict(routes),
+        'recorded_routes': dict(Counter(line['r'] for line in trace)),
+        'languages': dict(Counter(line['l'] for line in trace)),
+        'errors': dict(errors)
+    }
+
+
+def print_report(report, speed):
+    span = report['recorded_span']
+    print(f"▶️  {report['requests']} requests, {span:.1f}s recorded, replayed at {speed:g}x in "
+          f"{report['elapsed']:.1f}s ({report['requests'] / report['elapsed']:.1f} req/s)")
+    print(f"🌐 Languages: {report['languages']}")
+    for label, key in (('replay', 'latency_ms'), ('recorded', 'recorded_latency_ms')):
+        stats = report[key]
+        print(f"⏱️  {label:<9} p50 {stats['p50']:.1f} ms   p95 {stats['p95']:.1f}   p99 {stats['p99']:.1f}")
+    print(f"🧭 Routes: replay {report['routes']}   recorded {report['recorded_routes']}")
+    print(f"📉 Max send lag: {report['max_lag_ms']:.1f} ms")
+    if report['errors']:
+        print(f"❌ Errors: {report['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace')
+    parser.add_argument('--speed', type=float, default=1.0, help=f"{MIN_SPEED:g} to {MAX_SPEED:g}")
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--socket', help='replay over the Unix socket channel instead of HTTP')
+    parser.add_argument('--workers', type=int, default=64, help='concurrent requests in flight at most')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--limit', type=int, default=0, help='replay only the first N requests')
+    args = parser.parse_args(argv)
+
+    if not MIN_SPEED <= args.speed <= MAX_SPEED:
+        parser.error(f"--speed must be between {MIN_SPEED:g} and {MAX_SPEED:g}")
+
+    trace = read_trace(args.trace)
+    if args.limit:
+        trace = trace[:args.limit]
+    if not trace:
+        print("⚠️  Empty trace")
+        return 1
+
+    send = channel_sender(args.socket, args.timeout) if args.socket else http_sender(args.url, args.timeout)
+    report = replay(trace, send, args.speed, args.workers)
+    print_report(report, args.speed)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Optional cross-encoder reranking of first-stage retrieval candidates
+
+The cross-encoder scores every (query, chunk) pair of a request in one batch.
+Each call is bounded by a time budget: the batch is shrunk to what the
+observed per-pair cost says will fit, and if scoring still overruns, the
+first-stage order is used. Scores are cached per (query hash, chunk id), so
+a repeated query only scores the candidates it has no score for yet, however
+the budget cut the earlier batch, and a scoring run that finishes after its
+request gave up still fills the cache for the next identical query.
+"""
+
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # sentence-transformers is only needed when reranking is enabled
+    CrossEncoder = None
+
+
+class Reranker:
+    def __init__(self, model_name, top_n=20, budget_ms=150, skip_margin=0.35, cache_size=40960, model=None):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.skip_margin = skip_margin
+        self.cache = ResponseCache(cache_size)  # (query hash, chunk id) -> score
+        self.ms_per_pair = None  # moving average of observed scoring cost
+        self.outcomes = {'reranked': 0, 'cached': 0, 'margin': 0, 'budget': 0, 'trivial': 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rerank')
+
+        self.model = model
+        if self.model is None:
+            if CrossEncoder is None:
+                raise ImportError("sentence-transformers is required for reranking")
+            logger.info(f"Loading cross-encoder {model_name}")
+            self.model = CrossEncoder(model_name)
+
+    def is_decisive(self, candidates):
+        """True when the first-stage winner is far enough ahead to skip reranking"""
+        top, runner_up = candidates[0][1], candidates[1][1]
+        return top > 0 and (top - runner_up) / top >= self.skip_margin
+
+    def rerank(self, query, candidates, k, budget_ms=None, cache_key=None):
+        """Reorder (chunk, score) candidates and return (top k pairs, outcome)
+
+        `cache_key` is the normalized query key; the raw query is what the
+        cross-encoder scores.
+        """
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+
+        if len(candidates) < 2:
+            return self._keep(candidates, k, 'trivial')
+        if self.is_decisive(candidates):
+            return self._keep(candidates, k, 'margin')
+
+        query_hash = hashlib.sha1((cache_key or query).encode('utf-8')).hexdigest()
+        candidates = candidates[:self.top_n]
+        scores = [self.cache.get((query_hash, chunk.id)) for chunk, _ in candidates]
+        outcome = 'cached'
+
+        if None in scores:
+            if self.ms_per_pair:
+                # Only send as many unscored pairs as the budget is expected to cover
+                affordable = int(budget_ms / self.ms_per_pair)
+                if affordable < 2:
+                    return self._keep(candidates, k, 'budget')
+                cut = self._cut(scores, max(k, affordable))
+                candidates, scores = candidates[:cut], scores[:cut]
+
+            unscored = [candidate for candidate, score in zip(candidates, scores) if score is None]
+            future = self._executor.submit(self._score, query, query_hash, unscored)
+            try:
+                fresh = iter(future.result(timeout=budget_ms / 1000))
+                outcome = 'reranked'
+            except TimeoutError:
+                future.cancel()
+                return self._keep(candidates, k, 'budget')
+            scores = [next(fresh) if score is None else score for score in scores]
+
+        self.outcomes[outcome] += 1
+        ranked = sorted(zip(candidates, scores), key=lambda pair: pair[1], reverse=True)
+        return [(chunk, float(score)) for (chunk, _), score in ranked[:k]], outcome
+
+    def _keep(self, candidates, k, outcome):
+        """Fall back to the first-stage order"""
+        self.outcomes[outcome] += 1
+        return candidates[:k], outcome
+
+    @staticmethod
+    def _cut(scores, allowance):
+        """Length of the longest prefix with at most `allowance` unscored candidates"""
+        unscored = 0
+        for index, score in enumerate(scores):
+            if score is None:
+                unscored += 1
+                if unscored > allowance:
+                    return index
+        return len(scores)
+
+    def _score(self, query, query_hash, candidates):
+        start = time.perf_counter()
+        pairs = [(query, f"{chunk.title}\n{chunk.text}") for chunk, _ in candidates]
+        scores = [float(score) for score in self.model.predict(pairs, batch_size=len(pairs))]
+        per_pair = (time.perf_counter() - start) * 1000 / len(pairs)
+        self.ms_per_pair = per_pair if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * per_pair
+        for (chunk, _), score in zip(candidates, scores):
+            self.cache.put((query_hash, chunk.id), score)
+        return scores
+
+    def stats(self):
+        return {
+            'model': self.model_name,
+            'ms_per_pair': self.ms_per_pair,
+            'outcomes': dict(self.outcomes),
+            'cache': self.cache.stats()
+        }
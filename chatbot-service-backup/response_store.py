@@ -0,0 +1,214 @@
+"""Persistent SQLite store of generated answers shared by all workers
+
+Answers are keyed on (normalized query key, language, KB version, prompt
+version), so a KB or prompt edit simply stops matching old rows. The database
+runs in WAL mode: every worker process reads concurrently through its own
+per-thread connections, while writes from a process go through one queue
+drained by a single writer thread in batches. Rows carry a TTL and hit count;
+compaction drops expired rows and rows of versions superseded by more than
+`retain_versions` newer ones, and `warm()` returns the hottest current rows so
+a freshly started worker does not begin cold. Workers reload a KB edit at
+slightly different times, so the version a worker just left is still being
+served by its neighbours and is never compacted away.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    query_key TEXT NOT NULL,
+    language TEXT NOT NULL,
+    kb_version TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit REAL,
+    PRIMARY KEY (query_key, language, kb_version, prompt_version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_hot ON responses (kb_version, prompt_version, hits DESC);
+CREATE INDEX IF NOT EXISTS responses_expiry ON responses (expires_at);
+"""
+
+WRITE_BATCH = 200
+_STOP = object()
+
+
+class ResponseStore:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, compact_interval=3600, retain_versions=3):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.retain_versions = retain_versions
+        self.compact_interval = compact_interval
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self.writes = 0
+        self.reads = 0
+        self.read_hits = 0
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+        self._writer = threading.Thread(target=self._write_loop, name='response-store-writer', daemon=True)
+        self._writer.start()
+        logger.info(f"Response store ready at {path}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get(self, key, language, kb_version, prompt_version):
+        """Return (response, sources) for a live row, or None"""
+        self.reads += 1
+        row = self._reader().execute(
+            'SELECT response, sources FROM responses '
+            'WHERE query_key = ? AND language = ? AND kb_version = ? AND prompt_version = ? '
+            'AND expires_at > ?',
+            (key, language, kb_version, prompt_version, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        self.read_hits += 1
+        self._queue.put(('hit', (time.time(), key, language, kb_version, prompt_version)))
+        return row[0], json.loads(row[1])
+
+    def put(self, key, language, kb_version, prompt_version, response, sources):
+        now = time.time()
+        self._queue.put(('put', (
+            key, language, kb_version, prompt_version, response,
+            json.dumps(sources, ensure_ascii=False), now, now + self.ttl_seconds
+        )))
+
+    def warm(self, kb_version, prompt_version, limit=500):
+        """Hottest live rows for the current versions as ((language, key), (response, sources))"""
+        rows = self._reader().execute(
+            'SELECT language, query_key, response, sources FROM responses '
+            'WHERE kb_version = ? AND prompt_version = ? AND expires_at > ? '
+            'ORDER BY hits DESC LIMIT ?',
+            (kb_version, prompt_version, time.time(), limit)
+        ).fetchall()
+        return [((language, key), (response, json.loads(sources))) for language, key, response, sources in rows]
+
+    def top_queries(self, limit=200):
+        """Most requested (language, key) pairs across every version, for re-warming after a change"""
+        return self._reader().execute(
+            'SELECT language, query_key FROM responses GROUP BY language, query_key '
+            'ORDER BY SUM(hits) DESC LIMIT ?',
+            (limit,)
+        ).fetchall()
+
+    def compact(self, keep_versions=None):
+        """Queue removal of expired rows and, when keep_versions [(kb, prompt), ...] is given, of rows
+        in neither those versions nor the `retain_versions` most recently written ones"""
+        self._queue.put(('compact', keep_versions))
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self):
+        self._queue.put((_STOP, None))
+        self._writer.join(timeout=5.0)
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {
+            'path': self.path,
+            'rows': rows,
+            'reads': self.reads,
+            'read_hits': self.read_hits,
+            'writes': self.writes,
+            'queued': self._queue.qsize()
+        }
+
+    def _write_loop(self):
+        conn = self._connect()
+        next_compaction = time.time() + self.compact_interval
+
+        while True:
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters = []
+            stop = compacted = False
+            try:
+                with conn:
+                    for op, payload in batch:
+                        if op is _STOP:
+                            stop = True
+                            break
+                        if op == 'put':
+                            conn.execute(
+                                'INSERT OR REPLACE INTO responses '
+                                '(query_key, language, kb_version, prompt_version, response, sources, '
+                                'created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', payload)
+                            self.writes += 1
+                        elif op == 'hit':
+                            conn.execute(
+                                'UPDATE responses SET hits = hits + 1, last_hit = ? '
+                                'WHERE query_key = ? AND language = ? AND kb_version = ? AND prompt_version = ?',
+                                payload)
+                        elif op == 'compact':
+                            self._compact(conn, payload)
+                            compacted = True
+                        elif op == 'flush':
+                            waiters.append(payload)
+
+                    if self.compact_interval and time.time() >= next_compaction:
+                        next_compaction = time.time() + self.compact_interval
+                        self._compact(conn, None)
+                        compacted = True
+
+                if compacted:
+                    # Give the space of deleted rows back instead of growing the WAL
+                    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            except sqlite3.Error as e:
+                logger.error(f"Response store write failed: {e}")
+            for done in waiters:
+                done.set()
+
+            if stop:
+                conn.close()
+                return
+
+    def _compact(self, conn, keep_versions):
+        removed = conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),)).rowcount
+        if keep_versions:
+            placeholders = ' OR '.join('(kb_version = ? AND prompt_version = ?)' for _ in keep_versions)
+            params = [value for pair in keep_versions for value in pair]
+            removed += conn.execute(
+                f'DELETE FROM responses WHERE NOT ({placeholders}) AND (kb_version, prompt_version) NOT IN ('
+                'SELECT kb_version, prompt_version FROM responses GROUP BY kb_version, prompt_version '
+                'ORDER BY MAX(created_at) DESC LIMIT ?)',
+                params + [self.retain_versions]
+            ).rowcount
+        if removed:
+            logger.info(f"Response store compaction removed {removed} rows")
@@ -0,0 +1,158 @@
+"""Document chunking and first-stage retrieval over the JECRC knowledge files"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from dedupe import collapse_near_duplicates
+from knowledge import KNOWLEDGE_BASE_PATH, SERVICE_DIR, UNKNOWN_INTENT
+from normalizer import index_terms
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_PATH = os.path.join(SERVICE_DIR, 'jecrc_knowledge_base.md')
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*)$')
+
+
+class Chunk:
+    """One retrievable passage; `id` is a hash of its content"""
+
+    __slots__ = ('id', 'source', 'title', 'text')
+
+    def __init__(self, source, title, text):
+        self.source = source
+        self.title = title
+        self.text = text
+        self.id = hashlib.sha1(f"{title}\n{text}".encode('utf-8')).hexdigest()[:16]
+
+    def to_dict(self):
+        return {'id': self.id, 'source': self.source, 'title': self.title, 'text': self.text}
+
+
+def chunk_markdown(path=DOCUMENTS_PATH):
+    """Split a markdown file into one chunk per section, titled by its heading path"""
+    source = os.path.basename(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    chunks = []
+    headings = []  # (level, title) of the enclosing sections
+    body = []
+
+    def flush():
+        text = '\n'.join(line for line in body if line.strip()).strip()
+        if text:
+            # Level-1 headings name the whole document, not the section
+            title = ' > '.join(title for level, title in headings if level > 1)
+            chunks.append(Chunk(source, title, text))
+        body.clear()
+
+    for line in lines:
+        match = HEADING_PATTERN.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, match.group(2).strip()))
+        else:
+            body.append(line)
+    flush()
+    return chunks
+
+
+def chunk_knowledge_base(path=KNOWLEDGE_BASE_PATH):
+    """One chunk per intent answer and language from knowledge_base.json"""
+    source = os.path.basename(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        intents = json.load(f)
+
+    chunks = []
+    for intent, entry in intents.items():
+        if intent == UNKNOWN_INTENT:
+            continue
+        for language, answer in entry.get('responses', {}).items():
+            chunks.append(Chunk(source, f"{intent} ({language})", answer))
+    return chunks
+
+
+def load_corpus(docs_path=DOCUMENTS_PATH, kb_path=KNOWLEDGE_BASE_PATH, dedupe=True):
+    """Every chunk the service can index, near-duplicates collapsed into the earliest copy"""
+    chunks = chunk_markdown(docs_path) + chunk_knowledge_base(kb_path)
+    if dedupe:
+        chunks, _ = collapse_near_duplicates(chunks)
+    return chunks
+
+
+class LexicalRetriever:
+    """BM25 over chunk titles and text"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(index_terms(f"{c.title} {c.text}")) for c in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if chunks else 0.0
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def search(self, query, k=5):
+        """Return up to k (chunk, score) pairs with a positive score, best first"""
+        terms = [t for t in index_terms(query) if t in self.idf]
+        if not terms:
+            return []
+
+        scored = []
+        for index, counts in enumerate(self.term_counts):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.avg_length)
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((self.chunks[index], score))
+
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:k]
+
+
+def fuse_rankings(rankings, k, offset=60):
+    """Reciprocal rank fusion of several [(chunk, score)] lists into one"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (chunk, _) in enumerate(ranking):
+            entry = fused.setdefault(chunk.id, [chunk, 0.0])
+            entry[1] += 1.0 / (offset + rank + 1)
+    ordered = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)
+    return [(chunk, score) for chunk, score in ordered[:k]]
+
+
+class DenseRetriever:
+    """Embedding search through the ANN index, resolved against the current chunks
+
+    The index is built offline from the embedding store, so ids of chunks
+    that no longer exist in the live snapshot are skipped.
+    """
+
+    def __init__(self, index, encoder, nprobe=8):
+        self.index = index
+        self.encoder = encoder
+        self.nprobe = nprobe
+
+    def search(self, query, chunks_by_id, k=5, nprobe=None):
+        vector = self.encoder.encode(query)
+        hits = self.index.search(vector, k * 2, nprobe or self.nprobe)
+        return [(chunks_by_id[chunk_id], score) for chunk_id, score in hits if chunk_id in chunks_by_id][:k]
@@ -0,0 +1,149 @@
+"""Cost-aware routing of chat queries to the cheapest path likely to succeed
+
+Routes, cheapest first:
+
+- facts      templated answer from the facts table
+- cache      previously generated answer for the same query key
+- kb         canned multilingual answer of a confidently matched intent
+- rag_short  retrieval plus a short, token-capped generation
+- llm        retrieval plus full generation
+
+The decision uses features that are already computed before any expensive
+stage runs: language, intent, match confidence, query length and whether the
+message reads as a follow-up to an earlier turn. Every decision and its
+outcome is logged as one JSON line on the `router` logger, and the thresholds
+can be overridden from evaluate.py to tune them offline.
+"""
+
+import json
+import logging
+import threading
+
+from knowledge import UNKNOWN_INTENT
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ('facts', 'cache', 'kb', 'rag_short', 'llm')
+
+# Words that only make sense with an earlier turn ("उसकी फीस?", "what about them?");
+# "it" is left out because students also write the IT branch that way
+FOLLOW_UP_MARKERS = frozenset({
+    'those', 'them', 'their', 'theirs',
+    'इसका', 'इसकी', 'इसके', 'उसका', 'उसकी', 'उसके', 'इसमें', 'उसमें', 'वहां', 'वहाँ',
+    'इणरो', 'इणरी', 'उणरो', 'उणरी', 'उठै',
+    'iska', 'iski', 'iske', 'uska', 'uski', 'uske', 'usme', 'isme', 'wahan',
+})
+# Marker words that only signal a follow-up when they open the message ("and hostel?")
+FOLLOW_UP_OPENERS = frozenset({'and', 'also', 'then', 'और', 'अर', 'aur', 'phir', 'फिर'})
+FOLLOW_UP_PHRASES = ('what about', 'how about', 'aur kya', 'और क्या')
+
+
+def is_follow_up(text):
+    """True when a normalized message leans on an earlier turn"""
+    tokens = text.split()
+    if not tokens:
+        return False
+    if tokens[0] in FOLLOW_UP_OPENERS or text.startswith(FOLLOW_UP_PHRASES):
+        return True
+    return any(token in FOLLOW_UP_MARKERS for token in tokens)
+
+
+class RouteDecision:
+    __slots__ = ('route', 'reason', 'try_facts', 'try_cache', 'features')
+
+    def __init__(self, route, reason, try_facts, try_cache, features):
+        self.route = route
+        self.reason = reason
+        self.try_facts = try_facts
+        self.try_cache = try_cache
+        self.features = features
+
+
+class QueryRouter:
+    """Picks a route from cheap features; thresholds are plain attributes"""
+
+    def __init__(self, kb_confidence=93, kb_max_terms=6, short_confidence=85, short_max_terms=12,
+                 short_max_tokens=256, facts_max_terms=8):
+        self.kb_confidence = kb_confidence
+        self.kb_max_terms = kb_max_terms
+        self.short_confidence = short_confidence
+        self.short_max_terms = short_max_terms
+        self.short_max_tokens = short_max_tokens
+        self.facts_max_terms = facts_max_terms
+        self._lock = threading.Lock()
+        self._stats = {route: {'requests': 0, 'fallbacks': 0, 'errors': 0, 'total_ms': 0.0} for route in ROUTES}
+
+    @classmethod
+    def from_settings(cls, settings, **overrides):
+        thresholds = {
+            'kb_confidence': settings.ROUTER_KB_CONFIDENCE,
+            'kb_max_terms': settings.ROUTER_KB_MAX_TERMS,
+            'short_confidence': settings.ROUTER_SHORT_CONFIDENCE,
+            'short_max_terms': settings.ROUTER_SHORT_MAX_TERMS,
+            'short_max_tokens': settings.ROUTER_SHORT_MAX_TOKENS,
+            'facts_max_terms': settings.ROUTER_FACTS_MAX_TERMS,
+        }
+        thresholds.update(overrides)
+        return cls(**thresholds)
+
+    def thresholds(self):
+        return {
+            'kb_confidence': self.kb_confidence,
+            'kb_max_terms': self.kb_max_terms,
+            'short_confidence': self.short_confidence,
+            'short_max_terms': self.short_max_terms,
+            'short_max_tokens': self.short_max_tokens,
+            'facts_max_terms': self.facts_max_terms,
+        }
+
+    def route(self, text, key, language, intent, confidence):
+        """Decide how to answer; facts and cache are tried first when allowed"""
+        terms = len(key.split())
+        follow_up = is_follow_up(text)
+        features = {
+            'language': language,
+            'intent': intent,
+            'confidence': confidence,
+            'terms': terms,
+            'follow_up': follow_up
+        }
+
+        if follow_up:
+            # Standalone answers would ignore what the earlier turn was about
+            return RouteDecision('llm', 'follow_up', False, False, features)
+
+        try_facts = terms <= self.facts_max_terms
+        known = intent != UNKNOWN_INTENT
+        if known and confidence >= self.kb_confidence and terms <= self.kb_max_terms:
+            return RouteDecision('kb', 'confident_intent', try_facts, True, features)
+        if (known and confidence >= self.short_confidence) or terms <= self.short_max_terms:
+            return RouteDecision('rag_short', 'known_intent' if known else 'short_query', try_facts, True, features)
+        return RouteDecision('llm', 'open_question', try_facts, True, features)
+
+    def record(self, decision, route, elapsed_ms, fallback=False, error=False):
+        """Log one decision with the route that actually answered and how it went"""
+        with self._lock:
+            stats = self._stats[route]
+            stats['requests'] += 1
+            stats['fallbacks'] += int(fallback)
+            stats['errors'] += int(error)
+            stats['total_ms'] += elapsed_ms
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(json.dumps({
+            'decision': decision.route,
+            'reason': decision.reason,
+            'route': route,
+            'fallback': fallback,
+            'error': error,
+            'ms': round(elapsed_ms, 3),
+            **decision.features
+        }, ensure_ascii=False))
+
+    def stats(self):
+        with self._lock:
+            routes = {
+                route: dict(stats, mean_ms=stats['total_ms'] / stats['requests'] if stats['requests'] else 0.0)
+                for route, stats in self._stats.items()
+            }
+        return {'thresholds': self.thresholds(), 'routes': routes}
@@ -0,0 +1,171 @@
+"""Immutable knowledge snapshots with background rebuild and atomic swap
+
+Request handlers read `SnapshotManager.current` once and use that snapshot for
+the whole request. A reload builds a complete new snapshot off to the side and
+then replaces the reference in a single assignment, so readers never lock and
+in-flight requests finish on the snapshot they started with.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from cache import ResponseCache
+from facts import FactTable, parse_facts
+from generation import GENERATION_PROFILES_PATH, GenerationProfiles
+from memory import approx_size
+from knowledge import KNOWLEDGE_BASE_PATH, SERVICE_DIR, KnowledgeBase
+from dedupe import collapse_near_duplicates
+from retrieval import DOCUMENTS_PATH, LexicalRetriever, load_corpus
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT_PATH = os.path.join(SERVICE_DIR, 'system_prompt.txt')
+
+
+def file_digest(*paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class KnowledgeSnapshot:
+    """Everything derived from the KB files, built once and never mutated"""
+
+    __slots__ = ('kb_version', 'prompt_version', 'knowledge_base', 'retriever', 'chunks', 'facts',
+                 'system_prompt', 'generation_profiles', 'response_cache', 'created_at', 'dedupe_report', '_memory_bytes')
+
+    def __init__(self, kb_path=KNOWLEDGE_BASE_PATH, prompt_path=SYSTEM_PROMPT_PATH,
+                 docs_path=DOCUMENTS_PATH, cache_size=1000, profiles_path=GENERATION_PROFILES_PATH):
+        self.kb_version = file_digest(kb_path, docs_path)
+        # Profiles shape every generated answer, so they version with the prompt
+        self.prompt_version = file_digest(prompt_path, profiles_path)
+        self.knowledge_base = KnowledgeBase(kb_path)
+        corpus, self.dedupe_report = collapse_near_duplicates(load_corpus(docs_path, kb_path, dedupe=False))
+        docs_source = os.path.basename(docs_path)
+        self.retriever = LexicalRetriever([chunk for chunk in corpus if chunk.source == docs_source])
+        # Every indexable chunk by id, for resolving dense index hits
+        self.chunks = {chunk.id: chunk for chunk in corpus}
+        self.facts = FactTable(parse_facts(docs_path))
+        with open(prompt_path, 'r', encoding='utf-8') as f:
+            self.system_prompt = f.read()
+        self.generation_profiles = GenerationProfiles(profiles_path)
+        self.response_cache = ResponseCache(cache_size)
+        self.created_at = time.time()
+        self._memory_bytes = None
+
+    @property
+    def version(self):
+        return f"{self.kb_version}-{self.prompt_version}"
+
+    def memory_bytes(self):
+        """Approximate size of the parsed knowledge, excluding the response cache"""
+        if self._memory_bytes is None:
+            chunks = list(self.retriever.chunks) + list(self.chunks.values())
+            self._memory_bytes = (
+                sum(approx_size(chunk.title) + approx_size(chunk.text) for chunk in chunks)
+                + sum(approx_size(counts) for counts in self.retriever.term_counts)
+                + approx_size(self.retriever.idf)
+                + sum(approx_size(fact.value) + approx_size(fact.section) for fact in self.facts.facts)
+                + approx_size(self.knowledge_base.intents, depth=5)
+                + approx_size(self.system_prompt)
+            )
+        return self._memory_bytes
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'kb_version': self.kb_version,
+            'prompt_version': self.prompt_version,
+            'intents': len(self.knowledge_base.intents),
+            'chunks': len(self.retriever.chunks),
+            'facts': len(self.facts),
+            'near_duplicates_collapsed': len(self.dedupe_report['collapsed']),
+            'conflicts': self.dedupe_report['conflicts'],
+            'created_at': self.created_at,
+            'response_cache': self.response_cache.stats()
+        }
+
+
+class SnapshotManager:
+    """Owns the current snapshot and rebuilds it when the source files change"""
+
+    def __init__(self, kb_path=KNOWLEDGE_BASE_PATH, prompt_path=SYSTEM_PROMPT_PATH,
+                 docs_path=DOCUMENTS_PATH, cache_size=1000, profiles_path=GENERATION_PROFILES_PATH):
+        self.kb_path = kb_path
+        self.prompt_path = prompt_path
+        self.docs_path = docs_path
+        self.profiles_path = profiles_path
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()  # serialises writers only
+        self._watcher = None
+        self._swap_listeners = []
+        self._mtimes = self._source_mtimes()
+        self.current = self._build()
+        self.last_error = None
+
+    def _source_mtimes(self):
+        paths = (self.kb_path, self.prompt_path, self.docs_path, self.profiles_path)
+        return tuple(os.path.getmtime(path) for path in paths)
+
+    def _build(self):
+        return KnowledgeSnapshot(self.kb_path, self.prompt_path, self.docs_path, self.cache_size,
+                                 self.profiles_path)
+
+    def reload(self):
+        """Build a new snapshot and swap it in; returns True when the version changed"""
+        with self._reload_lock:
+            self._mtimes = self._source_mtimes()
+            try:
+                snapshot = self._build()
+            except Exception as e:
+                # Keep serving the old snapshot when the edited files are broken
+                self.last_error = str(e)
+                logger.error(f"Knowledge reload failed, keeping {self.current.version}: {e}")
+                return False
+
+            self.last_error = None
+            previous = self.current
+            if snapshot.version == previous.version:
+                return False
+
+            self.current = snapshot
+            logger.info(f"Knowledge snapshot swapped {previous.version} -> {snapshot.version}")
+            for listener in self._swap_listeners:
+                try:
+                    listener(snapshot, previous)
+                except Exception as e:
+                    logger.error(f"Snapshot swap listener failed: {e}")
+            return True
+
+    def on_swap(self, listener):
+        """Call listener(new, previous) on the reload thread after each swap"""
+        self._swap_listeners.append(listener)
+
+    def reload_async(self):
+        """Rebuild in a background thread so the caller never waits on parsing"""
+        thread = threading.Thread(target=self.reload, name='kb-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def start_watching(self, interval=2.0):
+        """Poll the KB, document and prompt files and reload when any changes"""
+        if interval <= 0 or self._watcher:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self._source_mtimes() != self._mtimes:
+                        self.reload()
+                except OSError as e:
+                    logger.warning(f"Knowledge watcher could not stat sources: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='kb-watcher', daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching knowledge files every {interval}s")
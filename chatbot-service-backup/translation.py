@@ -0,0 +1,136 @@
+"""Glossary query translation for cross-lingual lexical retrieval
+
+jecrc_knowledge_base.md is written in English, so BM25 finds nothing for a
+Devanagari or romanized-Hindi query unless its words happen to be English
+loanwords. Before lexical search, `translate_query()` appends the English
+index terms of every glossary word in the query:
+
+    "रविवार को लाइब्रेरी का समय"  ->  "रविवार को लाइब्रेरी का समय sunday library timings"
+
+The original words stay in the query, so Hindi and Rajasthani answer chunks
+still match too. Dense retrieval needs no translation: the embedding model is
+multilingual and maps the query and the English chunks into one space.
+
+Glossary keys are folded like queries (nukta, case) and a few inflection
+endings are stripped on lookup, so सुविधाएं and सुविधावां find सुविधा. The
+function is memoized because the same hot questions arrive again and again.
+"""
+
+from functools import lru_cache
+
+from normalizer import fold
+
+# Devanagari, Rajasthani and romanized words -> English terms as they appear in the md
+_GLOSSARY = {
+    'library': ('पुस्तकालय', 'लाइब्रेरी', 'वाचनालय', 'pustakalay'),
+    'timings': ('समय', 'टाइमिंग', 'टैम', 'वक्त', 'samay', 'timing'),
+    'sunday': ('रविवार', 'इतवार', 'दीतवार', 'ravivar'),
+    'exam period': ('परीक्षा', 'एग्जाम', 'इम्तिहान', 'pariksha'),
+    'digital': ('डिजिटल',),
+    'books': ('किताब', 'किताबें', 'पुस्तक', 'पोथी', 'kitab'),
+    'fee structure': ('फीस', 'शुल्क', 'खर्चा', 'खर्च', 'kharcha'),
+    'tuition': ('ट्यूशन',),
+    'development': ('विकास',),
+    'caution deposit': ('जमा', 'डिपॉजिट', 'जमानत'),
+    'hostel': ('हॉस्टल', 'छात्रावास', 'होस्टल', 'chhatravas'),
+    'rooms': ('कमरा', 'कमरे', 'रूम', 'kamra'),
+    'ac': ('एसी',),
+    'mess food': ('मेस', 'खाना', 'भोजन', 'रोटी', 'khana'),
+    'admission process': ('दाखला', 'दाखले', 'दाखिला', 'प्रवेश', 'एडमिशन', 'dakhla', 'dakhila', 'pravesh'),
+    'eligibility': ('योग्यता', 'पात्रता', 'जरूरत', 'yogyata'),
+    'minimum': ('न्यूनतम', 'प्रतिशत', 'अंक'),
+    'age limit': ('उम्र', 'आयु', 'उमर', 'umar', 'umra'),
+    'dates': ('तारीख', 'तिथि', 'तारीखें'),
+    'counseling': ('काउंसलिंग', 'परामर्श'),
+    'scholarships scholarship': ('छात्रवृत्ति', 'स्कॉलरशिप', 'वजीफा', 'chhatravritti', 'vazifa'),
+    'girl girls': ('लडकी', 'लडकियों', 'छात्रा', 'छात्राओं', 'छोरी', 'छोरियां', 'ladki'),
+    'boys': ('लडका', 'लडके', 'लडकों', 'छात्र', 'छोरा', 'छोरे', 'ladka'),
+    'merit': ('मेरिट',),
+    'programs': ('कोर्स', 'पाठ्यक्रम', 'प्रोग्राम', 'course'),
+    'branch': ('ब्रांच', 'शाखा', 'स्ट्रीम'),
+    'department': ('विभाग', 'डिपार्टमेंट', 'vibhag'),
+    'computer science': ('कंप्यूटर', 'कम्प्यूटर', 'सीएस', 'सीएसई'),
+    'mechanical': ('मैकेनिकल',),
+    'civil': ('सिविल',),
+    'electronics communication': ('इलेक्ट्रॉनिक्स', 'ईसी'),
+    'labs': ('लैब', 'प्रयोगशाला', 'lab'),
+    'faculty professors': ('शिक्षक', 'प्रोफेसर', 'अध्यापक', 'गुरुजी', 'faculty'),
+    'placement': ('प्लेसमेंट', 'नौकरी', 'रोजगार', 'naukri'),
+    'package': ('पैकेज', 'सैलरी', 'वेतन', 'तनख्वाह', 'salary'),
+    'average': ('औसत',),
+    'highest': ('सबसे', 'सबसूं', 'अधिकतम'),
+    'recruiters companies': ('कंपनी', 'कंपनियां', 'कंपनियों', 'कम्पनी'),
+    'training': ('ट्रेनिंग', 'प्रशिक्षण'),
+    'interview': ('इंटरव्यू', 'साक्षात्कार'),
+    'sports': ('खेल', 'खेलकूद', 'स्पोर्ट्स', 'khel'),
+    'gymnasium': ('जिम', 'व्यायामशाला'),
+    'cricket': ('क्रिकेट',),
+    'medical doctor': ('डॉक्टर', 'अस्पताल', 'दवा', 'चिकित्सा', 'बीमार', 'doctor'),
+    'ambulance': ('एम्बुलेंस',),
+    'security safety': ('सुरक्षा', 'सिक्योरिटी', 'गार्ड', 'suraksha'),
+    'transportation bus routes': ('बस', 'परिवहन', 'ट्रांसपोर्ट', 'यातायात', 'gaadi'),
+    'parking': ('पार्किंग',),
+    'facilities': ('सुविधा', 'सुविधाएं', 'सुविधाएँ', 'सुविधावां', 'suvidha'),
+    'contact': ('संपर्क', 'कांटेक्ट', 'sampark'),
+    'phone': ('फोन', 'मोबाइल', 'phone'),
+    'email': ('ईमेल', 'मेल'),
+    'emergency': ('आपातकाल', 'इमरजेंसी', 'आपात'),
+    'research': ('रिसर्च', 'शोध', 'अनुसंधान'),
+    'clubs societies': ('क्लब', 'संस्था'),
+    'events': ('उत्सव', 'फेस्ट', 'कार्यक्रम'),
+}
+
+GLOSSARY = {fold(word): english for english, words in _GLOSSARY.items() for word in words}
+
+# Plural and oblique endings tried when a word is not in the glossary as written
+INFLECTION_ENDINGS = ('ियों', 'ियां', 'वां', 'ओं', 'एं', 'एँ', 'ों', 'ें')
+
+
+def lookup(word):
+    """English terms for one folded word, or None"""
+    english = GLOSSARY.get(word)
+    if english is None:
+        for ending in INFLECTION_ENDINGS:
+            if word.endswith(ending) and len(word) > len(ending) + 1:
+                english = GLOSSARY.get(word[:-len(ending)])
+                if english is not None:
+                    break
+    return english
+
+
+@lru_cache(maxsize=8192)
+def translate_query(text, language=None):
+    """Normalized query with the English terms of its glossary words appended
+
+    English queries are returned unchanged. Words without an entry are kept
+    as they are, so an unknown query still searches exactly as before.
+    """
+    if language == 'en':
+        return text
+    added = []
+    for word in text.split():
+        english = lookup(word)
+        if english and english not in added:
+            added.append(english)
+    return f"{text} {' '.join(added)}" if added else text
+
+
+# lru_cache does not expose its entries, so memory is estimated per entry
+MEMO_ENTRY_BYTES = 400
+
+
+def memory_bytes():
+    return translate_query.cache_info().currsize * MEMO_ENTRY_BYTES
+
+
+def shrink(target_bytes):
+    """Clear the memo table when it exceeds target_bytes; returns bytes freed"""
+    size = memory_bytes()
+    if size <= target_bytes:
+        return 0
+    translate_query.cache_clear()
+    return size
+
+
+def cache_info():
+    return {'translate_query': translate_query.cache_info()._asdict(), 'glossary_words': len(GLOSSARY)}
@@ -0,0 +1,211 @@
+"""Background pre-warming of the response cache after startup and KB reloads
+
+The warm set is one query per knowledge_base.json intent in en, hi and raj
+(built from the intent's keywords) plus the most requested query keys seen
+by the query analytics and stored in the response store. Each is run through the normal chat pipeline
+on a small thread pool, paced by a token bucket and queued for the LLM behind
+interactive chats so live traffic keeps the quota, and entries that are
+already cached are skipped.
+
+Only one worker of a node warms at a time: a pass runs while holding an
+exclusive lock on `lock_path`, and a worker that finds it taken skips the
+pass. Its answers reach the other workers through the shared response store,
+which they read on a cache miss, so a deploy or /admin/reload makes one set
+of Gemini calls rather than one per worker. Without a response store the
+other workers stay cold.
+"""
+
+import fcntl
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from knowledge import DEVANAGARI_PATTERN, UNKNOWN_INTENT
+from llm_limiter import PRIORITY_BATCH
+from normalizer import normalize, query_key
+
+logger = logging.getLogger(__name__)
+
+WARMUP_USER_ID = 'saarthi-warmup'
+WARMUP_LANGUAGES = ('en', 'hi', 'raj')
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, shared by the pool"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def intent_queries(knowledge_base):
+    """(query, language, label) for every intent: a Latin keyword for en, a Devanagari one for hi and raj"""
+    items = []
+    for intent, keywords in knowledge_base.intents.items():
+        if intent == UNKNOWN_INTENT:
+            continue
+        keywords = keywords.get('keywords', [])
+        latin = next((k for k in keywords if not DEVANAGARI_PATTERN.search(k)), None)
+        devanagari = next((k for k in keywords if DEVANAGARI_PATTERN.search(k)), None)
+        for language in WARMUP_LANGUAGES:
+            query = latin if language == 'en' else devanagari
+            if query:
+                items.append((query, language, f"intent:{intent}"))
+    return items
+
+
+class CacheWarmer:
+    """Runs one warm-up pass at a time and reports its progress"""
+
+    def __init__(self, chatbot, workers=2, rate=1.0, history_limit=200, lock_path=None):
+        self.chatbot = chatbot
+        self.lock_path = lock_path
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._thread = None
+        self._again = False
+        self._history = []
+        self.passes = 0
+        self.progress = {'state': 'idle'}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Warm the current snapshot in the background; a call during a pass queues one more pass"""
+        with self._lock:
+            if self.running:
+                self._again = True
+                return False
+            self._thread = threading.Thread(target=self._run_passes, name='cache-warmup', daemon=True)
+            self._thread.start()
+            return True
+
+    def on_snapshot_swap(self, snapshot, previous):
+        self.start()
+
+    def _run_passes(self):
+        while True:
+            self.run()
+            with self._lock:
+                if not self._again:
+                    return
+                self._again = False
+
+    def history_queries(self):
+        """Top live and stored queries, remembered so a pass after compaction still sees the old version's traffic"""
+        if not self.history_limit:
+            return []
+        fresh = []
+        if self.chatbot.analytics:
+            top = self.chatbot.analytics.top(self.history_limit)['top']
+            fresh += [(entry['language'], entry['query']) for entry in top]
+        if self.chatbot.store:
+            fresh += [tuple(row) for row in self.chatbot.store.top_queries(self.history_limit)]
+        merged = list(dict.fromkeys(fresh + self._history))[:self.history_limit]
+        self._history = merged
+        return merged
+
+    def warm_set(self, snapshot):
+        items = intent_queries(snapshot.knowledge_base)
+        seen = {(query, language) for query, language, _ in items}
+        for language, key in self.history_queries():
+            if (key, language) not in seen:
+                items.append((key, language, 'history'))
+        return items
+
+    def _try_lock(self):
+        """Open file holding the node-wide warm-up lock, or None when another worker holds it"""
+        lock = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def run(self):
+        """One pass over the warm set of the current snapshot, unless another worker is warming"""
+        lock = self._try_lock() if self.lock_path else None
+        if self.lock_path and lock is None:
+            self.passes += 1
+            self.progress = {'state': 'skipped', 'reason': 'another worker holds the warm-up lock',
+                             'kb_version': self.chatbot.snapshots.current.version}
+            logger.info(f"Warm-up skipped, {self.lock_path} is held by another worker")
+            return
+        try:
+            self._run_pass()
+        finally:
+            if lock:
+                lock.close()  # closing releases the lock
+
+    def _run_pass(self):
+        snapshot = self.chatbot.snapshots.current
+        items = self.warm_set(snapshot)
+        started = time.time()
+        self.progress = {
+            'state': 'running', 'kb_version': snapshot.version, 'total': len(items),
+            'done': 0, 'generated': 0, 'already_cached': 0, 'answered_locally': 0, 'failed': 0,
+            'started_at': started
+        }
+        logger.info(f"Warming {len(items)} queries for {snapshot.version}")
+
+        def warm(item):
+            query, language, _ = item
+            try:
+                outcome = self.warm_one(query, language, snapshot)
+            except Exception as e:
+                logger.warning(f"Warm-up of {query!r} ({language}) failed: {e}")
+                outcome = 'failed'
+            with self._lock:
+                self.progress[outcome] += 1
+                self.progress['done'] += 1
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup') as pool:
+            list(pool.map(warm, items))
+
+        self.passes += 1
+        self.progress.update(state='done', elapsed=round(time.time() - started, 3))
+        logger.info(f"Warm-up finished: {self.progress}")
+
+    def warm_one(self, query, language, snapshot):
+        """Outcome name for one query; store hits are promoted into the memory cache for free"""
+        key = query_key(normalize(query), language)
+        if self.chatbot.cached_answer((language, key), key, language, snapshot, {}) is not None:
+            return 'already_cached'
+        self.limiter.acquire()
+        result = self.chatbot.process_message(query, WARMUP_USER_ID, language, snapshot, priority=PRIORITY_BATCH)
+        if result['route'] in ('facts', 'kb'):
+            return 'answered_locally'
+        return 'generated' if snapshot.response_cache.get((language, key)) is not None else 'failed'
+
+    def status(self):
+        """Progress of the latest pass; coverage is the share of the warm set answerable without the LLM"""
+        with self._lock:
+            progress = dict(self.progress)
+        if progress.get('total'):
+            answered = progress['generated'] + progress['already_cached'] + progress['answered_locally']
+            progress['coverage'] = round(answered / progress['total'], 4)
+        progress['passes'] = self.passes
+        return progress
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Unit tests for the socket channel framing, multiplexing and serving"""
+
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+import pytest
+
+from channel import HEADER, MAX_FRAME_BYTES, ChannelClient, ChannelServer, Connection, encode_frame, read_frame
+
+
+@pytest.fixture
+def pair():
+    first, second = socket.socketpair()
+    yield first, second
+    first.close()
+    second.close()
+
+
+def serve(server, sock):
+    """Run the server's read loop for one connection in the background"""
+    thread = threading.Thread(target=server._read_loop, args=(Connection(sock),), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_frames_round_trip(pair):
+    first, second = pair
+    first.sendall(encode_frame({'id': 1, 'message': 'लाइब्रेरी का समय?'}) + encode_frame({'id': 2}))
+
+    assert read_frame(second) == {'id': 1, 'message': 'लाइब्रेरी का समय?'}
+    assert read_frame(second) == {'id': 2}
+
+
+def test_closed_peer_ends_the_stream_even_mid_frame(pair):
+    first, second = pair
+    first.sendall(encode_frame({'id': 1})[:-2])
+    first.close()
+
+    assert read_frame(second) is None
+
+
+def test_oversized_frame_is_rejected(pair):
+    first, second = pair
+    first.sendall(HEADER.pack(MAX_FRAME_BYTES + 1))
+
+    with pytest.raises(ValueError):
+        read_frame(second)
+
+
+def test_client_matches_out_of_order_replies_by_id(pair):
+    client_sock, server_sock = pair
+    client = ChannelClient(None, timeout=5, sock=client_sock)
+    replies = {}
+
+    def ask(text):
+        replies[text] = client.request('chat', message=text)['response']
+
+    threads = [threading.Thread(target=ask, args=(text,)) for text in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    requests = [read_frame(server_sock), read_frame(server_sock)]
+    for request in reversed(requests):
+        server_sock.sendall(encode_frame({'id': request['id'], 'type': 'chat', 'response': request['message']}))
+    for thread in threads:
+        thread.join()
+
+    assert replies == {'first': 'first', 'second': 'second'}
+    assert client.pending == {}
+
+
+def test_client_forgets_requests_that_time_out(pair):
+    client_sock, server_sock = pair
+    client = ChannelClient(None, timeout=0.05, sock=client_sock)
+
+    with pytest.raises(TimeoutError):
+        client.request('chat', message='hello')
+    assert client.pending == {}
+
+
+def test_closed_connection_fails_pending_requests(pair):
+    client_sock, server_sock = pair
+    client = ChannelClient(None, timeout=5, sock=client_sock)
+    threading.Timer(0.05, server_sock.close).start()
+
+    with pytest.raises(ConnectionError):
+        client.request('chat', message='hello')
+
+
+def test_server_dispatches_handlers_and_answers_ping(pair):
+    client_sock, server_sock = pair
+    server = ChannelServer(None, {'chat': lambda frame: {'status': 'success', 'response': frame['message']}},
+                           heartbeat=dict)
+    serve(server, server_sock)
+    client = ChannelClient(None, timeout=5, sock=client_sock)
+
+    assert client.request('ping') == {'id': 1, 'type': 'ping'}
+    assert client.request('chat', message='hi')['response'] == 'hi'
+    assert client.request('nonsense')['status'] == 'error'
+
+
+def test_server_sheds_frames_past_max_pending(pair):
+    client_sock, server_sock = pair
+    release = threading.Event()
+
+    def slow(frame):
+        release.wait(5)
+        return {'status': 'success'}
+
+    server = ChannelServer(None, {'chat': slow}, heartbeat=dict, workers=1, max_pending=1)
+    serve(server, server_sock)
+    client = ChannelClient(None, timeout=5, sock=client_sock)
+    first = threading.Thread(target=client.request, args=('chat',))
+    first.start()
+    while not server.pending:
+        time.sleep(0.001)
+
+    reply = client.request('chat')
+    release.set()
+    first.join()
+
+    assert reply['shed'] == 'queue_full'
+    assert server.shed == 1
+    assert server.pending == 0
+
+
+def test_only_one_server_binds_a_path(tmp_path):
+    path = str(tmp_path / 'saarthi.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)  # bound but never listening, like a crashed or half-started worker
+    stale.close()
+
+    first = ChannelServer(path, {}, heartbeat=dict)
+    second = ChannelServer(path, {}, heartbeat=dict)
+    try:
+        assert first.start()
+        assert not second.start()
+        client = ChannelClient(path, timeout=5)
+        assert client.request('ping')['type'] == 'ping'
+        client.close()
+    finally:
+        first.stop()
+    assert not os.path.exists(path)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Unit tests for conversation history backends and the conversation store"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+import pytest
+
+from conversation_state import ConversationStore, MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_backend(request, tmp_path):
+    """Factory for backends sharing one session store, like the workers of a node"""
+    if request.param == 'memory':
+        shared = MemoryBackend()
+        return lambda: shared
+    path = str(tmp_path / 'conversations.sqlite3')
+    return lambda: SQLiteBackend(path)
+
+
+def texts(turns):
+    return [text for _, text in turns]
+
+
+def test_append_keeps_the_last_turns(make_backend):
+    store = ConversationStore(make_backend(), history_limit=2)
+    for i in range(4):
+        store.append('student', f"question {i}", f"answer {i}")
+
+    assert texts(store.history('student')) == ['question 2', 'answer 2', 'question 3', 'answer 3']
+
+
+def test_expired_session_starts_empty(make_backend):
+    backend = make_backend()
+    backend.append('student', [('user', 'hello')], 20, ttl_seconds=0)
+
+    assert backend.load('student') == []
+    assert texts(backend.append('student', [('user', 'again')], 20, 60)) == ['again']
+
+
+def test_appends_from_several_stores_are_not_lost(make_backend):
+    # Each store caches reads, as every worker does; appends must still see each other
+    stores = [ConversationStore(make_backend(), history_limit=100, cache_ttl=60) for _ in range(4)]
+    for store in stores:
+        store.history('student')
+
+    def chat(index, store):
+        for turn in range(10):
+            store.append('student', f"q{index}-{turn}", f"a{index}-{turn}")
+
+    threads = [threading.Thread(target=chat, args=(index, store)) for index, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    turns = make_backend().load('student')
+    assert len(turns) == 80
+    assert {f"q{index}-{turn}" for index in range(4) for turn in range(10)} <= set(texts(turns))
+
+
+def test_store_reads_through_its_cache():
+    backend = MemoryBackend()
+    store = ConversationStore(backend, cache_ttl=60)
+    store.history('student')
+    store.history('student')
+
+    assert store.backend_reads == 1
+    assert store.cache_hits == 1
+
+
+def test_memory_backend_purges_expired_sessions_on_write():
+    backend = MemoryBackend(purge_interval=0)
+    backend.append('gone', [('user', 'hello')], 20, ttl_seconds=0)
+    backend.append('here', [('user', 'hello')], 20, ttl_seconds=60)
+
+    assert set(backend._data) == {'here'}
+
+
+def test_memory_backend_shrink_drops_sessions_closest_to_expiry():
+    backend = MemoryBackend()
+    for i in range(50):
+        backend.append(f"student-{i}", [('user', 'x' * 100)], 20, ttl_seconds=60 + i)
+
+    freed = backend.shrink(backend.memory_bytes() // 2)
+
+    assert freed > 0
+    assert backend.load('student-0') == []
+    assert texts(backend.load('student-49')) == ['x' * 100]
+
+
+def test_sqlite_purge_expired(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'conversations.sqlite3'))
+    backend.append('here', [('user', 'hello')], 20, ttl_seconds=60)  # the first write runs the sweep
+    backend.append('gone', [('user', 'hello')], 20, ttl_seconds=0)
+
+    assert backend.purge_expired() == 1
+    assert texts(backend.load('here')) == ['hello']
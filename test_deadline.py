@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Unit tests for request deadlines"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+import pytest
+
+from deadline import BUDGET_HEADER, DEADLINE_HEADER, Deadline, DeadlineStats
+
+
+def test_no_headers_uses_the_default_budget():
+    assert Deadline.from_headers({}, default_ms=0) is None
+    assert Deadline.from_headers({}, default_ms=1000).budget_ms == 1000
+
+
+def test_earlier_of_budget_and_absolute_deadline_wins():
+    absolute = str(time.time() * 1000 + 500)
+    deadline = Deadline.from_headers({BUDGET_HEADER: '2000', DEADLINE_HEADER: absolute}, default_ms=14000)
+
+    assert 400 < deadline.budget_ms <= 500
+
+
+def test_past_deadline_is_already_expired():
+    deadline = Deadline.from_headers({DEADLINE_HEADER: str(time.time() * 1000 - 1000)})
+
+    assert deadline.budget_ms == 0
+    assert deadline.expired
+    assert deadline.remaining_ms() == 0
+
+
+def test_malformed_header_is_rejected():
+    with pytest.raises(ValueError):
+        Deadline.from_headers({BUDGET_HEADER: 'soon'})
+
+
+def test_share_of_remaining_budget_is_capped():
+    deadline = Deadline(1000)
+
+    assert 400 < deadline.share_ms(0.5) <= 500
+    assert deadline.share_ms(0.5, cap_ms=100) == 100
+
+
+def test_stats_count_by_reason():
+    stats = DeadlineStats()
+    stats.record('llm_skipped')
+    stats.record('llm_skipped')
+    stats.record('llm_timeout')
+
+    assert stats.stats() == {'llm_skipped': 2, 'llm_timeout': 1}
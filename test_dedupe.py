@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Unit tests for near-duplicate chunk detection"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+from dedupe import collapse_near_duplicates, find_near_duplicates
+from retrieval import Chunk
+
+LIBRARY = ("The central library is open from 8 AM to 8 PM on all working days and from 10 AM to 4 PM "
+           "on Sundays, with extended hours during the exam period for students of every branch")
+
+
+def test_identical_chunks_collapse_into_the_earliest():
+    chunks = [Chunk('kb.md', 'Library', LIBRARY), Chunk('circular.md', 'Library hours', LIBRARY),
+              Chunk('kb.md', 'Hostel', "Separate hostels for boys and girls with AC and non-AC rooms")]
+
+    kept, report = collapse_near_duplicates(chunks)
+
+    assert [chunk.title for chunk in kept] == ['Library', 'Hostel']
+    assert report['collapsed'] == [{'dropped': 'circular.md: Library hours', 'into': 'kb.md: Library'}]
+    assert report['conflicts'] == []
+
+
+def test_near_duplicates_quoting_different_numbers_are_kept_as_conflicts():
+    changed = LIBRARY.replace('8 PM', '9 PM')
+    chunks = [Chunk('kb.md', 'Library', LIBRARY), Chunk('circular.md', 'Library', changed)]
+
+    pairs = find_near_duplicates(chunks, threshold=0.5)
+    kept, report = collapse_near_duplicates(chunks, threshold=0.5)
+
+    assert len(pairs) == 1 and pairs[0].conflict
+    assert len(kept) == 2
+    assert report['conflicts'][0]['only_second'] == ['9']
+
+
+def test_chunks_in_different_scripts_are_never_paired():
+    chunks = [Chunk('kb.md', 'Fees', "फीस 1.5 लाख प्रति वर्ष है"), Chunk('kb.md', 'Fees', "fees 1.5 lakh per year")]
+
+    assert find_near_duplicates(chunks, threshold=0.0) == []
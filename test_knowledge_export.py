@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Unit tests for the incremental knowledge export"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+from facts import Fact
+from knowledge_export import KnowledgeExport
+
+
+def snapshot(intents, facts=()):
+    return SimpleNamespace(knowledge_base=SimpleNamespace(intents=intents), facts=SimpleNamespace(facts=list(facts)))
+
+
+def read(export, since=0):
+    lines = [json.loads(line) for line in export.stream(since, 'kb')]
+    return lines[0], {entry['id']: entry for entry in lines[1:]}
+
+
+FEES = {'keywords': ['fee'], 'responses': {'en': 'Fees are 1.5 lakh', 'hi': 'फीस 1.5 लाख है'}}
+HOSTEL = {'keywords': ['hostel'], 'responses': {'en': 'Hostels for boys and girls'}}
+
+
+def test_first_sync_exports_everything_at_revision_one(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    assert export.sync(snapshot({'fees': FEES, 'unknown': HOSTEL})) == 1
+
+    header, entries = read(export)
+    assert header == {'type': 'header', 'revision': 1, 'since': 0, 'kb_version': 'kb'}
+    assert set(entries) == {'intent:fees', 'answer:fees:en', 'answer:fees:hi'}
+    assert entries['answer:fees:hi']['answer'] == 'फीस 1.5 लाख है'
+
+
+def test_unchanged_sync_keeps_the_revision(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    export.sync(snapshot({'fees': FEES}))
+
+    assert export.sync(snapshot({'fees': dict(FEES)})) == 1
+    assert read(export, since=1)[1] == {}
+
+
+def test_since_returns_only_later_changes_and_tombstones(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    export.sync(snapshot({'fees': FEES, 'hostel': HOSTEL}))
+    changed = dict(FEES, responses={'en': 'Fees are 1.6 lakh'})
+
+    assert export.sync(snapshot({'fees': changed})) == 2
+    header, entries = read(export, since=1)
+    assert header['revision'] == 2
+    assert entries['answer:fees:en'] == {
+        'type': 'answer', 'intent': 'fees', 'language': 'en', 'answer': 'Fees are 1.6 lakh', 'keywords': ['fee'],
+        'id': 'answer:fees:en', 'rev': 2
+    }
+    assert entries['answer:fees:hi'] == {'type': 'answer', 'deleted': True, 'id': 'answer:fees:hi', 'rev': 2}
+    assert entries['intent:hostel'] == {'type': 'intent', 'deleted': True, 'id': 'intent:hostel', 'rev': 2}
+    assert 'intent:fees' not in entries
+
+
+def test_restored_entry_comes_back_at_a_new_revision(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    export.sync(snapshot({'fees': FEES, 'hostel': HOSTEL}))
+    export.sync(snapshot({'fees': FEES}))
+
+    assert export.sync(snapshot({'fees': FEES, 'hostel': HOSTEL})) == 3
+    entries = read(export, since=2)[1]
+    assert entries['intent:hostel']['rev'] == 3
+    assert 'deleted' not in entries['intent:hostel']
+
+
+def test_facts_are_exported_with_answers_per_language(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    export.sync(snapshot({}, [Fact('Library Information > Central Library', 'Timings', '8 AM to 8 PM')]))
+
+    entries = read(export)[1]
+    fact = entries['fact:Library Information > Central Library|Timings']
+    assert fact['type'] == 'fact'
+    assert set(fact['answers']) == {'en', 'hi', 'raj'}
+
+
+def test_repeated_fact_attribute_gets_its_own_id(tmp_path):
+    export = KnowledgeExport(str(tmp_path / 'export.sqlite3'))
+    hostel = 'Hostel > AC Rooms'
+    export.sync(snapshot({}, [Fact(hostel, 'Fees', '90,000 per year'), Fact(hostel, 'Fees', '1,10,000 per year')]))
+
+    entries = read(export)[1]
+    assert len(entries) == 2
+    assert entries[f"fact:{hostel}|Fees"]['value'] == '90,000 per year'
+
+    assert export.sync(snapshot({}, [Fact(hostel, 'Fees', '90,000 per year')])) == 2
+    repeat = list(read(export, since=1)[1].values())
+    assert len(repeat) == 1 and repeat[0]['deleted'] and repeat[0]['id'].startswith(f"fact:{hostel}|Fees#")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Unit tests for the adaptive LLM concurrency limiter"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+import pytest
+
+from llm_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdaptiveLimiter, LLMShed
+
+
+def queue_waiter(limiter, priority, admitted):
+    """Start a thread queueing for a slot, returning once it is queued; it appends (priority, slot) when admitted"""
+    queued = limiter.stats()['queued'][priority]
+
+    def wait():
+        admitted.append((priority, limiter.acquire(priority)))
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    while limiter.stats()['queued'][priority] == queued:
+        time.sleep(0.001)
+    return thread
+
+
+def test_admits_up_to_the_limit_and_release_frees_the_slot():
+    limiter = AdaptiveLimiter(initial_limit=2)
+    first = limiter.acquire()
+    limiter.acquire()
+
+    with pytest.raises(LLMShed) as shed:
+        limiter.acquire(max_wait_ms=10)
+    assert shed.value.reason == 'wait_expired'
+
+    first.release()
+    assert limiter.stats()['inflight'] == 1
+    limiter.acquire(max_wait_ms=10)
+
+
+def test_full_queue_is_shed_at_once():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=0)
+    limiter.acquire()
+
+    with pytest.raises(LLMShed) as shed:
+        limiter.acquire(max_wait_ms=1000)
+    assert shed.value.reason == 'queue_full'
+    assert limiter.stats()['shed']['queue_full'] == 1
+
+
+def test_expected_wait_longer_than_max_wait_is_shed_at_once():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    limiter.acquire().release()  # a completed call sets the expected latency
+    limiter.latency_ms = 5000.0
+    limiter.limit = 1.0
+    limiter.acquire()
+
+    start = time.perf_counter()
+    with pytest.raises(LLMShed) as shed:
+        limiter.acquire(max_wait_ms=100)
+    assert shed.value.reason == 'expected_wait'
+    assert time.perf_counter() - start < 0.05
+
+
+def test_interactive_calls_are_admitted_before_batch():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    slot = limiter.acquire()
+    admitted = []
+    threads = [queue_waiter(limiter, PRIORITY_BATCH, admitted)]
+    threads.append(queue_waiter(limiter, PRIORITY_INTERACTIVE, admitted))
+
+    # An error leaves the limit at one, so exactly one waiter is admitted at a time
+    slot.release('error')
+    while not admitted:
+        time.sleep(0.001)
+    assert admitted[0][0] == PRIORITY_INTERACTIVE
+
+    admitted[0][1].release('error')
+    for thread in threads:
+        thread.join()
+    assert [priority for priority, _ in admitted] == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+
+def test_shed_waiter_does_not_hold_a_slot():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    slot = limiter.acquire()
+    with pytest.raises(LLMShed):
+        limiter.acquire(max_wait_ms=5)
+
+    slot.release()
+    stats = limiter.stats()
+    assert stats['inflight'] == 0
+    assert stats['queued'] == {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+
+
+def test_repeated_release_is_ignored():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    slot = limiter.acquire()
+    slot.release()
+    slot.release('error')
+
+    stats = limiter.stats()
+    assert stats['inflight'] == 0
+    assert stats['completed'] == 1
+    assert stats['errors'] == 0
+
+
+def test_limit_grows_on_success_and_backs_off_when_overloaded():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, backoff=0.5)
+    limiter.acquire().release()
+    assert limiter.limit == pytest.approx(4.25)
+
+    limiter.acquire().release('overloaded')
+    assert limiter.limit == pytest.approx(2.125)
+    limiter.acquire().release('error')
+    assert limiter.limit == pytest.approx(2.125)
+
+
+def test_slow_calls_count_as_overload():
+    limiter = AdaptiveLimiter(initial_limit=4, backoff=0.5, latency_target_ms=1)
+    slot = limiter.acquire()
+    time.sleep(0.01)
+    slot.release()
+
+    stats = limiter.stats()
+    assert stats['slow'] == 1
+    assert limiter.limit == pytest.approx(2.0)
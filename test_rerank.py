@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Unit tests for budgeted cross-encoder reranking"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+from rerank import Reranker
+from retrieval import Chunk
+
+
+class CountingModel:
+    """Scores a pair by the number in its chunk title and remembers every pair it scored"""
+
+    def __init__(self):
+        self.scored = []
+
+    def predict(self, pairs, batch_size=None):
+        self.scored.extend(text.split('\n')[0] for _, text in pairs)
+        return [float(text.split('\n')[0].split()[-1]) for _, text in pairs]
+
+
+def candidates(count):
+    # First-stage scores close together so the margin shortcut never applies; cross-encoder order is reversed
+    return [(Chunk('kb.md', f"chunk {i}", f"text {i}"), 1.0 - i * 0.001) for i in range(count)]
+
+
+def test_repeated_query_is_served_from_the_cache():
+    model = CountingModel()
+    reranker = Reranker('stub', top_n=5, budget_ms=1000, model=model)
+
+    first, outcome = reranker.rerank('fees?', candidates(5), k=3, cache_key='fees')
+    assert outcome == 'reranked'
+    assert [chunk.title for chunk, _ in first] == ['chunk 4', 'chunk 3', 'chunk 2']
+
+    again, outcome = reranker.rerank('fees?', candidates(5), k=3, cache_key='fees')
+    assert outcome == 'cached'
+    assert [(chunk.title, score) for chunk, score in again] == [(chunk.title, score) for chunk, score in first]
+    assert len(model.scored) == 5
+
+
+def test_budget_cut_scores_are_reused_and_never_scored_twice():
+    model = CountingModel()
+    reranker = Reranker('stub', top_n=8, budget_ms=30, model=model)
+    reranker.ms_per_pair = 10.0  # the budget covers three pairs
+
+    _, outcome = reranker.rerank('fees?', candidates(8), k=2, cache_key='fees')
+    assert outcome == 'reranked'
+    assert model.scored == ['chunk 0', 'chunk 1', 'chunk 2']
+
+    reranker.ms_per_pair = 10.0
+    reranker.rerank('fees?', candidates(8), k=2, cache_key='fees')
+    reranker.ms_per_pair = 10.0
+    reranker.rerank('fees?', candidates(8), k=2, cache_key='fees')
+    assert len(model.scored) == len(set(model.scored)) == 8
+
+    reranker.ms_per_pair = 10.0
+    ranked, outcome = reranker.rerank('fees?', candidates(8), k=2, cache_key='fees')
+    assert outcome == 'cached'
+    assert [chunk.title for chunk, _ in ranked] == ['chunk 7', 'chunk 6']
+
+
+def test_decisive_first_stage_winner_skips_the_model():
+    model = CountingModel()
+    reranker = Reranker('stub', model=model)
+    lead = [(Chunk('kb.md', 'chunk 0', 'text'), 1.0), (Chunk('kb.md', 'chunk 1', 'text'), 0.2)]
+
+    assert reranker.rerank('fees?', lead, k=1)[1] == 'margin'
+    assert model.scored == []
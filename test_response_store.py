@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Unit tests for the shared SQLite response store"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot-service-backup'))
+
+import pytest
+
+from response_store import ResponseStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResponseStore(str(tmp_path / 'responses.sqlite3'), compact_interval=0, retain_versions=1)
+    yield store
+    store.close()
+
+
+def versions(store):
+    return [row[0] for row in store._reader().execute('SELECT kb_version FROM responses ORDER BY kb_version')]
+
+
+def test_answers_are_keyed_on_versions(store):
+    store.put('fees', 'en', 'kb1', 'p1', 'Fees are 1.5 lakh', ['Fee Structure'])
+    store.flush()
+
+    assert store.get('fees', 'en', 'kb1', 'p1') == ('Fees are 1.5 lakh', ['Fee Structure'])
+    assert store.get('fees', 'en', 'kb2', 'p1') is None
+    assert store.get('fees', 'hi', 'kb1', 'p1') is None
+
+
+def test_expired_answers_are_not_served(tmp_path):
+    store = ResponseStore(str(tmp_path / 'responses.sqlite3'), ttl_seconds=0, compact_interval=0)
+    store.put('fees', 'en', 'kb1', 'p1', 'Fees are 1.5 lakh', [])
+    store.flush()
+
+    assert store.get('fees', 'en', 'kb1', 'p1') is None
+    store.close()
+
+
+def test_compaction_keeps_kept_and_recent_versions(store):
+    for version in ('kb1', 'kb2', 'kb3'):
+        store.put('fees', 'en', version, 'p1', f"answer {version}", [])
+        store.flush()
+        time.sleep(0.01)
+
+    # kb2 is the version just replaced, still served by workers that have not reloaded yet
+    store.compact([('kb2', 'p1')])
+    store.flush()
+
+    assert versions(store) == ['kb2', 'kb3']
+
+
+def test_compaction_without_versions_only_drops_expired_rows(store):
+    store.put('fees', 'en', 'kb1', 'p1', 'answer', [])
+    store.put('fees', 'en', 'kb2', 'p1', 'answer', [])
+    store.compact()
+    store.flush()
+
+    assert versions(store) == ['kb1', 'kb2']